@@ -116,20 +116,48 @@ Let's get started!
             images.append(image)
             lab.save_image(image, f"lab3_guidance_{scale}.png")
         
-        # Display comparison
-        fig, axes = plt.subplots(1, 3, figsize=(15, 5))
-        for img, scale, ax in zip(images, guidance_scales, axes):
-            ax.imshow(img)
-            ax.set_title(f"Guidance Scale: {scale}")
-            ax.axis('off')
-        plt.tight_layout()
-        plt.show()
+        # Display comparison as one contact sheet
+        sheet = lab.contact_sheet(
+            images,
+            [f"Guidance Scale: {scale}" for scale in guidance_scales],
+            path=os.path.join("outputs", "lab3_guidance_sheet.png"),
+            columns=len(images)
+        )
+        lab.display_image(sheet, "Lab 3: Guidance Scale")
         
     except Exception as e:
         print(f"Error in Lab 3: {e}")
     
-    # Lab 4: Model Information
-    print_section("Lab 4: Model Information")
+    # Lab 4: Image-to-Image
+    print_section("Lab 4: Image-to-Image")
+    
+    try:
+        source = os.path.join("outputs", "lab1_basic_generation.png")
+        if not os.path.exists(source):
+            print("Lab 1 image not found, generating the sunset first")
+            image = lab.generate_image(
+                prompt="a beautiful sunset over mountains, digital art",
+                num_inference_steps=20,
+                seed=42
+            )
+            source = lab.save_image(image, "lab1_basic_generation.png")
+        print("Repainting the Lab 1 sunset as a watercolor (reusing the loaded model)")
+        
+        image = lab.image_to_image(
+            prompt="a watercolor painting of a sunset over mountains",
+            image=source,
+            strength=0.5,  # Only the last half of the steps are run
+            num_inference_steps=20,
+            seed=42
+        )
+        lab.display_image(image, "Lab 4: Image-to-Image")
+        lab.save_image(image, "lab4_img2img.png")
+        
+    except Exception as e:
+        print(f"Error in Lab 4: {e}")
+    
+    # Lab 5: Model Information
+    print_section("Lab 5: Model Information")
     
     info = lab.get_model_info()
     print("Current model information:")
@@ -0,0 +1,145 @@
+"""
+LoRA Adapter Manager
+
+This module loads LoRA adapters into an already-loaded pipeline, keeps an
+LRU cache of them, and switches, scales, fuses and unfuses adapters per
+request without reloading the base model.
+"""
+
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+
+class AdapterManager:
+    """
+    LRU cache of LoRA adapters attached to one pipeline
+
+    Adapters are loaded with diffusers' PEFT integration under their own
+    adapter name, so switching between them only changes which adapter
+    weights are applied.
+    """
+
+    def __init__(self, pipeline, max_adapters: int = 8):
+        """
+        Initialize the manager
+
+        Args:
+            pipeline: Pipeline to attach adapters to
+            max_adapters: Adapters kept loaded before the least recently used
+                inactive one is deleted
+        """
+        if not hasattr(pipeline, "load_lora_weights"):
+            raise ValueError(f"{type(pipeline).__name__} does not support LoRA adapters")
+        self.pipeline = pipeline
+        self.max_adapters = max(1, max_adapters)
+        self.loaded: "OrderedDict[str, Dict]" = OrderedDict()
+        self.active: Dict[str, float] = {}
+        self.fused: Optional[Dict[str, float]] = None
+
+    def load(self, name: str, source: str, weight_name: Optional[str] = None, **kwargs) -> bool:
+        """
+        Load an adapter unless it is already cached
+
+        Args:
+            name: Adapter name used to refer to it later
+            source: HuggingFace repo id, local directory or file
+            weight_name: Weight file inside the repo or directory
+            **kwargs: Additional arguments for load_lora_weights()
+
+        Returns:
+            True if the adapter was already loaded (cache hit)
+        """
+        if name in self.loaded:
+            self.loaded.move_to_end(name)
+            self.loaded[name]["last_used"] = time.time()
+            return True
+
+        while len(self.loaded) >= self.max_adapters:
+            if not self._evict_lru():
+                break
+
+        print(f"🧩 Loading LoRA adapter: {name}")
+        self.pipeline.load_lora_weights(source, weight_name=weight_name, adapter_name=name, **kwargs)
+        self.loaded[name] = {"source": source, "weight_name": weight_name, "last_used": time.time()}
+
+        # Loading enables the new adapter; restore the previous selection
+        self._apply(self.active)
+        return False
+
+    def _evict_lru(self) -> bool:
+        """Delete the least recently used adapter that isn't active or fused"""
+        busy = set(self.active) | set(self.fused or {})
+        for name in self.loaded:
+            if name not in busy:
+                self.pipeline.delete_adapters(name)
+                del self.loaded[name]
+                print(f"🗑️  Evicted LoRA adapter: {name}")
+                return True
+        return False
+
+    def _apply(self, adapters: Dict[str, float]):
+        if adapters:
+            self.pipeline.set_adapters(list(adapters), adapter_weights=list(adapters.values()))
+        elif self.loaded:
+            self.pipeline.disable_lora()
+
+    def activate(self, adapters: Dict[str, float]):
+        """
+        Select the adapters (and their scales) used by the next generations
+
+        Args:
+            adapters: adapter name -> scale; an empty dict disables LoRA
+        """
+        adapters = dict(adapters)
+        if self.fused is not None and adapters != self.fused:
+            # A different combination than the fused one: unfuse first
+            self.unfuse()
+        if adapters == self.active:
+            return
+
+        missing = [name for name in adapters if name not in self.loaded]
+        if missing:
+            raise KeyError(f"LoRA adapters not loaded: {missing}. Call load_adapter() first.")
+
+        if self.fused is None:
+            self._apply(adapters)
+        for name in adapters:
+            self.loaded.move_to_end(name)
+            self.loaded[name]["last_used"] = time.time()
+        self.active = adapters
+
+    def fuse(self, adapters: Optional[Dict[str, float]] = None):
+        """
+        Merge adapters into the base weights for adapter-free inference speed
+
+        Args:
+            adapters: adapter name -> scale (default: the active adapters)
+        """
+        adapters = dict(self.active if adapters is None else adapters)
+        if not adapters:
+            raise ValueError("No adapters to fuse")
+        if self.fused is not None:
+            self.unfuse()
+
+        self.activate(adapters)
+        self.pipeline.fuse_lora(adapter_names=list(adapters), lora_scale=1.0)
+        self.fused = adapters
+        print(f"🔗 Fused LoRA adapters: {', '.join(adapters)}")
+
+    def unfuse(self):
+        """Restore the base weights after fuse()"""
+        if self.fused is None:
+            return
+        self.pipeline.unfuse_lora()
+        self.fused = None
+        self._apply(self.active)
+        print("✂️  Unfused LoRA adapters")
+
+    def info(self) -> Dict:
+        """Loaded, active and fused adapters"""
+        return {
+            "loaded": list(self.loaded),
+            "active": dict(self.active),
+            "fused": dict(self.fused) if self.fused is not None else None,
+        }
@@ -0,0 +1,188 @@
+"""
+Attention Backends
+
+This module switches a pipeline's UNet between attention implementations:
+
+- "sdpa": PyTorch scaled_dot_product_attention (fused kernels where available)
+- "sliced": diffusers' SlicedAttnProcessor, plain (non-SDPA) attention
+  computed a slice of heads at a time, trading speed for lower peak memory
+- "tome": SDPA plus token merging (ToMe), which merges redundant image
+  tokens before attention; needs the optional `tomesd` package
+- "auto": micro-benchmark the candidates on the UNet at a given resolution
+  and keep the fastest one that fits in memory (memory is only measured on
+  CUDA; elsewhere the fastest backend wins)
+"""
+
+import time
+from typing import Dict, Optional, Sequence, Tuple
+
+import torch
+from diffusers.models.attention_processor import AttnProcessor2_0
+
+BACKENDS = ("sdpa", "sliced", "tome", "auto")
+
+
+def _tome_available() -> bool:
+    try:
+        import tomesd  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def _remove_tome(pipeline):
+    if getattr(pipeline.unet, "_tome_info", None) is not None:
+        import tomesd
+        tomesd.remove_patch(pipeline)
+
+
+def apply_attention_backend(pipeline, backend: str, tome_ratio: float = 0.5) -> str:
+    """
+    Switch a pipeline's attention implementation
+
+    Args:
+        pipeline: Loaded pipeline
+        backend: 'sdpa', 'sliced' or 'tome' (see select_attention_backend for 'auto')
+        tome_ratio: Fraction of tokens merged with 'tome'
+
+    Returns:
+        The backend now in use
+    """
+    if backend not in BACKENDS or backend == "auto":
+        raise ValueError(f"Unknown attention backend: {backend}. Choose from {BACKENDS[:-1]}")
+    if backend == "tome" and not _tome_available():
+        raise ImportError("The 'tome' attention backend needs tomesd: pip install tomesd")
+
+    _remove_tome(pipeline)
+    if hasattr(pipeline, "disable_attention_slicing"):
+        pipeline.disable_attention_slicing()
+    pipeline.unet.set_attn_processor(AttnProcessor2_0())
+
+    if backend == "sliced" and hasattr(pipeline, "enable_attention_slicing"):
+        pipeline.enable_attention_slicing()
+    elif backend == "tome":
+        import tomesd
+        tomesd.apply_patch(pipeline, ratio=tome_ratio)
+
+    pipeline._lab_attention_backend = backend
+    return backend
+
+
+@torch.no_grad()
+def benchmark_attention_backends(pipeline,
+                                 width: int = 512,
+                                 height: int = 512,
+                                 candidates: Optional[Sequence[str]] = None,
+                                 repeats: int = 2,
+                                 tome_ratio: float = 0.5) -> Dict[str, Dict[str, Optional[float]]]:
+    """
+    Time one guided UNet step per attention backend
+
+    Backends that fail are reported and left out of the results.
+
+    Args:
+        pipeline: Loaded pipeline
+        width: Image width to benchmark at
+        height: Image height to benchmark at
+        candidates: Backends to try (default: all available)
+        repeats: Timed UNet calls per backend (the fastest one counts)
+        tome_ratio: Fraction of tokens merged with 'tome'
+
+    Returns:
+        backend -> {'seconds': ..., 'peak_bytes': ...}; peak_bytes is None
+        off CUDA, where there is no allocator peak to read
+    """
+    if candidates is None:
+        candidates = [name for name in BACKENDS[:-1] if name != "tome" or _tome_available()]
+
+    unet = pipeline.unet
+    device = unet.device
+    scale = getattr(pipeline, "vae_scale_factor", 8)
+    latents = torch.randn(2, unet.config.in_channels, height // scale, width // scale,
+                          device=device, dtype=unet.dtype)
+    context = torch.randn(2, 77, unet.config.cross_attention_dim, device=device, dtype=unet.dtype)
+    timestep = torch.tensor(500, device=device)
+    added_cond_kwargs = None
+    if unet.config.addition_embed_type == "text_time":
+        # SDXL: pooled text embeddings plus six size/crop conditioning ids
+        time_ids = 6
+        text_dim = (unet.config.projection_class_embeddings_input_dim
+                    - time_ids * unet.config.addition_time_embed_dim)
+        added_cond_kwargs = {
+            "text_embeds": torch.randn(2, text_dim, device=device, dtype=unet.dtype),
+            "time_ids": torch.randn(2, time_ids, device=device, dtype=unet.dtype),
+        }
+
+    def step():
+        unet(latents, timestep, encoder_hidden_states=context, added_cond_kwargs=added_cond_kwargs)
+
+    def synchronize():
+        if device.type == "cuda":
+            torch.cuda.synchronize(device)
+        elif device.type == "mps":
+            torch.mps.synchronize()
+
+    results = {}
+    for backend in candidates:
+        try:
+            apply_attention_backend(pipeline, backend, tome_ratio)
+            step()  # warm-up
+            synchronize()
+            if device.type == "cuda":
+                torch.cuda.reset_peak_memory_stats(device)
+            best = float("inf")
+            for _ in range(repeats):
+                start = time.perf_counter()
+                step()
+                synchronize()
+                best = min(best, time.perf_counter() - start)
+            peak = torch.cuda.max_memory_allocated(device) if device.type == "cuda" else None
+            results[backend] = {"seconds": best, "peak_bytes": peak}
+            print(f"⏱️  Attention {backend}: {best * 1000:.0f} ms/step")
+        except Exception as e:
+            # Out-of-memory counts as not fitting; any other failure just skips the backend
+            print(f"⚠️  Attention backend {backend} failed: {e}")
+            if device.type == "cuda":
+                torch.cuda.empty_cache()
+    return results
+
+
+def select_attention_backend(pipeline,
+                             width: int = 512,
+                             height: int = 512,
+                             memory_budget_bytes: Optional[int] = None,
+                             candidates: Optional[Sequence[str]] = None,
+                             tome_ratio: float = 0.5) -> Tuple[str, Dict]:
+    """
+    Benchmark the backends and apply the fastest one that fits
+
+    Args:
+        pipeline: Loaded pipeline
+        width: Image width the model will mostly run at
+        height: Image height the model will mostly run at
+        memory_budget_bytes: Peak memory allowed for a UNet step (default:
+            free device memory on CUDA). Only enforced on CUDA, the one
+            device whose peak memory is measured
+        candidates: Backends to try (default: all available)
+        tome_ratio: Fraction of tokens merged with 'tome'
+
+    Returns:
+        (chosen backend, benchmark results)
+    """
+    device = pipeline.unet.device
+    if memory_budget_bytes is None and device.type == "cuda":
+        memory_budget_bytes = torch.cuda.mem_get_info(device)[0] + torch.cuda.memory_allocated(device)
+    elif memory_budget_bytes is not None and device.type != "cuda":
+        print(f"⚠️  Peak memory is not measured on {device.type}; ignoring memory_budget_bytes")
+
+    results = benchmark_attention_backends(pipeline, width, height, candidates, tome_ratio=tome_ratio)
+    fitting = {
+        name: result for name, result in results.items()
+        if memory_budget_bytes is None or result["peak_bytes"] is None
+        or result["peak_bytes"] <= memory_budget_bytes
+    }
+    # Slicing needs the least memory, so it is the fallback if nothing fits
+    choice = min(fitting, key=lambda name: fitting[name]["seconds"]) if fitting else "sliced"
+    apply_attention_backend(pipeline, choice, tome_ratio)
+    print(f"⚡ Selected attention backend: {choice}")
+    return choice, results
@@ -0,0 +1,171 @@
+"""
+Resolution Bucketing
+
+This module snaps requested image sizes to a set of resolution buckets
+(multiples of 64) derived from the model's native resolution, groups queued
+requests by bucket so they can be batched together, and maps generated
+images back to the requested size.
+"""
+
+import math
+from collections import OrderedDict
+from typing import Dict, Hashable, List, Optional, Sequence, Tuple
+
+from PIL import Image
+
+Size = Tuple[int, int]
+
+
+def make_buckets(areas: Sequence[int] = (512 * 512, 768 * 768),
+                 multiple: int = 64,
+                 min_side: int = 256,
+                 max_side: int = 1024) -> List[Size]:
+    """
+    Build equal-area buckets for a range of aspect ratios
+
+    For every width (a multiple of `multiple`), the tallest height that
+    keeps the area within each target area becomes a bucket.
+
+    Args:
+        areas: Target pixel counts, e.g. 512*512 for SD 1.x
+        multiple: Both sides are multiples of this
+        min_side: Smallest allowed side
+        max_side: Largest allowed side
+
+    Returns:
+        Sorted list of (width, height) buckets
+    """
+    buckets = set()
+    for area in areas:
+        for width in range(min_side, max_side + 1, multiple):
+            height = (area // width) // multiple * multiple
+            if min_side <= height <= max_side:
+                buckets.add((width, height))
+    return sorted(buckets)
+
+
+def native_size(pipeline, default: int = 512) -> int:
+    """Side length a pipeline's model was trained at (sample_size x VAE scale)"""
+    denoiser = getattr(pipeline, "unet", None) or getattr(pipeline, "transformer", None)
+    sample_size = getattr(getattr(denoiser, "config", None), "sample_size", None)
+    if isinstance(sample_size, (list, tuple)):
+        sample_size = max(sample_size)
+    if not sample_size:
+        return default
+    return int(sample_size * getattr(pipeline, "vae_scale_factor", 8))
+
+
+class ResolutionBuckets:
+    """
+    Snap sizes to buckets and group requests by bucket
+
+    A requested size maps to the bucket with the closest aspect ratio,
+    breaking ties by the closest area. Sizes that are already multiples
+    within the bucket range are never resized: they run at their own size.
+    """
+
+    def __init__(self, buckets: Optional[Sequence[Size]] = None, multiple: int = 64):
+        """
+        Initialize the bucket set
+
+        Args:
+            buckets: (width, height) buckets (default: make_buckets())
+            multiple: Required multiple for bucket sides
+        """
+        buckets = list(buckets) if buckets is not None else make_buckets(multiple=multiple)
+        for width, height in buckets:
+            if width % multiple or height % multiple:
+                raise ValueError(f"Bucket {width}x{height} is not a multiple of {multiple}")
+        if not buckets:
+            raise ValueError("At least one bucket is required")
+        self.buckets = buckets
+        self.multiple = multiple
+        self.min_side = min(min(bucket) for bucket in buckets)
+        self.max_side = max(max(bucket) for bucket in buckets)
+
+    @classmethod
+    def for_native_size(cls, native: int, multiple: int = 64) -> "ResolutionBuckets":
+        """
+        Buckets around a model's native resolution
+
+        Covers the native area and 1.5x its side, with sides from half to
+        twice the native side (512 gives the make_buckets() defaults).
+        """
+        larger = native * 3 // 2 // multiple * multiple
+        return cls(make_buckets(areas=(native * native, larger * larger), multiple=multiple,
+                                min_side=native // 2, max_side=native * 2), multiple)
+
+    def snap(self, width: int, height: int) -> Size:
+        """Return the bucket a requested size runs at"""
+        if (width % self.multiple == 0 and height % self.multiple == 0
+                and self.min_side <= min(width, height) and max(width, height) <= self.max_side):
+            return width, height
+        aspect = math.log(width / height)
+        area = math.log(width * height)
+
+        def cost(bucket: Size):
+            bucket_width, bucket_height = bucket
+            return (abs(math.log(bucket_width / bucket_height) - aspect)
+                    + 0.5 * abs(math.log(bucket_width * bucket_height) - area))
+
+        return min(self.buckets, key=cost)
+
+    def group(self, sizes: Sequence[Size],
+              keys: Optional[Sequence[Hashable]] = None) -> "OrderedDict[Tuple, List[int]]":
+        """
+        Group request indices by bucket
+
+        Args:
+            sizes: Requested (width, height) per request
+            keys: Optional extra grouping key per request (e.g. step count),
+                for parameters that must match within a batch
+
+        Returns:
+            (bucket, key) -> request indices, in first-seen order
+        """
+        groups: "OrderedDict[Tuple, List[int]]" = OrderedDict()
+        for index, (width, height) in enumerate(sizes):
+            key = keys[index] if keys is not None else None
+            groups.setdefault((self.snap(width, height), key), []).append(index)
+        return groups
+
+    @staticmethod
+    def restore(image: Image.Image, width: int, height: int, mode: str = "crop") -> Image.Image:
+        """
+        Map a bucket-sized image back to the requested size
+
+        Args:
+            image: Generated image at bucket resolution
+            width: Requested width
+            height: Requested height
+            mode: 'crop' (center-crop to the requested aspect, then resize),
+                'resize' (stretch), or 'none' (keep the bucket size)
+        """
+        if mode == "none" or image.size == (width, height):
+            return image
+        if mode == "crop":
+            source_width, source_height = image.size
+            target_aspect = width / height
+            if source_width / source_height > target_aspect:
+                crop_width = round(source_height * target_aspect)
+                left = (source_width - crop_width) // 2
+                image = image.crop((left, 0, left + crop_width, source_height))
+            else:
+                crop_height = round(source_width / target_aspect)
+                top = (source_height - crop_height) // 2
+                image = image.crop((0, top, source_width, top + crop_height))
+        elif mode != "resize":
+            raise ValueError(f"Unknown restore mode: {mode}")
+        return image.resize((width, height), Image.LANCZOS)
+
+    def stats(self, sizes: Sequence[Size], max_batch_size: int,
+              keys: Optional[Sequence[Hashable]] = None) -> Dict[str, float]:
+        """Batch count and average batch occupancy for a set of requests"""
+        groups = self.group(sizes, keys)
+        batches = sum(math.ceil(len(indices) / max_batch_size) for indices in groups.values())
+        return {
+            "requests": len(sizes),
+            "buckets": len(groups),
+            "batches": batches,
+            "occupancy": len(sizes) / (batches * max_batch_size) if batches else 0.0,
+        }
@@ -0,0 +1,139 @@
+"""
+Tensor Buffer Pool
+
+Long-running workers generate the same few shapes over and over. This
+module keeps released tensors per (shape, dtype, device) and hands them
+out again instead of allocating, so the lab's own buffers (initial
+latents, accumulators, uint8 output batches) stop churning the allocator.
+
+Only these I/O buffers are pooled. UNet activations, scheduler
+intermediates and VAE decode buffers are allocated inside diffusers and
+torch every step; on CUDA, torch's caching allocator already recycles them.
+"""
+
+import weakref
+from collections import defaultdict
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import torch
+
+BufferKey = Tuple[Tuple[int, ...], torch.dtype, str, bool]
+
+# Outstanding entries are swept for dead buffers once they outgrow this
+MIN_SWEEP_SIZE = 64
+
+
+class BufferPool:
+    """
+    Per-shape free lists of tensors
+
+    Only tensors handed out by acquire() are taken back by release();
+    anything else is ignored, so releasing is always safe. Buffers that are
+    never released are freed normally once unreferenced.
+    """
+
+    def __init__(self, max_bytes: Optional[int] = None):
+        """
+        Initialize the pool
+
+        Args:
+            max_bytes: Most memory kept in free lists (None: unbounded);
+                released buffers beyond it are dropped
+        """
+        self.max_bytes = max_bytes
+        self._free: Dict[BufferKey, List[torch.Tensor]] = defaultdict(list)
+        self._outstanding: Dict[Tuple[str, int], Tuple[BufferKey, weakref.ref]] = {}
+        self._sweep_at = MIN_SWEEP_SIZE
+        self.free_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.bytes_reused = 0
+        self.bytes_allocated = 0
+
+    @staticmethod
+    def _key(shape: Sequence[int], dtype: torch.dtype, device, pin_memory: bool) -> BufferKey:
+        device = torch.device(device)
+        if device.type == "cuda" and device.index is None:
+            device = torch.device("cuda", torch.cuda.current_device())
+        return tuple(int(size) for size in shape), dtype, str(device), pin_memory
+
+    def _sweep(self, force: bool = False):
+        """Forget outstanding buffers that died without being released"""
+        if not force and len(self._outstanding) < self._sweep_at:
+            return
+        self._outstanding = {handle: entry for handle, entry in self._outstanding.items()
+                             if entry[1]() is not None}
+        # Doubling the threshold keeps sweeps amortized O(1) per call
+        self._sweep_at = max(MIN_SWEEP_SIZE, 2 * len(self._outstanding))
+
+    def acquire(self, shape: Sequence[int], dtype: torch.dtype, device,
+                pin_memory: bool = False) -> torch.Tensor:
+        """
+        Get an uninitialized buffer, reusing a released one if possible
+
+        Args:
+            shape: Tensor shape
+            dtype: Tensor dtype
+            device: Tensor device
+            pin_memory: Page-locked host memory (CPU buffers only)
+        """
+        pin_memory = pin_memory and torch.cuda.is_available()
+        key = self._key(shape, dtype, device, pin_memory)
+        free = self._free.get(key)
+        if free:
+            tensor = free.pop()
+            size = tensor.numel() * tensor.element_size()
+            self.free_bytes -= size
+            self.hits += 1
+            self.bytes_reused += size
+        else:
+            tensor = torch.empty(key[0], dtype=dtype, device=key[2], pin_memory=pin_memory)
+            self.misses += 1
+            self.bytes_allocated += tensor.numel() * tensor.element_size()
+        self._sweep()
+        self._outstanding[(key[2], tensor.data_ptr())] = (key, weakref.ref(tensor))
+        return tensor
+
+    def release(self, *buffers: Union[torch.Tensor, np.ndarray]):
+        """Return buffers from acquire() (or NumPy views of CPU ones) to the pool"""
+        self._sweep()
+        for buffer in buffers:
+            if isinstance(buffer, np.ndarray):
+                handle = ("cpu", buffer.__array_interface__["data"][0])
+            elif isinstance(buffer, torch.Tensor):
+                handle = (self._key((), buffer.dtype, buffer.device, False)[2], buffer.data_ptr())
+            else:
+                continue
+            entry = self._outstanding.pop(handle, None)
+            # A live tensor owns its address, so anything at it is a view of that buffer
+            tensor = entry[1]() if entry is not None else None
+            if tensor is None:
+                continue
+            key = entry[0]
+            size = tensor.numel() * tensor.element_size()
+            if self.max_bytes is not None and self.free_bytes + size > self.max_bytes:
+                continue
+            self._free[key].append(tensor)
+            self.free_bytes += size
+
+    def clear(self):
+        """Drop all free buffers (outstanding ones are simply forgotten)"""
+        self._free.clear()
+        self._outstanding.clear()
+        self._sweep_at = MIN_SWEEP_SIZE
+        self.free_bytes = 0
+
+    def stats(self) -> Dict[str, float]:
+        """Reuse hit rate and bytes saved"""
+        requests = self.hits + self.misses
+        self._sweep(force=True)
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / requests if requests else 0.0,
+            "saved_mb": round(self.bytes_reused / 1024 ** 2, 1),
+            "allocated_mb": round(self.bytes_allocated / 1024 ** 2, 1),
+            "pooled_mb": round(self.free_bytes / 1024 ** 2, 1),
+            "outstanding": len(self._outstanding),
+        }
@@ -0,0 +1,106 @@
+"""
+Cancellation and Deadlines
+
+This module provides cancellation tokens and a step guard that the lab
+installs as a pipeline step callback, so an abandoned or overdue generation
+stops at the next denoising step instead of running to completion.
+"""
+
+import threading
+import time
+from typing import Optional
+
+
+class GenerationCancelled(RuntimeError):
+    """Raised when a generation is cancelled through its token"""
+
+    def __init__(self, message: str = "Generation cancelled", step: Optional[int] = None):
+        super().__init__(message)
+        self.step = step
+
+
+class GenerationTimeout(GenerationCancelled, TimeoutError):
+    """Raised when a generation runs past its deadline"""
+
+    def __init__(self, message: str = "Generation deadline exceeded", step: Optional[int] = None):
+        super().__init__(message, step)
+
+
+class CancellationToken:
+    """
+    Thread-safe flag a client or server can set to abandon a generation
+
+    Example:
+        token = CancellationToken()
+        # ... on client disconnect, from any thread:
+        token.cancel("client disconnected")
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+        self.reason: Optional[str] = None
+
+    def cancel(self, reason: str = "cancelled"):
+        """Request cancellation; running generations stop at their next step"""
+        self.reason = reason
+        self._event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def raise_if_cancelled(self, step: Optional[int] = None):
+        if self._event.is_set():
+            raise GenerationCancelled(f"Generation cancelled: {self.reason}", step)
+
+
+class StepGuard:
+    """
+    Step callback that enforces a cancellation token and/or a deadline
+
+    Deadlines are absolute ``time.monotonic()`` values. The guard is called
+    by the pipeline after every denoising step and raises, which unwinds the
+    pipeline call before the remaining steps and the VAE decode run.
+    """
+
+    tensor_inputs = []
+
+    def __init__(self,
+                 cancel_token: Optional[CancellationToken] = None,
+                 deadline: Optional[float] = None):
+        self.cancel_token = cancel_token
+        self.deadline = deadline
+
+    @classmethod
+    def create(cls,
+               cancel_token: Optional[CancellationToken] = None,
+               timeout: Optional[float] = None,
+               deadline: Optional[float] = None) -> Optional["StepGuard"]:
+        """
+        Build a guard from generate_image() arguments
+
+        Args:
+            cancel_token: Optional cancellation token
+            timeout: Optional budget in seconds, counted from now
+            deadline: Optional absolute time.monotonic() deadline
+
+        Returns:
+            A StepGuard, or None when nothing needs guarding
+        """
+        if timeout is not None:
+            timeout_deadline = time.monotonic() + timeout
+            deadline = timeout_deadline if deadline is None else min(deadline, timeout_deadline)
+        if cancel_token is None and deadline is None:
+            return None
+        return cls(cancel_token, deadline)
+
+    def check(self, step: Optional[int] = None):
+        """Raise if the generation was cancelled or is past its deadline"""
+        if self.cancel_token is not None:
+            self.cancel_token.raise_if_cancelled(step)
+        if self.deadline is not None and time.monotonic() >= self.deadline:
+            raise GenerationTimeout(step=step)
+
+    def __call__(self, pipe, step, timestep, callback_kwargs):
+        self.check(step)
+        return callback_kwargs
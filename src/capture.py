@@ -0,0 +1,282 @@
+"""
+Attention and Latent Capture
+
+This module records cross-attention maps and intermediate latents while a
+pipeline runs, for debugging prompts. Capturing processors wrap the UNet's
+cross-attention layers only while a capture is attached, and only the
+selected steps, layers and heads are recorded, in reduced precision, into
+per-layer ring buffers that are allocated once.
+"""
+
+import time
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import torch
+
+StepSelection = Union[None, int, Iterable[int]]
+
+
+class _CaptureProcessor:
+    """Attention processor that records attention probabilities, then defers to the original"""
+
+    def __init__(self, processor, capture: "AttentionCapture", name: str):
+        self.processor = processor
+        self.capture = capture
+        self.name = name
+
+    def __call__(self, attn, hidden_states, encoder_hidden_states=None, attention_mask=None, **kwargs):
+        if self.capture.recording and encoder_hidden_states is not None:
+            self.capture._record_attention(self.name, attn, hidden_states, encoder_hidden_states)
+        return self.processor(attn, hidden_states, encoder_hidden_states=encoder_hidden_states,
+                              attention_mask=attention_mask, **kwargs)
+
+
+class AttentionCapture:
+    """
+    Opt-in recorder for cross-attention maps and latents
+
+    Attach it to a pipeline, pass it as a step callback, and read the
+    records back with records() or export(). Each ring buffer keeps the
+    most recent `capacity` records of one layer.
+    """
+
+    tensor_inputs = ["latents"]
+
+    def __init__(self,
+                 steps: StepSelection = None,
+                 layers: Optional[Sequence[str]] = None,
+                 heads: Optional[Sequence[int]] = None,
+                 latents: bool = True,
+                 capacity: int = 64,
+                 sample: int = 0,
+                 dtype: torch.dtype = torch.float16):
+        """
+        Initialize the capture
+
+        Args:
+            steps: Steps to record: None for all, an int k for every k-th
+                step, or an iterable of step indices
+            layers: Substrings selecting cross-attention layers by name
+                (e.g. "up_blocks.1"); None records all of them
+            heads: Attention heads to keep; None averages over heads
+            latents: Also record the latents after each selected step
+            capacity: Records kept per layer before the oldest is overwritten
+            sample: Which image of the batch to record
+            dtype: Storage precision of the records
+        """
+        if isinstance(steps, int):
+            if steps < 1:
+                raise ValueError("steps must be a positive interval")
+            self._select = lambda step, every=steps: step % every == 0
+        elif steps is None:
+            self._select = lambda step: True
+        else:
+            selected = frozenset(steps)
+            self._select = lambda step: step in selected
+        self.layers = list(layers) if layers is not None else None
+        self.heads = list(heads) if heads is not None else None
+        self.capture_latents = latents
+        self.capacity = max(1, capacity)
+        self.sample = sample
+        self.dtype = dtype
+
+        self.unet = None
+        self._originals: Dict[str, object] = {}
+        self._buffers: Dict[str, torch.Tensor] = {}
+        self._labels: Dict[str, List[Optional[Tuple[int, int]]]] = {}
+        self._counts: Dict[str, int] = {}
+        self._pipeline = None
+        self.generation = -1
+        self.step = 0
+        self.recording = False
+
+    # Installation
+
+    def attach(self, pipeline) -> List[str]:
+        """
+        Wrap the selected cross-attention processors of a pipeline's UNet
+
+        Returns:
+            Names of the wrapped layers
+        """
+        if self.unet is not None:
+            self.detach()
+        unet = pipeline.unet
+        processors = dict(unet.attn_processors)
+        wrapped = []
+        for name, processor in processors.items():
+            if "attn2" not in name:
+                continue  # self-attention
+            if self.layers is not None and not any(part in name for part in self.layers):
+                continue
+            self._originals[name] = processor
+            processors[name] = _CaptureProcessor(processor, self, name)
+            wrapped.append(name)
+        if not wrapped:
+            raise ValueError("No cross-attention layers matched the capture selection")
+        unet.set_attn_processor(processors)
+        self.unet = unet
+        self._pipeline = pipeline
+        return wrapped
+
+    def detach(self):
+        """Restore the original processors; recorded data stays readable"""
+        if self.unet is None:
+            return
+        processors = dict(self.unet.attn_processors)
+        for name, processor in processors.items():
+            if isinstance(processor, _CaptureProcessor) and processor.capture is self:
+                processors[name] = self._originals.get(name, processor.processor)
+        self.unet.set_attn_processor(processors)
+        self.unet = None
+        self._pipeline = None
+        self._originals = {}
+        self.recording = False
+
+    def attached_to(self, pipeline) -> bool:
+        """Whether this capture is installed on the pipeline's UNet"""
+        return self.unet is not None and getattr(pipeline, "unet", None) is self.unet
+
+    # Recording
+
+    def start(self):
+        """Begin a new generation (called before the first step)"""
+        self.generation += 1
+        self.step = 0
+        self.recording = self._select(0)
+
+    def __call__(self, pipe, step, timestep, callback_kwargs):
+        """Step callback: record latents and advance the step counter"""
+        if self.capture_latents and self._select(step) and "latents" in callback_kwargs:
+            self._store("latents", callback_kwargs["latents"][self.sample], step)
+        self.step = step + 1
+        self.recording = self._select(self.step)
+        return None
+
+    @torch.no_grad()
+    def _record_attention(self, name: str, attn, hidden_states, encoder_hidden_states):
+        if hidden_states.ndim == 4:
+            batch, channels, height, width = hidden_states.shape
+            hidden_states = hidden_states.view(batch, channels, height * width).transpose(1, 2)
+
+        # With classifier-free guidance the conditional half comes second
+        index = self.sample
+        batch = hidden_states.shape[0]
+        if getattr(self._pipeline, "do_classifier_free_guidance", False) and batch % 2 == 0:
+            index += batch // 2
+        hidden_states = hidden_states[index:index + 1]
+        encoder_hidden_states = encoder_hidden_states[index:index + 1]
+
+        if attn.group_norm is not None:
+            hidden_states = attn.group_norm(hidden_states.transpose(1, 2)).transpose(1, 2)
+        if attn.norm_cross:
+            encoder_hidden_states = attn.norm_encoder_hidden_states(encoder_hidden_states)
+
+        query = attn.head_to_batch_dim(attn.to_q(hidden_states))
+        key = attn.head_to_batch_dim(attn.to_k(encoder_hidden_states))
+        probs = attn.get_attention_scores(query, key, None)  # (heads, pixels, tokens)
+        probs = probs[self.heads] if self.heads is not None else probs.mean(0, keepdim=True)
+        self._store(name, probs, self.step)
+
+    def _store(self, key: str, tensor: torch.Tensor, step: int):
+        buffer = self._buffers.get(key)
+        if buffer is None or buffer.shape[1:] != tensor.shape:
+            # Allocated on first use per layer (and again if the resolution changes)
+            pin = tensor.device.type == "cuda"
+            buffer = torch.empty((self.capacity,) + tuple(tensor.shape), dtype=self.dtype, pin_memory=pin)
+            self._buffers[key] = buffer
+            self._labels[key] = [None] * self.capacity
+            self._counts[key] = 0
+        slot = self._counts[key] % self.capacity
+        buffer[slot].copy_(tensor.detach(), non_blocking=buffer.is_pinned())
+        self._labels[key][slot] = (self.generation, step)
+        self._counts[key] += 1
+
+    # Reading
+
+    def keys(self) -> List[str]:
+        """Recorded layer names (and "latents")"""
+        return list(self._buffers)
+
+    def records(self, key: str) -> Tuple[torch.Tensor, List[Tuple[int, int]]]:
+        """
+        Records of one layer in chronological order
+
+        Returns:
+            (stacked records, [(generation, step), ...])
+        """
+        if torch.cuda.is_available():
+            torch.cuda.synchronize()
+        count = self._counts[key]
+        start = count % self.capacity if count > self.capacity else 0
+        order = [(start + i) % self.capacity for i in range(min(count, self.capacity))]
+        return self._buffers[key][order], [self._labels[key][slot] for slot in order]
+
+    def export(self, path: str) -> str:
+        """
+        Write all records to a compressed .npz file
+
+        Each layer is stored under its name, with "<name>.labels" holding
+        the (generation, step) of every record.
+        """
+        arrays = {}
+        for key in self.keys():
+            data, labels = self.records(key)
+            arrays[key] = data.numpy()
+            arrays[f"{key}.labels"] = np.asarray(labels, dtype=np.int32)
+        np.savez_compressed(path, **arrays)
+        return path if path.endswith(".npz") else path + ".npz"
+
+    def clear(self):
+        """Drop all records and buffers"""
+        self._buffers.clear()
+        self._labels.clear()
+        self._counts.clear()
+        self.generation = -1
+
+    def memory_bytes(self) -> int:
+        """Memory held by the ring buffers"""
+        return sum(buffer.numel() * buffer.element_size() for buffer in self._buffers.values())
+
+
+def measure_overhead(lab, prompt: str, num_inference_steps: int = 10,
+                     repeats: int = 2, **capture_kwargs) -> Dict[str, float]:
+    """
+    Time generation without capture, with capture attached but idle, and capturing
+
+    Args:
+        lab: DiffusionLab with a model loaded
+        prompt: Prompt to generate
+        num_inference_steps: Steps per generation
+        repeats: Generations per configuration (the fastest one counts)
+        **capture_kwargs: Arguments for the capturing run's AttentionCapture
+
+    Returns:
+        Seconds per generation for 'off', 'idle' and 'capture', plus the
+        relative overheads
+    """
+    def timed() -> float:
+        best = float("inf")
+        for _ in range(repeats):
+            start = time.perf_counter()
+            lab.generate_image(prompt, num_inference_steps=num_inference_steps, seed=0)
+            best = min(best, time.perf_counter() - start)
+        return best
+
+    lab.disable_capture()
+    lab.generate_image(prompt, num_inference_steps=1, seed=0)  # warm-up
+    timings = {"off": timed()}
+
+    lab.enable_capture(steps=[], latents=False)
+    timings["idle"] = timed()
+
+    lab.enable_capture(**capture_kwargs)
+    timings["capture"] = timed()
+    lab.disable_capture()
+
+    timings["idle_overhead"] = timings["idle"] / timings["off"] - 1
+    timings["capture_overhead"] = timings["capture"] / timings["off"] - 1
+    for name in ("off", "idle", "capture"):
+        print(f"⏱️  Capture {name}: {timings[name]:.2f}s")
+    return timings
@@ -0,0 +1,225 @@
+"""
+Shared Component Pool
+
+Many fine-tuned checkpoints ship byte-identical VAE, text encoder and safety
+checker weights. This module fingerprints pipeline components and keeps a
+single in-memory instance per unique fingerprint, so hosting several
+fine-tunes costs roughly one UNet each instead of one full pipeline each.
+"""
+
+import hashlib
+import os
+import weakref
+from typing import Dict, Optional, Tuple
+
+import torch
+from huggingface_hub import HfApi, snapshot_download
+
+try:
+    from .model_mirror import MANIFEST, manifest_content_ids, select_files
+except ImportError:
+    from model_mirror import MANIFEST, manifest_content_ids, select_files
+
+# Components that are commonly identical across fine-tunes of one base model
+SHAREABLE_COMPONENTS = ("vae", "text_encoder", "text_encoder_2", "safety_checker", "image_encoder")
+
+
+def _module_dtype(module: torch.nn.Module) -> str:
+    for tensor in module.parameters():
+        return str(tensor.dtype).replace("torch.", "")
+    return "none"
+
+
+def weight_hash(module: torch.nn.Module) -> str:
+    """
+    Fingerprint a module by its class, parameter names and tensor contents
+
+    This reads every weight once; it is the last resort for components
+    that weren't loaded from files the pool could identify.
+    """
+    digest = hashlib.blake2b(digest_size=20)
+    digest.update(type(module).__name__.encode())
+    for name, tensor in module.state_dict().items():
+        tensor = tensor.detach().to("cpu").contiguous()
+        digest.update(name.encode())
+        digest.update(str(tensor.dtype).encode())
+        digest.update(str(tuple(tensor.shape)).encode())
+        digest.update(tensor.reshape(-1).view(torch.uint8).numpy().tobytes() if tensor.numel() else b"")
+    return "weights:" + digest.hexdigest()
+
+
+def local_content_ids(directory: str) -> Dict[str, str]:
+    """
+    Content ids of the files in a local model directory, without reading them
+
+    Files in a HuggingFace cache snapshot are symlinks to blobs named by
+    the hub's own content id (LFS sha256 or git blob id), so those match
+    hub fingerprints. Other files are identified by their real path, size
+    and mtime, which only matches the same files on disk.
+    """
+    content_ids = {}
+    for folder, _, filenames in os.walk(directory):
+        for filename in filenames:
+            path = os.path.join(folder, filename)
+            real = os.path.realpath(path)
+            if real != os.path.abspath(path) and os.path.basename(os.path.dirname(real)) == "blobs":
+                content_id = os.path.basename(real)
+            else:
+                stat = os.stat(real)
+                content_id = f"path:{real}:{stat.st_size}:{stat.st_mtime_ns}"
+            content_ids[os.path.relpath(path, directory).replace(os.sep, "/")] = content_id
+    return content_ids
+
+
+class ComponentPool:
+    """
+    Pool of pipeline components keyed by content fingerprint
+
+    The pool only holds weak references: once no loaded pipeline uses a
+    component anymore, it is freed as usual.
+    """
+
+    def __init__(self, components=SHAREABLE_COMPONENTS):
+        """
+        Initialize the pool
+
+        Args:
+            components: Names of pipeline components to deduplicate
+        """
+        self.components = tuple(components)
+        self._modules: "weakref.WeakValueDictionary[str, torch.nn.Module]" = weakref.WeakValueDictionary()
+        self._keys_by_module: Dict[int, str] = {}
+        self._pending: Dict[str, str] = {}
+        self._hub_content_ids: Dict[Tuple[str, Optional[str]], Dict[str, str]] = {}
+        self.hits = 0
+        self.bytes_saved = 0
+
+    def file_hashes(self, model_id: str, revision: Optional[str] = None,
+                    variant: Optional[str] = None) -> Dict[str, str]:
+        """
+        Fingerprint each shareable component from the hub's file hashes
+
+        Uses the LFS sha256 of weight files and the git blob id of config
+        files, so nothing has to be downloaded or loaded to find a match.
+        Hub lookups are made once per model and revision. Staged mirror
+        directories use the same ids from their manifest; other local
+        directories, and the local HuggingFace cache when the hub can't be
+        reached, use local_content_ids().
+
+        Returns:
+            component name -> fingerprint (empty if the model is neither
+            reachable nor cached locally)
+        """
+        if os.path.isdir(model_id):
+            if os.path.isfile(os.path.join(model_id, MANIFEST)):
+                content_ids = manifest_content_ids(model_id)
+            else:
+                content_ids = local_content_ids(model_id)
+        elif (model_id, revision) in self._hub_content_ids:
+            content_ids = self._hub_content_ids[model_id, revision]
+        else:
+            try:
+                info = HfApi().model_info(model_id, revision=revision, files_metadata=True)
+                content_ids = {sibling.rfilename: sibling.lfs.sha256 if sibling.lfs else sibling.blob_id
+                               for sibling in info.siblings or []}
+                self._hub_content_ids[model_id, revision] = content_ids
+            except Exception as e:
+                print(f"⚠️  Could not fetch file hashes for {model_id}: {e}")
+                try:
+                    snapshot = snapshot_download(model_id, revision=revision, local_files_only=True)
+                except Exception:
+                    return {}
+                content_ids = local_content_ids(snapshot)
+
+        # Only the files diffusers would load (variant, safetensors first) take part
+        files: Dict[str, Dict[str, str]] = {}
+        for rfilename in select_files(list(content_ids), variant):
+            folder, _, filename = rfilename.partition("/")
+            if folder in self.components and filename:
+                files.setdefault(folder, {})[filename] = content_ids[rfilename]
+
+        fingerprints = {}
+        for component, entries in files.items():
+            lines = "\n".join(f"{name}:{cid}" for name, cid in sorted(entries.items()))
+            fingerprints[component] = "files:" + hashlib.sha256(lines.encode()).hexdigest()
+        return fingerprints
+
+    @staticmethod
+    def _key(fingerprint: str, dtype) -> str:
+        return f"{fingerprint}:{str(dtype).replace('torch.', '')}"
+
+    def resolve(self, model_id: str, torch_dtype, revision: Optional[str] = None,
+                variant: Optional[str] = None) -> Dict[str, torch.nn.Module]:
+        """
+        Find pooled components a checkpoint can reuse instead of loading
+
+        Args:
+            model_id: Checkpoint about to be loaded
+            torch_dtype: dtype the checkpoint will be loaded in
+            revision: Optional hub revision
+            variant: Optional weight variant (e.g. "fp16")
+
+        Returns:
+            Keyword arguments for DiffusionPipeline.from_pretrained()
+        """
+        self._pending = self.file_hashes(model_id, revision, variant)
+        reuse = {}
+        for component, fingerprint in self._pending.items():
+            module = self._modules.get(self._key(fingerprint, torch_dtype))
+            if module is not None:
+                reuse[component] = module
+        if reuse:
+            print(f"♻️  Reusing shared components for {model_id}: {', '.join(reuse)}")
+        return reuse
+
+    def register(self, pipeline) -> Dict[str, str]:
+        """
+        Add a loaded pipeline's components to the pool, swapping duplicates
+
+        Components whose fingerprint is already pooled are replaced in the
+        pipeline by the pooled instance, freeing the duplicate copy.
+
+        Returns:
+            component name -> pool key
+        """
+        pending = self._pending
+        self._pending = {}
+        keys = {}
+
+        for component in self.components:
+            module = getattr(pipeline, component, None)
+            if not isinstance(module, torch.nn.Module):
+                continue
+
+            known_key = self._keys_by_module.get(id(module))
+            if known_key is not None and self._modules.get(known_key) is module:
+                # Passed in by resolve(): reused without being loaded at all
+                keys[component] = known_key
+                self.hits += 1
+                self.bytes_saved += sum(t.numel() * t.element_size() for t in module.parameters())
+                continue
+
+            dtype = _module_dtype(module)
+            fingerprint = pending.get(component) or weight_hash(module)
+            key = self._key(fingerprint, dtype)
+            pooled = self._modules.get(key)
+
+            if pooled is not None and pooled is not module:
+                self.bytes_saved += sum(t.numel() * t.element_size() for t in module.parameters())
+                pipeline.register_modules(**{component: pooled})
+                self.hits += 1
+                print(f"♻️  Deduplicated {component} (identical weights already loaded)")
+            else:
+                self._modules[key] = module
+                self._keys_by_module[id(module)] = key
+            keys[component] = key
+
+        return keys
+
+    def stats(self) -> Dict[str, float]:
+        """Pooled component count, reuse count and memory saved"""
+        return {
+            "unique_components": len(self._modules),
+            "reused": self.hits,
+            "saved_gb": round(self.bytes_saved / 1024 ** 3, 2),
+        }
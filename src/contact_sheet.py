@@ -0,0 +1,201 @@
+"""
+Contact Sheets
+
+This module tiles batches of images into a single labeled grid with NumPy
+instead of one matplotlib subplot per image. Large sweeps are block-mean
+downsampled before tiling, and the result is written as one compressed
+image (PNG, JPEG, WebP) or a self-contained HTML gallery.
+"""
+
+import base64
+import html
+import io
+import math
+import os
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+try:
+    from .image_utils import ImageLike, to_uint8_array
+except ImportError:
+    from image_utils import ImageLike, to_uint8_array
+
+IMAGE_FORMATS = {".png": "PNG", ".jpg": "JPEG", ".jpeg": "JPEG", ".webp": "WEBP"}
+
+
+def stack_images(images: Sequence[ImageLike], size: Optional[Tuple[int, int]] = None) -> np.ndarray:
+    """
+    Stack images into one (N, H, W, 3) uint8 array
+
+    Images that differ from the target size (default: the first image's
+    size) are resized; same-sized batches are stacked without resizing.
+    """
+    if isinstance(images, np.ndarray) and images.ndim == 4:
+        batch = to_uint8_array(images)
+        if size is None or (batch.shape[2], batch.shape[1]) == tuple(size):
+            return batch[..., :3]
+        images = list(batch)
+
+    arrays = []
+    for image in images:
+        array = to_uint8_array(image)
+        if array.ndim == 4:
+            arrays.extend(array)
+        else:
+            arrays.append(array)
+    if not arrays:
+        raise ValueError("No images to stack")
+
+    width, height = size or (arrays[0].shape[1], arrays[0].shape[0])
+    for index, array in enumerate(arrays):
+        if array.ndim == 2:
+            array = np.repeat(array[..., None], 3, axis=2)
+        if array.shape[:2] != (height, width):
+            array = np.asarray(Image.fromarray(array[..., :3]).resize((width, height), Image.LANCZOS))
+        arrays[index] = array[..., :3]
+    return np.stack(arrays)
+
+
+def downsample(batch: np.ndarray, factor: int) -> np.ndarray:
+    """Block-mean downsample an (N, H, W, C) batch by an integer factor"""
+    if factor <= 1:
+        return batch
+    count, height, width, channels = batch.shape
+    height, width = height // factor * factor, width // factor * factor
+    blocks = batch[:, :height, :width].reshape(count, height // factor, factor, width // factor, factor, channels)
+    return blocks.mean(axis=(2, 4), dtype=np.float32).round().astype(np.uint8)
+
+
+class ContactSheet:
+    """
+    Labeled image grid built from a batch
+
+    The cell size is fixed per sheet; `max_cell` bounds it so a 10x10
+    sweep of 512px images stays a few megapixels.
+    """
+
+    def __init__(self,
+                 columns: Optional[int] = None,
+                 max_cell: int = 256,
+                 padding: int = 4,
+                 label_height: int = 16,
+                 background: int = 255):
+        """
+        Initialize the layout
+
+        Args:
+            columns: Images per row (default: roughly square)
+            max_cell: Largest cell side in pixels; bigger images are
+                downsampled by an integer factor
+            padding: Gap between cells in pixels
+            label_height: Height of the label strip under each cell (0 for none)
+            background: Gray level of padding and label strips
+        """
+        self.columns = columns
+        self.max_cell = max_cell
+        self.padding = padding
+        self.label_height = label_height
+        self.background = background
+
+    def build(self, images: Sequence[ImageLike], labels: Optional[Sequence[str]] = None) -> np.ndarray:
+        """
+        Tile images into one (H, W, 3) uint8 array
+
+        Args:
+            images: PIL images, arrays or tensors (or one NHWC batch)
+            labels: Optional caption per image
+
+        Returns:
+            The contact sheet as an array
+        """
+        batch = stack_images(images)
+        count, height, width, _ = batch.shape
+        factor = max(1, math.ceil(max(height, width) / self.max_cell))
+        batch = downsample(batch, factor)
+        _, cell_height, cell_width, _ = batch.shape
+
+        columns = self.columns or math.ceil(math.sqrt(count))
+        rows = math.ceil(count / columns)
+        label_height = self.label_height if labels is not None else 0
+        pad = self.padding
+
+        # Pad every cell at once, fill the last row, then fold into the grid
+        cells = np.pad(batch, ((0, rows * columns - count), (0, label_height + pad), (0, pad), (0, 0)),
+                       constant_values=self.background)
+        step_y, step_x = cell_height + label_height + pad, cell_width + pad
+        grid = cells.reshape(rows, columns, step_y, step_x, 3).transpose(0, 2, 1, 3, 4)
+        grid = grid.reshape(rows * step_y, columns * step_x, 3)
+        grid = np.pad(grid, ((pad, 0), (pad, 0), (0, 0)), constant_values=self.background)
+
+        if label_height:
+            grid = self._draw_labels(grid, labels, columns, cell_height, step_y, step_x)
+        return grid
+
+    def _draw_labels(self, grid: np.ndarray, labels: Sequence[str], columns: int,
+                     cell_height: int, step_y: int, step_x: int) -> np.ndarray:
+        canvas = Image.fromarray(grid)
+        draw = ImageDraw.Draw(canvas)
+        font = ImageFont.load_default()
+        fill = 0 if self.background > 127 else 255
+        for index, label in enumerate(labels):
+            row, column = divmod(index, columns)
+            position = (self.padding + column * step_x + 2, self.padding + row * step_y + cell_height + 2)
+            draw.text(position, str(label), fill=(fill, fill, fill), font=font)
+        return np.asarray(canvas)
+
+    def save(self, images: Sequence[ImageLike], path: str,
+             labels: Optional[Sequence[str]] = None, quality: int = 90) -> np.ndarray:
+        """
+        Build the sheet and write it as one image or an HTML gallery
+
+        The format follows the extension: .png, .jpg/.jpeg, .webp or .html.
+
+        Returns:
+            The contact sheet as an array
+        """
+        extension = os.path.splitext(path)[1].lower()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        if extension in (".html", ".htm"):
+            return write_gallery(images, path, labels, max_cell=self.max_cell, quality=quality)
+        if extension not in IMAGE_FORMATS:
+            raise ValueError(f"Unsupported contact sheet format: {extension}")
+
+        grid = self.build(images, labels)
+        image_format = IMAGE_FORMATS[extension]
+        options = {"optimize": True} if image_format == "PNG" else {"quality": quality}
+        Image.fromarray(grid).save(path, format=image_format, **options)
+        return grid
+
+
+def write_gallery(images: Sequence[ImageLike], path: str,
+                  labels: Optional[Sequence[str]] = None,
+                  max_cell: int = 256, quality: int = 85) -> np.ndarray:
+    """
+    Write a self-contained HTML gallery with embedded WebP thumbnails
+
+    Returns:
+        The downsampled thumbnail batch
+    """
+    batch = stack_images(images)
+    factor = max(1, math.ceil(max(batch.shape[1:3]) / max_cell))
+    batch = downsample(batch, factor)
+    labels = list(labels) if labels is not None else [str(i) for i in range(len(batch))]
+
+    figures: List[str] = []
+    for thumbnail, label in zip(batch, labels):
+        buffer = io.BytesIO()
+        Image.fromarray(thumbnail).save(buffer, format="WEBP", quality=quality)
+        data = base64.b64encode(buffer.getvalue()).decode("ascii")
+        caption = html.escape(str(label))
+        figures.append(f'<figure><img src="data:image/webp;base64,{data}" alt="{caption}">'
+                       f'<figcaption>{caption}</figcaption></figure>')
+
+    page = ("<!DOCTYPE html>\n<html><head><meta charset=\"utf-8\"><title>Contact sheet</title>"
+            "<style>body{font-family:sans-serif;display:flex;flex-wrap:wrap;gap:8px}"
+            "figure{margin:0}figcaption{font-size:12px}</style></head><body>\n"
+            + "\n".join(figures) + "\n</body></html>\n")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(page)
+    return batch
@@ -0,0 +1,359 @@
+"""
+CPU Thread and NUMA Tuning
+
+This module pins a process to a set of cores (optionally one NUMA node),
+sets torch's intra-op and inter-op thread counts, and autotunes how to
+split a host into worker processes: the threads-per-worker and
+workers-per-host combination with the best total images/sec.
+
+Memory placement follows the kernel's first-touch policy, so a profile
+should be applied before the model is loaded to keep its weights on the
+worker's own NUMA node.
+"""
+
+import argparse
+import glob
+import json
+import multiprocessing
+import os
+import queue
+import re
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+import torch
+
+
+def parse_cpulist(text: str) -> List[int]:
+    """Parse a kernel CPU list such as "0-3,8,10-11" """
+    cpus = []
+    for part in text.strip().split(","):
+        if not part:
+            continue
+        if "-" in part:
+            first, last = part.split("-")
+            cpus.extend(range(int(first), int(last) + 1))
+        else:
+            cpus.append(int(part))
+    return cpus
+
+
+def available_cpus() -> List[int]:
+    """CPUs this process may run on"""
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def numa_nodes() -> Dict[int, List[int]]:
+    """
+    NUMA node -> usable CPUs, read from /sys
+
+    Hosts without NUMA information are reported as a single node 0.
+    """
+    allowed = set(available_cpus())
+    nodes = {}
+    for path in glob.glob("/sys/devices/system/node/node[0-9]*/cpulist"):
+        node = int(re.search(r"node(\d+)", path).group(1))
+        with open(path) as f:
+            cpus = [cpu for cpu in parse_cpulist(f.read()) if cpu in allowed]
+        if cpus:
+            nodes[node] = cpus
+    return dict(sorted(nodes.items())) or {0: sorted(allowed)}
+
+
+class CPUProfile:
+    """
+    Thread counts and core pinning for one process
+    """
+
+    def __init__(self,
+                 threads: Optional[int] = None,
+                 interop_threads: Optional[int] = None,
+                 cores: Optional[Sequence[int]] = None,
+                 numa_node: Optional[int] = None):
+        """
+        Initialize the profile
+
+        Args:
+            threads: Intra-op threads (default: one per pinned core)
+            interop_threads: Inter-op threads (default: torch's default)
+            cores: CPUs to pin to (default: all CPUs of numa_node, or no pinning)
+            numa_node: NUMA node to pin to when cores isn't given
+        """
+        self.threads = threads
+        self.interop_threads = interop_threads
+        self.cores = list(cores) if cores is not None else None
+        self.numa_node = numa_node
+
+    def resolved_cores(self) -> Optional[List[int]]:
+        """CPUs the profile pins to, or None for no pinning"""
+        if self.cores is not None:
+            return self.cores
+        if self.numa_node is not None:
+            nodes = numa_nodes()
+            if self.numa_node not in nodes:
+                raise ValueError(f"Unknown NUMA node {self.numa_node}; available: {list(nodes)}")
+            return nodes[self.numa_node]
+        return None
+
+    def apply(self):
+        """Pin the current process and set torch's thread counts"""
+        cores = self.resolved_cores()
+        if cores and hasattr(os, "sched_setaffinity"):
+            os.sched_setaffinity(0, cores)
+        threads = self.threads or (len(cores) if cores else None)
+        if threads:
+            torch.set_num_threads(threads)
+            # Picked up by OpenMP in child processes
+            os.environ["OMP_NUM_THREADS"] = str(threads)
+        if self.interop_threads:
+            try:
+                torch.set_num_interop_threads(self.interop_threads)
+            except RuntimeError:
+                # Only settable before the first parallel operation
+                print("⚠️  Inter-op threads already initialized; apply the CPU profile earlier")
+        print(f"🧵 CPU profile: {torch.get_num_threads()} threads"
+              + (f" on cores {_format_cpulist(cores)}" if cores else ""))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "threads": self.threads,
+            "interop_threads": self.interop_threads,
+            "cores": self.cores,
+            "numa_node": self.numa_node,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "CPUProfile":
+        return cls(**{key: data.get(key) for key in ("threads", "interop_threads", "cores", "numa_node")})
+
+    @classmethod
+    def load(cls, path: str, worker: Optional[int] = None) -> "CPUProfile":
+        """
+        Load a profile, or one worker's profile from an autotune result
+
+        Args:
+            path: JSON file written by autotune() or CPUProfile.to_dict()
+            worker: Worker index for autotune results (default:
+                DIFFUSION_LAB_CPU_WORKER, else 0)
+        """
+        with open(path) as f:
+            data = json.load(f)
+        if "profiles" in data:
+            if worker is None:
+                worker = int(os.getenv("DIFFUSION_LAB_CPU_WORKER", "0"))
+            data = data["profiles"][worker % len(data["profiles"])]
+        return cls.from_dict(data)
+
+
+def _format_cpulist(cpus: Sequence[int]) -> str:
+    ranges = []
+    for cpu in sorted(cpus):
+        if ranges and cpu == ranges[-1][1] + 1:
+            ranges[-1][1] = cpu
+        else:
+            ranges.append([cpu, cpu])
+    return ",".join(f"{a}-{b}" if a != b else str(a) for a, b in ranges)
+
+
+def plan_workers(workers: int, threads_per_worker: int,
+                 nodes: Optional[Dict[int, List[int]]] = None) -> List[CPUProfile]:
+    """
+    Split the host's cores into per-worker profiles
+
+    Workers are spread round-robin over NUMA nodes and take their cores
+    from their own node, so no worker straddles a socket unless a node
+    has fewer cores than threads_per_worker; such a worker takes the
+    missing cores from the nodes with the most free cores and gets no
+    numa_node.
+    """
+    nodes = nodes if nodes is not None else numa_nodes()
+    if workers * threads_per_worker > sum(len(cpus) for cpus in nodes.values()):
+        raise ValueError(f"Not enough cores for {workers} workers x {threads_per_worker} threads")
+    free = {node: list(cpus) for node, cpus in nodes.items()}
+    node_ids = list(free)
+    profiles = []
+    for index in range(workers):
+        node = node_ids[index % len(node_ids)]
+        if len(free[node]) < threads_per_worker:
+            # Start from the node with the most free cores
+            node = max(free, key=lambda n: len(free[n]))
+        cores, free[node] = free[node][:threads_per_worker], free[node][threads_per_worker:]
+        home = node
+        while len(cores) < threads_per_worker:
+            # Straddle: top up from the node with the most cores left
+            node = max(free, key=lambda n: len(free[n]))
+            missing = threads_per_worker - len(cores)
+            cores, free[node] = cores + free[node][:missing], free[node][missing:]
+            home = None
+        profiles.append(CPUProfile(threads=threads_per_worker, interop_threads=1,
+                                   cores=cores, numa_node=home))
+    return profiles
+
+
+def candidate_splits(total_cores: int, max_workers: int = 4, min_threads: int = 2) -> List[Dict[str, int]]:
+    """(workers, threads_per_worker) combinations that use the whole host"""
+    splits = []
+    for workers in range(1, max_workers + 1):
+        threads = total_cores // workers
+        if threads >= min_threads:
+            splits.append({"workers": workers, "threads_per_worker": threads})
+    return splits
+
+
+def _autotune_worker(profile: Dict[str, Any], model_id: str, prompt: str, images: int,
+                     steps: int, size: int, barrier, barrier_timeout: float, results):
+    try:
+        CPUProfile.from_dict(profile).apply()
+        try:
+            from .diffusion_lab import DiffusionLab
+        except ImportError:
+            from diffusion_lab import DiffusionLab
+
+        lab = DiffusionLab(device="cpu")
+        lab.load_model(model_id)
+        lab.generate_image(prompt, num_inference_steps=1, width=size, height=size, seed=0)  # warm-up
+        barrier.wait(timeout=barrier_timeout)
+        start = time.perf_counter()
+        for seed in range(images):
+            lab.generate_image(prompt, num_inference_steps=steps, width=size, height=size, seed=seed)
+        results.put(time.perf_counter() - start)
+    except Exception as e:
+        # Release the other workers instead of leaving them at the barrier
+        barrier.abort()
+        results.put(f"{type(e).__name__}: {e}")
+
+
+def measure_split(model_id: str, profiles: List[CPUProfile], prompt: str,
+                  images_per_worker: int = 2, steps: int = 10, size: int = 512,
+                  barrier_timeout: float = 900.0, timeout: float = 3600.0) -> float:
+    """
+    Run one worker process per profile concurrently and measure throughput
+
+    Fails as soon as any worker reports an error or exits early.
+
+    Args:
+        barrier_timeout: Seconds workers wait for each other to finish loading
+        timeout: Seconds to wait for all workers to finish
+
+    Returns:
+        Total images per second across the workers
+    """
+    context = multiprocessing.get_context("spawn")
+    barrier = context.Barrier(len(profiles))
+    results = context.Queue()
+    processes = [
+        context.Process(target=_autotune_worker,
+                        args=(profile.to_dict(), model_id, prompt, images_per_worker,
+                              steps, size, barrier, barrier_timeout, results))
+        for profile in profiles
+    ]
+    for process in processes:
+        process.start()
+    elapsed = []
+    end = time.monotonic() + timeout
+    try:
+        while len(elapsed) < len(processes):
+            try:
+                result = results.get(timeout=1.0)
+            except queue.Empty:
+                exitcodes = [process.exitcode for process in processes if process.exitcode]
+                if exitcodes:
+                    raise RuntimeError(f"Worker exited early with code {exitcodes[0]}")
+                if time.monotonic() > end:
+                    raise TimeoutError(f"Workers did not finish within {timeout:.0f}s")
+                continue
+            if isinstance(result, str):
+                raise RuntimeError(f"Worker failed: {result}")
+            elapsed.append(result)
+    finally:
+        for process in processes:
+            # Stragglers of a failed split are stopped right away
+            process.join(timeout=60 if len(elapsed) == len(processes) else 0)
+            if process.is_alive():
+                process.terminate()
+                process.join()
+    return len(profiles) * images_per_worker / max(elapsed)
+
+
+def autotune(model_id: str,
+             output_path: str,
+             prompt: str = "a photograph of an astronaut riding a horse",
+             max_workers: int = 4,
+             images_per_worker: int = 2,
+             steps: int = 10,
+             size: int = 512) -> Dict[str, Any]:
+    """
+    Find the threads-per-worker / workers-per-host split with the best images/sec
+
+    Every worker loads its own copy of the model, so max_workers should
+    fit the host's RAM.
+
+    Args:
+        model_id: Model to benchmark
+        output_path: Where to write the JSON result
+        prompt: Prompt to generate
+        max_workers: Largest number of concurrent workers to try
+        images_per_worker: Timed images per worker and split
+        steps: Denoising steps per image
+        size: Image width and height
+
+    Returns:
+        The written result, with one CPU profile per worker of the best split
+    """
+    nodes = numa_nodes()
+    total_cores = sum(len(cpus) for cpus in nodes.values())
+    print(f"🧵 {total_cores} cores on {len(nodes)} NUMA node(s)")
+
+    results = []
+    for split in candidate_splits(total_cores, max_workers):
+        print(f"⏱️  {split['workers']} worker(s) x {split['threads_per_worker']} threads...")
+        try:
+            profiles = plan_workers(split["workers"], split["threads_per_worker"], nodes)
+            throughput = measure_split(model_id, profiles, prompt, images_per_worker, steps, size)
+        except Exception as e:
+            print(f"⚠️  Split failed: {e}")
+            continue
+        results.append({**split, "images_per_second": throughput})
+        print(f"   {throughput:.3f} images/sec")
+
+    if not results:
+        raise RuntimeError("No worker split completed")
+    best = max(results, key=lambda result: result["images_per_second"])
+    profile = {
+        **best,
+        "profiles": [p.to_dict() for p in plan_workers(best["workers"], best["threads_per_worker"], nodes)],
+        "results": results,
+        "benchmark": {"model": model_id, "steps": steps, "size": size},
+    }
+    with open(output_path, "w") as f:
+        json.dump(profile, f, indent=2)
+    print(f"💾 CPU profile saved to: {output_path}")
+    print(f"⭐ Best: {best['workers']} worker(s) x {best['threads_per_worker']} threads "
+          f"({best['images_per_second']:.3f} images/sec)")
+    return profile
+
+
+def main():
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(description="Autotune CPU threads and workers per host")
+    parser.add_argument("--model", required=True, help="HuggingFace model identifier")
+    parser.add_argument("--output", default="cpu_profile.json", help="Profile path")
+    parser.add_argument("--prompt", default="a photograph of an astronaut riding a horse")
+    parser.add_argument("--max-workers", type=int, default=4)
+    parser.add_argument("--images-per-worker", type=int, default=2)
+    parser.add_argument("--steps", type=int, default=10)
+    parser.add_argument("--size", type=int, default=512)
+    args = parser.parse_args()
+
+    autotune(args.model, args.output,
+             prompt=args.prompt,
+             max_workers=args.max_workers,
+             images_per_worker=args.images_per_worker,
+             steps=args.steps,
+             size=args.size)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,239 @@
+"""
+Cross-Step UNet Feature Caching
+
+Adjacent denoising steps produce very similar deep UNet features
+(DeepCache, Ma et al. 2023). This module runs the full UNet only every
+`interval` calls and caches the input of its shallowest up-block(s); the
+calls in between recompute only the shallow down/up blocks and reuse the
+cached deep features, which skips most of the UNet's compute.
+"""
+
+import math
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+import torch
+from diffusers.models.unets.unet_2d_condition import UNet2DConditionOutput
+
+
+class DeepCache:
+    """
+    Wraps a UNet2DConditionModel's forward with cross-step feature caching
+
+    Works for Stable Diffusion 1.x/2.x style UNets; calls with extra
+    conditioning (ControlNet residuals, SDXL added embeddings, ...) run
+    the original forward unchanged.
+    """
+
+    def __init__(self, unet, interval: int = 3, branch: int = 0):
+        """
+        Initialize the cache
+
+        Args:
+            unet: UNet to wrap
+            interval: Run the full UNet every `interval` steps
+            branch: Shallow levels recomputed on cached steps (0 = only the
+                outermost down/up block pair; higher is slower but closer
+                to the uncached result)
+        """
+        if interval < 1:
+            raise ValueError("interval must be at least 1")
+        if not 0 <= branch < len(unet.up_blocks) - 1:
+            raise ValueError(f"branch must be between 0 and {len(unet.up_blocks) - 2}")
+        config = unet.config
+        if (getattr(config, "class_embed_type", None) is not None
+                or getattr(config, "addition_embed_type", None) is not None
+                or getattr(unet, "encoder_hid_proj", None) is not None):
+            raise ValueError("DeepCache supports UNets without class or added embeddings")
+        self.unet = unet
+        self.interval = interval
+        self.branch = branch
+        self.full_calls = 0
+        self.cached_calls = 0
+        self.enabled = True
+        self._original_forward = None
+        self.reset()
+
+    def install(self):
+        """Route the UNet's forward through the cache"""
+        if self._original_forward is None:
+            self._original_forward = self.unet.forward
+            self.unet.forward = self._forward
+            self.unet._lab_deepcache = self
+
+    def remove(self):
+        """Restore the UNet's original forward"""
+        if self._original_forward is not None:
+            del self.unet.forward
+            del self.unet._lab_deepcache
+            self._original_forward = None
+        self.reset()
+
+    def reset(self):
+        """Forget cached features (call at the start of every generation)"""
+        self._features = None
+        self._sample_shape = None
+        self._calls = 0
+        self._last_timestep = None
+
+    @contextmanager
+    def bypass(self):
+        """Run the original forward inside the block (e.g. for tiled generation)"""
+        enabled, self.enabled = self.enabled, False
+        self.reset()
+        try:
+            yield
+        finally:
+            self.enabled = enabled
+            self.reset()
+
+    def stats(self) -> Dict[str, float]:
+        """Full and cached UNet calls so far"""
+        total = self.full_calls + self.cached_calls
+        return {
+            "full_calls": self.full_calls,
+            "cached_calls": self.cached_calls,
+            "cached_fraction": self.cached_calls / total if total else 0.0,
+        }
+
+    def _forward(self, sample, timestep, encoder_hidden_states, *args, **kwargs):
+        # Extra conditioning (ControlNet residuals, added embeddings, ...) isn't cacheable
+        extra = [key for key, value in kwargs.items() if key != "return_dict" and value is not None]
+        if not self.enabled or args or extra:
+            self.reset()
+            return self._original_forward(sample, timestep, encoder_hidden_states, *args, **kwargs)
+
+        current = float(timestep.flatten()[0]) if torch.is_tensor(timestep) else float(timestep)
+        if self._last_timestep is not None and current > self._last_timestep:
+            self.reset()  # timesteps only decrease within one generation
+        self._last_timestep = current
+
+        refresh = (self._calls % self.interval == 0 or self._features is None
+                   or self._sample_shape != sample.shape)
+        self._sample_shape = sample.shape
+        self._calls += 1
+        output = self._run(sample, timestep, encoder_hidden_states, refresh)
+
+        if not kwargs.get("return_dict", True):
+            return (output,)
+        return UNet2DConditionOutput(sample=output)
+
+    def _run(self, sample, timestep, encoder_hidden_states, refresh: bool) -> torch.Tensor:
+        unet = self.unet
+        batch = sample.shape[0]
+
+        timesteps = timestep if torch.is_tensor(timestep) else torch.tensor([timestep], device=sample.device)
+        timesteps = timesteps.reshape(-1).to(sample.device).expand(batch)
+        emb = unet.time_embedding(unet.time_proj(timesteps).to(dtype=sample.dtype))
+        if getattr(unet, "time_embed_act", None) is not None:
+            emb = unet.time_embed_act(emb)
+
+        hidden_states = unet.conv_in(sample)
+        residuals = (hidden_states,)
+        cache_level = len(unet.up_blocks) - 1 - self.branch
+        down_blocks = unet.down_blocks if refresh else unet.down_blocks[:self.branch + 1]
+        for block in down_blocks:
+            if getattr(block, "has_cross_attention", False):
+                hidden_states, block_residuals = block(hidden_states=hidden_states, temb=emb,
+                                                       encoder_hidden_states=encoder_hidden_states)
+            else:
+                hidden_states, block_residuals = block(hidden_states=hidden_states, temb=emb)
+            residuals += block_residuals
+
+        if refresh:
+            if unet.mid_block is not None:
+                hidden_states = unet.mid_block(hidden_states, emb, encoder_hidden_states=encoder_hidden_states)
+            first_up = 0
+            self.full_calls += 1
+        else:
+            # Only the residuals the shallow up-blocks consume are needed
+            needed = sum(len(block.resnets) for block in unet.up_blocks[cache_level:])
+            residuals = residuals[:needed]
+            hidden_states = self._features
+            first_up = cache_level
+            self.cached_calls += 1
+
+        for index in range(first_up, len(unet.up_blocks)):
+            block = unet.up_blocks[index]
+            if refresh and index == cache_level:
+                self._features = hidden_states
+            count = len(block.resnets)
+            block_residuals, residuals = residuals[-count:], residuals[:-count]
+            upsample_size = residuals[-1].shape[2:] if index < len(unet.up_blocks) - 1 else None
+            if getattr(block, "has_cross_attention", False):
+                hidden_states = block(hidden_states=hidden_states, temb=emb,
+                                      res_hidden_states_tuple=block_residuals,
+                                      encoder_hidden_states=encoder_hidden_states,
+                                      upsample_size=upsample_size)
+            else:
+                hidden_states = block(hidden_states=hidden_states, temb=emb,
+                                      res_hidden_states_tuple=block_residuals,
+                                      upsample_size=upsample_size)
+
+        if unet.conv_norm_out is not None:
+            hidden_states = unet.conv_act(unet.conv_norm_out(hidden_states))
+        return unet.conv_out(hidden_states)
+
+
+def psnr(reference: np.ndarray, image: np.ndarray) -> float:
+    """Peak signal-to-noise ratio of two uint8 images in dB"""
+    error = np.mean((reference.astype(np.float32) - image.astype(np.float32)) ** 2)
+    return float("inf") if error == 0 else 10 * math.log10(255 ** 2 / error)
+
+
+def deepcache_report(lab,
+                     prompts: Sequence[str],
+                     seeds: Sequence[int] = (0, 1),
+                     intervals: Sequence[int] = (2, 3, 5),
+                     branch: int = 0,
+                     num_inference_steps: int = 25,
+                     **generation_kwargs) -> List[Dict[str, float]]:
+    """
+    Speedup and quality of DeepCache intervals against uncached generation
+
+    Every prompt/seed pair is generated without caching and with each
+    interval; quality is the PSNR against the uncached image.
+
+    Args:
+        lab: DiffusionLab with a model loaded
+        prompts: Prompts to generate
+        seeds: Fixed seeds, one generation per prompt and seed
+        intervals: Refresh intervals to compare
+        branch: Shallow levels recomputed on cached steps
+        num_inference_steps: Steps per generation
+        **generation_kwargs: Additional generate_image() arguments
+
+    Returns:
+        One row per configuration with seconds, speedup and mean/min PSNR
+    """
+    def run() -> Tuple[float, List[np.ndarray]]:
+        images = []
+        start = time.perf_counter()
+        for prompt in prompts:
+            for seed in seeds:
+                images.append(lab.generate_image(prompt, num_inference_steps=num_inference_steps, seed=seed,
+                                                 output_type="np", **generation_kwargs)[0])
+        return time.perf_counter() - start, images
+
+    lab.disable_deepcache()
+    lab.generate_image(prompts[0], num_inference_steps=1, seed=0)  # warm-up
+    baseline_seconds, references = run()
+    rows = [{"interval": 1, "seconds": baseline_seconds, "speedup": 1.0,
+             "psnr_mean": float("inf"), "psnr_min": float("inf")}]
+
+    for interval in intervals:
+        lab.enable_deepcache(interval=interval, branch=branch)
+        seconds, images = run()
+        scores = [psnr(reference, image) for reference, image in zip(references, images)]
+        rows.append({"interval": interval, "seconds": seconds, "speedup": baseline_seconds / seconds,
+                     "psnr_mean": float(np.mean(scores)), "psnr_min": float(np.min(scores))})
+    lab.disable_deepcache()
+
+    print("📊 DeepCache report")
+    print(f"{'interval':>8} {'seconds':>8} {'speedup':>8} {'PSNR':>7} {'min':>7}")
+    for row in rows:
+        print(f"{row['interval']:>8} {row['seconds']:>8.2f} {row['speedup']:>7.2f}x "
+              f"{row['psnr_mean']:>7.2f} {row['psnr_min']:>7.2f}")
+    return rows
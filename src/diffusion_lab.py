@@ -6,15 +6,68 @@ including setup, model loading, and image generation utilities.
 """
 
 import os
+import gc
+import json
+from contextlib import nullcontext
 import torch
-from typing import Optional, List, Union
+from typing import Callable, Optional, List, Union, Dict, Tuple
 from PIL import Image
 import matplotlib.pyplot as plt
 from dotenv import load_dotenv
-from diffusers import DiffusionPipeline, StableDiffusionPipeline
+from diffusers import (DiffusionPipeline, StableDiffusionPipeline,
+                       AutoPipelineForImage2Image, AutoPipelineForInpainting)
 from huggingface_hub import login
 import warnings
 
+try:
+    from .output_store import ShardedOutputStore, plain_metadata
+    from .schedulers import (PRESETS, base_scheduler_config, find_scheduler_spec, get_scheduler_spec,
+                             list_schedulers, remember_base_config)
+    from .cancellation import CancellationToken, GenerationCancelled, GenerationTimeout, StepGuard
+    from .metrics import MetricsRegistry
+    from .model_cache import ModelResidencyCache, attached_module
+    from .component_pool import ComponentPool
+    from .adapters import AdapterManager
+    from .bucketing import ResolutionBuckets, native_size
+    from .tiled import TiledGenerator
+    from .image_utils import ImageLike, pipeline_tensor_to_uint8, to_pil, to_uint8_array
+    from .contact_sheet import ContactSheet
+    from .capture import AttentionCapture
+    from .prompt_encoding import PromptEmbeddings
+    from .attention import apply_attention_backend, select_attention_backend
+    from .deepcache import DeepCache
+    from .cpu_tuning import CPUProfile
+    from .model_mirror import changed_files, find_mirror, prefetch, read_manifest, verify_files, verify_mirror
+    from .guidance import GuidanceSchedule
+    from .buffer_pool import BufferPool
+    from .snapshot import export_snapshot, load_snapshot
+    from .fast_decoder import load_tiny_decoder, use_decoder
+    from .drafts import DraftSet, decode_latents, draft_size, relative_cost, upscale_latents
+except ImportError:
+    from output_store import ShardedOutputStore, plain_metadata
+    from schedulers import (PRESETS, base_scheduler_config, find_scheduler_spec, get_scheduler_spec,
+                            list_schedulers, remember_base_config)
+    from cancellation import CancellationToken, GenerationCancelled, GenerationTimeout, StepGuard
+    from metrics import MetricsRegistry
+    from model_cache import ModelResidencyCache, attached_module
+    from component_pool import ComponentPool
+    from adapters import AdapterManager
+    from bucketing import ResolutionBuckets, native_size
+    from tiled import TiledGenerator
+    from image_utils import ImageLike, pipeline_tensor_to_uint8, to_pil, to_uint8_array
+    from contact_sheet import ContactSheet
+    from capture import AttentionCapture
+    from prompt_encoding import PromptEmbeddings
+    from attention import apply_attention_backend, select_attention_backend
+    from deepcache import DeepCache
+    from cpu_tuning import CPUProfile
+    from model_mirror import changed_files, find_mirror, prefetch, read_manifest, verify_files, verify_mirror
+    from guidance import GuidanceSchedule
+    from buffer_pool import BufferPool
+    from snapshot import export_snapshot, load_snapshot
+    from fast_decoder import load_tiny_decoder, use_decoder
+    from drafts import DraftSet, decode_latents, draft_size, relative_cost, upscale_latents
+
 # Load environment variables
 load_dotenv()
 
@@ -26,16 +79,87 @@ class DiffusionLab:
     experimenting with diffusion models.
     """
     
-    def __init__(self, device: Optional[str] = None):
+    def __init__(self,
+                 device: Optional[str] = None,
+                 metrics: Optional[MetricsRegistry] = None,
+                 max_cached_models: int = 1,
+                 max_device_models: int = 1,
+                 device_memory_budget_gb: Optional[float] = None,
+                 cpu_memory_budget_gb: Optional[float] = None,
+                 share_components: Optional[bool] = None,
+                 max_adapters: int = 8,
+                 attention_backend: str = "sliced",
+                 attention_benchmark_size: Tuple[int, int] = (512, 512),
+                 cpu_profile: Optional[Union[CPUProfile, str]] = None,
+                 model_mirror: Optional[str] = None,
+                 verify_mirror: bool = False,
+                 reuse_buffers: bool = False):
         """
         Initialize the Diffusion Lab
         
         Args:
             device: Device to use ('cuda', 'mps', 'cpu', or 'auto')
+            metrics: Metrics registry to record into (default: enabled only
+                when DIFFUSION_LAB_METRICS=1)
+            max_cached_models: Models kept in memory for fast switching with
+                load_model(); least recently used ones wait in CPU RAM
+            max_device_models: Models kept on the device at the same time
+            device_memory_budget_gb: Optional device memory budget for cached models
+            cpu_memory_budget_gb: Optional CPU RAM budget for demoted models
+            share_components: Load identical VAE/text encoder/safety checker
+                weights only once across cached models (default: on when
+                max_cached_models > 1)
+            max_adapters: LoRA adapters kept loaded per model (LRU)
+            attention_backend: Attention implementation for loaded models:
+                'sdpa', 'sliced' (lowest memory), 'tome' (token merging,
+                needs tomesd) or 'auto' (benchmark at load time)
+            attention_benchmark_size: (width, height) that 'auto' benchmarks at
+            cpu_profile: CPU threads/core pinning to apply before anything is
+                loaded: a CPUProfile or a JSON file from `python src/cpu_tuning.py`
+            model_mirror: Root of a local model mirror staged with
+                `python src/model_mirror.py` (default: DIFFUSION_LAB_MODEL_MIRROR);
+                staged models load from it instead of the hub
+            verify_mirror: Hash every staged file against the manifest on
+                each load (by default only files changed since staging are
+                re-hashed and the rest are just prefetched)
+            reuse_buffers: Keep initial-latent, tile accumulator and uint8
+                output buffers in a per-shape pool across generations
+                (per-step UNet, scheduler and decode tensors are not pooled); 'np'/'pt' outputs should
+                then be handed back with release_output()
         """
+        if cpu_profile is not None:
+            if isinstance(cpu_profile, str):
+                cpu_profile = CPUProfile.load(cpu_profile)
+            cpu_profile.apply()
+        self.cpu_profile = cpu_profile
+        self.metrics = metrics if metrics is not None else MetricsRegistry.from_env()
         self.device = self._setup_device(device)
+        gb = 1024 ** 3
+        self.model_cache = ModelResidencyCache(
+            self.device,
+            max_device_models=max_device_models,
+            max_device_bytes=int(device_memory_budget_gb * gb) if device_memory_budget_gb else None,
+            max_cached_models=max_cached_models,
+            max_cpu_bytes=int(cpu_memory_budget_gb * gb) if cpu_memory_budget_gb else None,
+        )
+        if share_components is None:
+            share_components = max_cached_models > 1
+        self.component_pool = ComponentPool() if share_components else None
+        self.max_adapters = max_adapters
+        self.attention_backend = attention_backend
+        self.attention_benchmark_size = attention_benchmark_size
+        self.model_mirror = model_mirror or os.getenv("DIFFUSION_LAB_MODEL_MIRROR")
+        self.verify_mirror = verify_mirror
+        self.buffer_pool = BufferPool() if reuse_buffers else None
+        # None: derived from the loaded model's native resolution
+        self.buckets: Optional[ResolutionBuckets] = None
         self.pipeline = None
         self.current_model = None
+        self.output_store = None
+        self.preset = None
+        self.generation_defaults = None
+        self.capture = None
+        self._task_pipelines = {}
         
         # Setup HuggingFace authentication
         self._setup_huggingface_auth()
@@ -65,63 +189,391 @@ class DiffusionLab:
         else:
             print("⚠️  No HuggingFace token found. Some models may not be accessible.")
     
-    def load_model(self, model_id: str, **kwargs):
+    def load_model(self, model_id: str, reload: bool = False,
+                   attention_backend: Optional[str] = None, **kwargs):
         """
         Load a diffusion model
         
+        Models already held by the model cache are switched to without
+        touching the disk (see max_cached_models).
+        
         Args:
             model_id: HuggingFace model identifier
+            reload: Load from disk even if the model is cached
+            attention_backend: Override the lab's attention backend for this model
             **kwargs: Additional arguments for pipeline loading
         """
+        if not reload and model_id in self.model_cache:
+            self._switch_to_cached(model_id)
+            return
+        
+        self.metrics.inc("cache_misses_total", cache="model")
         print(f"📥 Loading model: {model_id}")
         
+        # Release the active pipeline so the cache can demote or evict it
+        self.pipeline = None
+        self._task_pipelines = {}
+        self.model_cache.reserve_slot()
+        
         try:
-            # Load the pipeline
-            self.pipeline = DiffusionPipeline.from_pretrained(
-                model_id,
-                torch_dtype=torch.float16 if self.device != "cpu" else torch.float32,
-                **kwargs
-            )
-            
-            # Move to device
-            self.pipeline = self.pipeline.to(self.device)
-            
-            # Enable memory efficient attention if available
-            if hasattr(self.pipeline, "enable_attention_slicing"):
-                self.pipeline.enable_attention_slicing()
+            with self.metrics.timer("model_load_seconds", model=model_id):
+                torch_dtype = torch.float16 if self.device != "cpu" else torch.float32
+                source = self._mirror_source(model_id, kwargs)
+                
+                # Reuse components identical to ones another cached model already loaded
+                shared = {}
+                if self.component_pool is not None:
+                    shared = self.component_pool.resolve(
+                        source, torch_dtype, kwargs.get("revision"), kwargs.get("variant")
+                    )
+                    shared = {name: module for name, module in shared.items() if name not in kwargs}
+                    if shared:
+                        self.metrics.inc("cache_hits_total", len(shared), cache="component")
+                
+                # Load the pipeline
+                self.pipeline = DiffusionPipeline.from_pretrained(
+                    source,
+                    torch_dtype=torch_dtype,
+                    **shared,
+                    **kwargs
+                )
+                if self.component_pool is not None:
+                    self.component_pool.register(self.pipeline)
+                remember_base_config(self.pipeline)
+                
+                # Move to device
+                self.pipeline = self.pipeline.to(self.device)
+                self._apply_attention(attention_backend or self.attention_backend)
             
+            self.model_cache.put(model_id, self.pipeline)
             self.current_model = model_id
+            self.metrics.inc("model_loads_total", model=model_id, status="ok")
             print(f"✅ Model loaded successfully: {model_id}")
             
         except Exception as e:
+            self.metrics.inc("model_loads_total", model=model_id, status="error")
+            self.metrics.inc("failures_total", operation="load_model")
             print(f"❌ Failed to load model {model_id}: {e}")
             raise
     
+    def _switch_to_cached(self, model_id: str):
+        """Make a model held by the model cache the current one"""
+        self.metrics.inc("cache_hits_total", cache="model")
+        with self.metrics.timer("model_load_seconds", model=model_id):
+            self.pipeline = self.model_cache.get(model_id)
+        self._task_pipelines = {}
+        self.current_model = model_id
+        print(f"✅ Switched to cached model: {model_id}")
+    
+    def _apply_attention(self, backend: str):
+        """Set up attention for a freshly loaded pipeline"""
+        if hasattr(self.pipeline, "unet"):
+            self.set_attention_backend(backend)
+        elif hasattr(self.pipeline, "enable_attention_slicing"):
+            self.pipeline.enable_attention_slicing()
+    
+    def export_snapshot(self, path: str) -> int:
+        """
+        Save the current model as a fast-load snapshot (see load_snapshot())
+        
+        The snapshot holds the weights in their current dtype, fused LoRA
+        adapters and the active scheduler; the attention backend and step
+        defaults are reapplied when it is loaded.
+        
+        Args:
+            path: Snapshot file to write
+            
+        Returns:
+            Size of the written file in bytes
+        """
+        if self.pipeline is None:
+            raise ValueError("No model loaded. Call load_model() first.")
+        adapters = getattr(self.pipeline, "_lab_adapters", None)
+        fused = adapters.fused if adapters is not None else None
+        if adapters is not None and set(adapters.loaded) - set(fused or {}):
+            print("⚠️  Only fused LoRA adapters are part of the snapshot; call fuse_adapters() to keep others")
+        
+        metadata = {
+            "model_id": self.current_model,
+            "attention_backend": getattr(self.pipeline, "_lab_attention_backend", None),
+            "preset": self.preset,
+            "generation_defaults": self.generation_defaults,
+            "fused_adapters": fused,
+            "scheduler_config": dict(base_scheduler_config(self.pipeline)),
+        }
+        return export_snapshot(self.pipeline, path, metadata)
+    
+    def load_snapshot(self, path: str, model_id: Optional[str] = None):
+        """
+        Load a model from a snapshot written by export_snapshot()
+        
+        Skips from_pretrained() entirely: modules are built on the meta
+        device and their weights mapped from the file, so a cold start is
+        bound by disk reads. The model then lives in the model cache like
+        any other.
+        
+        Args:
+            path: Snapshot file
+            model_id: Model cache key (default: the snapshot path)
+        """
+        model_id = model_id or path
+        if model_id in self.model_cache:
+            self._switch_to_cached(model_id)
+            return
+        
+        self.metrics.inc("cache_misses_total", cache="model")
+        print(f"📥 Loading snapshot: {path}")
+        self.pipeline = None
+        self._task_pipelines = {}
+        self.model_cache.reserve_slot()
+        
+        try:
+            with self.metrics.timer("model_load_seconds", model=model_id):
+                # Not registered with the component pool: fingerprinting would read every weight
+                self.pipeline, metadata = load_snapshot(path, self.device)
+                remember_base_config(self.pipeline, metadata.get("scheduler_config"))
+                self._apply_attention(metadata.get("attention_backend") or self.attention_backend)
+            
+            self.model_cache.put(model_id, self.pipeline)
+            self.current_model = model_id
+            self.preset = metadata.get("preset")
+            self.generation_defaults = metadata.get("generation_defaults")
+            self.metrics.inc("model_loads_total", model=model_id, status="ok")
+            print(f"✅ Model loaded from snapshot: {metadata.get('model_id') or model_id}")
+            
+        except Exception as e:
+            self.metrics.inc("model_loads_total", model=model_id, status="error")
+            self.metrics.inc("failures_total", operation="load_model")
+            print(f"❌ Failed to load snapshot {path}: {e}")
+            raise
+    
+    def _mirror_source(self, model_id: str, kwargs: dict) -> str:
+        """
+        Where to load a model from: its staged mirror directory, or model_id
+        
+        Files were verified when staged, so by default only those whose
+        size or mtime changed since are hashed again. Reading the staged
+        files (to verify or prefetch them) runs in parallel and leaves them
+        in the page cache for from_pretrained().
+        """
+        path = find_mirror(self.model_mirror, model_id) if self.model_mirror else None
+        if path is None:
+            return model_id
+        
+        manifest = read_manifest(path)
+        if kwargs.get("revision") not in (None, manifest["revision"]):
+            print(f"⚠️  Mirror of {model_id} is at {manifest['revision'][:10]}; loading from the hub")
+            return model_id
+        kwargs.pop("revision", None)
+        if manifest.get("variant"):
+            kwargs.setdefault("variant", manifest["variant"])
+        
+        if self.verify_mirror:
+            report = verify_mirror(path)
+        else:
+            changed = changed_files(path)
+            report = verify_files(path, {name: manifest["files"][name] for name in changed})
+        if report["mismatch"] or report["missing"]:
+            raise RuntimeError(f"Mirror of {model_id} is corrupt: {report['mismatch'] + report['missing']}")
+        if not self.verify_mirror:
+            prefetch(path)
+        print(f"📂 Loading {model_id} from mirror: {path}")
+        return path
+    
+    def set_attention_backend(self, backend: str, **kwargs) -> str:
+        """
+        Switch the attention implementation of the current model
+        
+        Args:
+            backend: 'sdpa', 'sliced', 'tome' or 'auto'
+            **kwargs: Options for the backend (tome_ratio; for 'auto' also
+                width, height, memory_budget_bytes, candidates)
+            
+        Returns:
+            The backend in use
+        """
+        if self.pipeline is None:
+            raise ValueError("No model loaded. Call load_model() first.")
+        if self.capture is not None and self.capture.attached_to(self.pipeline):
+            # Switching replaces the attention processors the capture wraps
+            print("⚠️  Attention capture disabled by the backend switch")
+            self.disable_capture()
+        if backend == "auto":
+            width, height = self.attention_benchmark_size
+            kwargs = {"width": width, "height": height, **kwargs}
+            backend, _ = select_attention_backend(self.pipeline, **kwargs)
+        else:
+            apply_attention_backend(self.pipeline, backend, **kwargs)
+        return backend
+    
+    def set_scheduler(self, name: str, preset: Optional[str] = None):
+        """
+        Switch the pipeline to a registered scheduler
+        
+        Args:
+            name: Scheduler name from the registry (see list_schedulers())
+            preset: Optional default step preset ('fast', 'balanced' or
+                'quality') used when generate_image() gets no step count
+        """
+        if self.pipeline is None:
+            raise ValueError("No model loaded. Call load_model() first.")
+        if preset is not None and preset not in PRESETS:
+            raise ValueError(f"Unknown preset: {preset}. Choose from {PRESETS}")
+        
+        spec = get_scheduler_spec(name)
+        self.pipeline.scheduler = spec.create(base_scheduler_config(self.pipeline))
+        self.preset = preset
+        self.generation_defaults = None
+        print(f"🗓️  Scheduler set to {name}" + (f" ({preset} preset)" if preset else ""))
+    
+    def use_fast_preset(self, scheduler: str = "DPM++ 2M Karras"):
+        """
+        Switch to a few-step sampler with its 'fast' step count
+        
+        Args:
+            scheduler: Registered fast scheduler. 'LCMScheduler' reaches 4 steps
+                but only works with LCM-distilled weights or an LCM-LoRA.
+        """
+        self.set_scheduler(scheduler, preset="fast")
+    
+    def load_generation_profile(self, path: str, max_distance: Optional[float] = None) -> dict:
+        """
+        Use a tuned scheduler profile as generation defaults
+        
+        Profiles are written by scheduler_tuner.tune_schedulers(). The chosen
+        configuration's scheduler is set on the pipeline, and its step count
+        and guidance scale become the defaults for generate_image().
+        
+        Args:
+            path: Path to the JSON profile
+            max_distance: Optional pixel-distance budget; picks the fastest
+                Pareto configuration within it instead of the profile default
+                
+        Returns:
+            The selected configuration
+        """
+        with open(path, "r") as f:
+            profile = json.load(f)
+        
+        if profile.get("model_id") not in (None, self.current_model):
+            print(f"⚠️  Profile was tuned for {profile['model_id']}, "
+                  f"current model is {self.current_model}")
+        
+        config = profile["default"]
+        if max_distance is not None:
+            candidates = [c for c in profile["pareto"] if c["pixel_distance"] <= max_distance]
+            config = candidates[0] if candidates else profile["pareto"][-1]
+        
+        self.set_scheduler(config["scheduler"])
+        self.generation_defaults = {
+            "num_inference_steps": config["num_inference_steps"],
+            "guidance_scale": config.get("guidance_scale"),
+        }
+        print(f"📈 Loaded generation profile: {config['scheduler']} with "
+              f"{config['num_inference_steps']} steps")
+        return config
+    
+    def list_schedulers(self) -> List[str]:
+        """Names of all schedulers available to set_scheduler()"""
+        return list_schedulers()
+    
+    def _resolve_generation_params(self,
+                                   num_inference_steps: Optional[int],
+                                   guidance_scale: Optional[float],
+                                   preset: Optional[str]):
+        """
+        Fill in step count and guidance that weren't given explicitly
+        
+        Precedence: explicit arguments, then the scheduler preset, then a
+        loaded generation profile, then the lab defaults (50 steps, 7.5).
+        """
+        preset = preset or self.preset
+        if preset is not None and preset not in PRESETS:
+            raise ValueError(f"Unknown preset: {preset}. Choose from {PRESETS}")
+        spec = find_scheduler_spec(self.pipeline.scheduler) if preset else None
+        profile = self.generation_defaults or {}
+        
+        if num_inference_steps is None:
+            if spec is not None:
+                num_inference_steps = spec.steps[preset]
+            else:
+                num_inference_steps = profile.get("num_inference_steps") or 50
+        if guidance_scale is None:
+            if spec is not None and spec.guidance_scale is not None:
+                guidance_scale = spec.guidance_scale
+            else:
+                guidance_scale = profile.get("guidance_scale") or 7.5
+        return num_inference_steps, guidance_scale
+    
     def generate_image(self, 
                       prompt: str, 
                       negative_prompt: Optional[str] = None,
-                      num_inference_steps: int = 50,
-                      guidance_scale: float = 7.5,
+                      num_inference_steps: Optional[int] = None,
+                      guidance_scale: Optional[float] = None,
                       width: int = 512,
                       height: int = 512,
-                      seed: Optional[int] = None) -> Image.Image:
+                      seed: Optional[int] = None,
+                      preset: Optional[str] = None,
+                      timeout: Optional[float] = None,
+                      deadline: Optional[float] = None,
+                      cancel_token: Optional[CancellationToken] = None,
+                      adapters: Optional[Dict[str, float]] = None,
+                      output_type: str = "pil",
+                      pin_memory: bool = False,
+                      cfg_cutoff: Optional[float] = None,
+                      uncond_interval: Optional[int] = None,
+                      decoder: str = "full") -> ImageLike:
         """
         Generate an image from a text prompt
         
         Args:
             prompt: Text description of the desired image
             negative_prompt: What to avoid in the image
-            num_inference_steps: Number of denoising steps
-            guidance_scale: How closely to follow the prompt
+            num_inference_steps: Number of denoising steps (default: from the
+                preset, otherwise 50)
+            guidance_scale: How closely to follow the prompt (default: from
+                the preset, otherwise 7.5)
             width: Image width
             height: Image height
             seed: Random seed for reproducibility
+            preset: Step preset for the current scheduler ('fast',
+                'balanced' or 'quality'); overrides set_scheduler()'s preset
+            timeout: Give up after this many seconds
+            deadline: Give up at this absolute time.monotonic() value
+            cancel_token: Token another thread can cancel to abandon the call
+            adapters: LoRA adapters to use for this call (name -> scale);
+                None keeps the current selection, {} disables LoRA
+            output_type: 'pil' for a PIL image, or 'np' / 'pt' for a
+                contiguous uint8 batch of shape (1, H, W, 3) as a NumPy array
+                or a torch tensor on the generation device, skipping PIL
+            pin_memory: With output_type='pt', return the tensor in pinned
+                host memory (for fast asynchronous transfers)
+            cfg_cutoff: Fraction of steps that use classifier-free guidance;
+                later steps run a single UNet pass (e.g. 0.6 saves ~20%)
+            uncond_interval: Evaluate the unconditional branch only every
+                k guided steps, reusing the last prediction in between
+            decoder: 'full' VAE, or 'tiny' for a fast approximate decode
+                (previews and thumbnails; see load_tiny_decoder())
             
         Returns:
-            Generated PIL Image
+            Generated image in the requested output type
+            
+        Raises:
+            GenerationCancelled: The token was cancelled (checked every step)
+            GenerationTimeout: The timeout or deadline passed (checked every step)
         """
         if self.pipeline is None:
             raise ValueError("No model loaded. Call load_model() first.")
+        if output_type not in ("pil", "np", "pt"):
+            raise ValueError(f"Unknown output_type: {output_type}. Choose 'pil', 'np' or 'pt'")
+        
+        num_inference_steps, guidance_scale = self._resolve_generation_params(
+            num_inference_steps, guidance_scale, preset
+        )
+        
+        step_callbacks = self._start_step_callbacks(cancel_token, timeout, deadline)
+        if adapters is not None:
+            self.set_adapters(adapters)
         
         # Set seed for reproducibility
         if seed is not None:
@@ -130,44 +582,923 @@ class DiffusionLab:
         print(f"🎨 Generating image with prompt: '{prompt}'")
         
         # Generate the image
-        with torch.autocast(self.device):
-            result = self.pipeline(
+        guidance = None
+        if cfg_cutoff is not None or uncond_interval is not None:
+            guidance = GuidanceSchedule(self.pipeline, guidance_scale, cfg_cutoff, uncond_interval)
+            step_callbacks = step_callbacks + guidance.callbacks
+        latents = self._acquire_latents(1, width, height)
+        try:
+            with guidance or nullcontext(), use_decoder(self.pipeline, decoder):
+                result = self._run_pipeline(
+                    self.pipeline, "txt2img", num_inference_steps, step_callbacks,
+                    prompt=prompt,
+                    negative_prompt=negative_prompt,
+                    num_inference_steps=num_inference_steps,
+                    guidance_scale=guidance_scale,
+                    width=width,
+                    height=height,
+                    output_type="pil" if output_type == "pil" else "pt",
+                    **({"latents": latents} if latents is not None else {})
+                )
+        finally:
+            self._release_buffers(latents)
+        
+        print("✅ Image generated successfully!")
+        if output_type == "pil":
+            return result.images[0]
+        return self._convert_output(result.images, output_type, pin_memory)
+    
+    def _convert_output(self, images: torch.Tensor, output_type: str, pin_memory: bool = False):
+        """Turn a pipeline 'pt' output into the requested uint8 batch"""
+        pool = self.buffer_pool
+        if pool is None:
+            images = pipeline_tensor_to_uint8(images)
+            if output_type == "np":
+                return images.cpu().numpy()
+            if pin_memory:
+                return images.cpu().pin_memory()
+            return images
+        
+        batch, _, height, width = images.shape
+        shape = (batch, height, width, 3)
+        output = pipeline_tensor_to_uint8(images, out=pool.acquire(shape, torch.uint8, images.device))
+        if output.device.type == "cpu" and not pin_memory:
+            return output.numpy() if output_type == "np" else output
+        if output_type == "np" or pin_memory:
+            host = pool.acquire(shape, torch.uint8, "cpu", pin_memory=True)
+            host.copy_(output)
+            pool.release(output)
+            return host.numpy() if output_type == "np" else host
+        return output
+    
+    def _acquire_latents(self, batch: int, width: int, height: int,
+                         generators: Optional[List[torch.Generator]] = None) -> Optional[torch.Tensor]:
+        """
+        Initial noise in a pooled buffer, or None when buffers aren't reused
+        
+        Draws the same values as the pipeline would: from the device's
+        global generator, or per image from CPU generators.
+        """
+        pipeline = self.pipeline
+        if self.buffer_pool is None or not hasattr(pipeline, "vae_scale_factor") \
+                or not hasattr(pipeline, "unet"):
+            return None
+        scale = pipeline.vae_scale_factor
+        shape = (batch, pipeline.unet.config.in_channels, height // scale, width // scale)
+        dtype = pipeline.unet.dtype
+        latents = self.buffer_pool.acquire(shape, dtype, pipeline._execution_device)
+        if generators is None:
+            latents.normal_()
+        else:
+            noise = self.buffer_pool.acquire((1,) + shape[1:], dtype, "cpu")
+            for index, generator in enumerate(generators):
+                latents[index:index + 1].copy_(noise.normal_(generator=generator))
+            self.buffer_pool.release(noise)
+        return latents
+    
+    def _release_buffers(self, *buffers):
+        """Hand pooled buffers back after a pipeline call"""
+        if self.buffer_pool is not None:
+            self.buffer_pool.release(*(buffer for buffer in buffers if buffer is not None))
+    
+    def release_output(self, *images):
+        """
+        Return 'np'/'pt' outputs to the buffer pool once you're done with them
+        
+        Only needed with reuse_buffers=True; the arrays must not be used
+        afterwards, as the next generation overwrites them.
+        """
+        self._release_buffers(*images)
+    
+    def generate_batch(self,
+                       requests: List[dict],
+                       max_batch_size: int = 4,
+                       restore: str = "crop",
+                       timeout: Optional[float] = None,
+                       deadline: Optional[float] = None,
+                       cancel_token: Optional[CancellationToken] = None,
+                       dedupe_prompts: bool = True,
+                       progress: Optional[Callable[[List[int], int, int], None]] = None,
+                       decoder: str = "full") -> List[Image.Image]:
+        """
+        Generate images for many requests, batching requests of similar size
+        
+        Requests without a size use the model's native resolution.
+        Requested sizes are snapped to the resolution buckets in
+        self.buckets (default: buckets around the native resolution;
+        sizes that are already multiples of 64 run as is). Requests
+        sharing a bucket, step count and guidance scale run together in
+        batches of up to max_batch_size, and each result is mapped back
+        to its requested size.
+        
+        Prompts and negative prompts are encoded once per unique string up
+        front, and the embeddings are gathered into each batch by index.
+        
+        Args:
+            requests: One dict per image with generate_image() style keys
+                (prompt, negative_prompt, width, height, seed,
+                num_inference_steps, guidance_scale, preset)
+            max_batch_size: Largest number of images per pipeline call
+            restore: How to return to the requested size: 'crop', 'resize'
+                or 'none' (keep the bucket size)
+            timeout: Give up on the whole batch after this many seconds
+            deadline: Give up at this absolute time.monotonic() value
+            cancel_token: Token another thread can cancel to abandon the call
+            dedupe_prompts: Run the text encoder once per unique string
+                (ignored for pipelines that need pooled embeddings, like SDXL)
+            progress: Called after every denoising step with the request
+                indices of the running pipeline call, the step and the total
+            decoder: 'full' VAE, or 'tiny' for a fast approximate decode
+            
+        Returns:
+            Generated PIL Images, in request order
+        """
+        if self.pipeline is None:
+            raise ValueError("No model loaded. Call load_model() first.")
+        
+        step_callbacks = self._start_step_callbacks(cancel_token, timeout, deadline)
+        
+        native = native_size(self.pipeline)
+        buckets = self.buckets or ResolutionBuckets.for_native_size(native)
+        sizes = [(request.get("width") or native, request.get("height") or native) for request in requests]
+        params = [
+            self._resolve_generation_params(
+                request.get("num_inference_steps"), request.get("guidance_scale"), request.get("preset")
+            )
+            for request in requests
+        ]
+        groups = buckets.group(sizes, keys=params)
+        print(f"📦 Generating {len(requests)} images in {len(groups)} resolution buckets")
+        
+        embeddings = None
+        if dedupe_prompts and PromptEmbeddings.supported(self.pipeline):
+            # Negatives are only encoded where classifier-free guidance uses them
+            strings = [request["prompt"] for request in requests] + [
+                request.get("negative_prompt") for request, (_, guidance_scale) in zip(requests, params)
+                if guidance_scale > 1.0
+            ]
+            embeddings = PromptEmbeddings(self.pipeline, strings)
+            self.metrics.inc("cache_hits_total", embeddings.duplicates, cache="prompt")
+            self.metrics.inc("cache_misses_total", len(embeddings.unique), cache="prompt")
+            print(f"🔤 Encoded {len(embeddings.unique)} unique prompts for {len(strings)} strings")
+        
+        images = [None] * len(requests)
+        for ((width, height), (steps, guidance_scale)), indices in groups.items():
+            for start in range(0, len(indices), max_batch_size):
+                chunk = indices[start:start + max_batch_size]
+                prompts = [requests[i]["prompt"] for i in chunk]
+                negatives = [requests[i].get("negative_prompt") or "" for i in chunk]
+                if embeddings is not None:
+                    text_kwargs = {
+                        "prompt_embeds": embeddings.take(prompts),
+                        "negative_prompt_embeds": (embeddings.take(negatives)
+                                                   if guidance_scale > 1.0 else None),
+                    }
+                else:
+                    text_kwargs = {"prompt": prompts, "negative_prompt": negatives}
+                generators = [self._make_generator(requests[i].get("seed")) for i in chunk]
+                latents = self._acquire_latents(len(chunk), width, height, generators)
+                callbacks = step_callbacks
+                if progress is not None:
+                    def report(pipe, step, timestep, callback_kwargs, chunk=chunk):
+                        progress(chunk, step + 1, pipe.num_timesteps)
+                    callbacks = step_callbacks + [report]
+                try:
+                    with use_decoder(self.pipeline, decoder):
+                        result = self._run_pipeline(
+                            self.pipeline, "batch", steps, callbacks,
+                            **text_kwargs,
+                            num_inference_steps=steps,
+                            guidance_scale=guidance_scale,
+                            width=width,
+                            height=height,
+                            generator=generators,
+                            **({"latents": latents} if latents is not None else {})
+                        )
+                finally:
+                    self._release_buffers(latents)
+                for i, image in zip(chunk, result.images):
+                    images[i] = buckets.restore(image, *sizes[i], mode=restore)
+        
+        print(f"✅ Generated {len(images)} images")
+        return images
+    
+    def generate_drafts(self,
+                        prompt: str,
+                        count: int = 8,
+                        negative_prompt: Optional[str] = None,
+                        width: int = 512,
+                        height: int = 512,
+                        draft_scale: float = 0.5,
+                        num_inference_steps: int = 10,
+                        guidance_scale: Optional[float] = None,
+                        seed: Optional[int] = None,
+                        decoder: str = "full",
+                        max_batch_size: int = 8,
+                        timeout: Optional[float] = None,
+                        deadline: Optional[float] = None,
+                        cancel_token: Optional[CancellationToken] = None) -> DraftSet:
+        """
+        Generate cheap low-resolution candidates to choose from
+        
+        Drafts run at draft_scale of the target size with few steps, in
+        batches of max_batch_size. The prompt is encoded once and reused by
+        every batch where the pipeline accepts precomputed embeddings. Pick
+        the ones worth keeping and pass their indices to refine_drafts().
+        
+        Args:
+            prompt: Text description of the desired image
+            count: Number of drafts
+            negative_prompt: What to avoid in the image
+            width: Final image width (drafts are smaller)
+            height: Final image height
+            draft_scale: Draft size as a fraction of the final size
+            num_inference_steps: Steps per draft
+            guidance_scale: How closely to follow the prompt (default: as generate_image)
+            seed: Seed of the first draft; draft i uses seed + i
+            decoder: 'full' VAE or 'tiny' for the previews
+            max_batch_size: Drafts per pipeline call
+            timeout: Give up on all drafts after this many seconds
+            deadline: Give up at this absolute time.monotonic() value
+            cancel_token: Token another thread can cancel to abandon the call
+            
+        Returns:
+            DraftSet with preview images, seeds and latents
+        """
+        if self.pipeline is None:
+            raise ValueError("No model loaded. Call load_model() first.")
+        _, guidance_scale = self._resolve_generation_params(num_inference_steps, guidance_scale, None)
+        step_callbacks = self._start_step_callbacks(cancel_token, timeout, deadline)
+        
+        draft_width, draft_height = draft_size(width, height, draft_scale)
+        if seed is None:
+            seed = int(torch.randint(0, 2 ** 31 - count, (1,)))
+        seeds = [seed + i for i in range(count)]
+        print(f"✏️  Generating {count} drafts at {draft_width}x{draft_height}: '{prompt}'")
+        
+        embeddings = None
+        if PromptEmbeddings.supported(self.pipeline):
+            # Encode once; every chunk gathers its rows instead of re-running CLIP
+            embeddings = PromptEmbeddings(self.pipeline, [prompt, negative_prompt])
+        
+        latents, images = [], []
+        for start in range(0, count, max_batch_size):
+            chunk = seeds[start:start + max_batch_size]
+            if embeddings is not None:
+                text_kwargs = {
+                    "prompt_embeds": embeddings.take([prompt] * len(chunk)),
+                    "negative_prompt_embeds": (embeddings.take([negative_prompt] * len(chunk))
+                                               if guidance_scale > 1.0 else None),
+                }
+            else:
+                text_kwargs = {"prompt": prompt, "negative_prompt": negative_prompt,
+                               "num_images_per_prompt": len(chunk)}
+            result = self._run_pipeline(
+                self.pipeline, "draft", num_inference_steps, step_callbacks,
+                **text_kwargs,
+                num_inference_steps=num_inference_steps,
+                guidance_scale=guidance_scale,
+                width=draft_width,
+                height=draft_height,
+                generator=[self._make_generator(s) for s in chunk],
+                output_type="latent"
+            )
+            with use_decoder(self.pipeline, decoder):
+                images.extend(decode_latents(self.pipeline, result.images))
+            latents.append(result.images)
+        
+        print(f"✅ Generated {count} drafts")
+        return DraftSet(prompt, negative_prompt, width, height, guidance_scale,
+                        num_inference_steps, seeds, torch.cat(latents), images)
+    
+    def refine_drafts(self,
+                      drafts: DraftSet,
+                      indices: List[int],
+                      strength: float = 0.5,
+                      scale: Optional[float] = None,
+                      num_inference_steps: Optional[int] = None,
+                      guidance_scale: Optional[float] = None,
+                      preset: Optional[str] = None,
+                      max_batch_size: int = 4,
+                      timeout: Optional[float] = None,
+                      deadline: Optional[float] = None,
+                      cancel_token: Optional[CancellationToken] = None) -> List[Image.Image]:
+        """
+        Refine chosen drafts at full resolution
+        
+        Each draft's latents are upscaled and partially re-noised, then
+        denoised image-to-image style; only strength of the schedule runs,
+        and the draft's seed is reused.
+        
+        Args:
+            drafts: Result of generate_drafts()
+            indices: Drafts to refine
+            strength: Fraction of the schedule to run again (higher changes more)
+            scale: Upscale factor from the draft size (default: back to the
+                width and height passed to generate_drafts())
+            num_inference_steps: Steps of the full schedule (default: as generate_image)
+            guidance_scale: How closely to follow the prompt (default: the drafts' scale)
+            preset: Step preset for the current scheduler
+            max_batch_size: Refinements per pipeline call
+            timeout: Give up after this many seconds
+            deadline: Give up at this absolute time.monotonic() value
+            cancel_token: Token another thread can cancel to abandon the call
+            
+        Returns:
+            Refined PIL Images, in the order of indices
+        """
+        if not 0.0 < strength <= 1.0:
+            raise ValueError("strength must be in (0, 1]")
+        pipeline = self._get_task_pipeline("img2img")
+        if guidance_scale is None:
+            guidance_scale = drafts.guidance_scale
+        num_inference_steps, guidance_scale = self._resolve_generation_params(
+            num_inference_steps, guidance_scale, preset
+        )
+        step_callbacks = self._start_step_callbacks(cancel_token, timeout, deadline)
+        
+        if scale is None:
+            width, height = drafts.width, drafts.height
+        else:
+            draft_width, draft_height = drafts.draft_size
+            width, height = (int(round(side * scale / 8)) * 8 for side in (draft_width, draft_height))
+        print(f"🔍 Refining {len(indices)} of {len(drafts)} drafts at {width}x{height} (strength {strength})")
+        
+        images = []
+        for start in range(0, len(indices), max_batch_size):
+            chunk = indices[start:start + max_batch_size]
+            latents = upscale_latents(drafts.latents[chunk], width, height, pipeline.vae_scale_factor)
+            # Input with the VAE's latent channels is used as-is by img2img, skipping the encode
+            result = self._run_pipeline(
+                pipeline, "refine", int(num_inference_steps * strength), step_callbacks,
+                prompt=drafts.prompt,
+                negative_prompt=drafts.negative_prompt,
+                image=latents,
+                strength=strength,
+                num_images_per_prompt=len(chunk),
+                num_inference_steps=num_inference_steps,
+                guidance_scale=guidance_scale,
+                generator=[self._make_generator(drafts.seeds[i]) for i in chunk]
+            )
+            images.extend(result.images)
+        
+        draft_width, draft_height = drafts.draft_size
+        cost = relative_cost(len(drafts), len(indices), draft_width * draft_height / (width * height),
+                             drafts.num_inference_steps, num_inference_steps, strength, num_inference_steps)
+        print(f"✅ Refined {len(images)} images ({cost:.0%} of the UNet compute of {len(drafts)} "
+              f"full generations)")
+        return images
+    
+    def generate_tiled_image(self,
+                             prompt: str,
+                             negative_prompt: Optional[str] = None,
+                             width: int = 2048,
+                             height: int = 2048,
+                             num_inference_steps: Optional[int] = None,
+                             guidance_scale: Optional[float] = None,
+                             seed: Optional[int] = None,
+                             preset: Optional[str] = None,
+                             tile_size: int = 512,
+                             overlap: int = 128,
+                             tile_batch_size: Optional[int] = None,
+                             timeout: Optional[float] = None,
+                             deadline: Optional[float] = None,
+                             cancel_token: Optional[CancellationToken] = None) -> Image.Image:
+        """
+        Generate a large image with bounded memory by denoising latent tiles
+        
+        Overlapping tiles are denoised at the model's native size and their
+        noise predictions blended every step (MultiDiffusion-style), then the
+        VAE decodes in tiles. Peak memory depends on the tile size and
+        tile_batch_size, not on width x height.
+        
+        Args:
+            prompt: Text description of the desired image
+            negative_prompt: What to avoid in the image
+            width: Image width (multiple of 8)
+            height: Image height (multiple of 8)
+            num_inference_steps: Number of denoising steps
+            guidance_scale: How closely to follow the prompt
+            seed: Random seed for reproducibility
+            preset: Step preset for the current scheduler
+            tile_size: Tile side in pixels
+            overlap: Overlap between tiles in pixels
+            tile_batch_size: Tiles per UNet call (default: from free memory on CUDA)
+            timeout: Give up after this many seconds
+            deadline: Give up at this absolute time.monotonic() value
+            cancel_token: Token another thread can cancel to abandon the call
+            
+        Returns:
+            Generated PIL Image
+        """
+        if self.pipeline is None:
+            raise ValueError("No model loaded. Call load_model() first.")
+        
+        num_inference_steps, guidance_scale = self._resolve_generation_params(
+            num_inference_steps, guidance_scale, preset
+        )
+        step_callbacks = self._start_step_callbacks(cancel_token, timeout, deadline)
+        
+        tiled = TiledGenerator(self.pipeline, tile_size, overlap, tile_batch_size,
+                               buffer_pool=self.buffer_pool)
+        views = tiled.views(height // tiled.scale, width // tiled.scale)
+        print(f"🧱 Generating {width}x{height} image from {len(views)} tiles: '{prompt}'")
+        
+        # Every tile is a different input, so cross-step feature caching can't apply
+        deepcache = self.deepcache
+        with deepcache.bypass() if deepcache is not None else nullcontext():
+            result = self._run_pipeline(
+                tiled, "tiled", num_inference_steps, step_callbacks,
                 prompt=prompt,
                 negative_prompt=negative_prompt,
+                width=width,
+                height=height,
                 num_inference_steps=num_inference_steps,
                 guidance_scale=guidance_scale,
-                width=width,
-                height=height
+                generator=self._make_generator(seed)
             )
         
-        image = result.images[0]
-        print("✅ Image generated successfully!")
+        print("✅ Tiled image generated successfully!")
+        return result.images[0]
+    
+    @staticmethod
+    def _make_generator(seed: Optional[int]) -> torch.Generator:
+        """Per-image CPU generator, so results don't depend on batch composition"""
+        generator = torch.Generator(device="cpu")
+        if seed is not None:
+            generator.manual_seed(seed)
+        else:
+            generator.seed()
+        return generator
+    
+    def image_to_image(self,
+                       prompt: str,
+                       image: Union[Image.Image, str],
+                       strength: float = 0.3,
+                       negative_prompt: Optional[str] = None,
+                       num_inference_steps: Optional[int] = None,
+                       guidance_scale: Optional[float] = None,
+                       seed: Optional[int] = None,
+                       preset: Optional[str] = None,
+                       timeout: Optional[float] = None,
+                       deadline: Optional[float] = None,
+                       cancel_token: Optional[CancellationToken] = None,
+                       adapters: Optional[Dict[str, float]] = None) -> Image.Image:
+        """
+        Transform an existing image guided by a text prompt
+        
+        The image-to-image pipeline reuses the loaded model's components, so
+        no second copy of the weights is loaded. Noise is added to the input
+        for `strength` of the schedule and only those last steps are
+        denoised: strength 0.3 runs about 30% of num_inference_steps.
+        
+        Args:
+            prompt: Text description of the desired image
+            image: Input PIL image or path to one
+            strength: How much to change the input (0 = keep, 1 = ignore it)
+            negative_prompt: What to avoid in the image
+            num_inference_steps: Steps of the full schedule (see generate_image)
+            guidance_scale: How closely to follow the prompt
+            seed: Random seed for reproducibility
+            preset: Step preset for the current scheduler
+            timeout: Give up after this many seconds
+            deadline: Give up at this absolute time.monotonic() value
+            cancel_token: Token another thread can cancel to abandon the call
+            adapters: LoRA adapters to use for this call (see generate_image)
+            
+        Returns:
+            Generated PIL Image
+        """
+        pipeline = self._get_task_pipeline("img2img")
+        num_inference_steps, guidance_scale = self._resolve_generation_params(
+            num_inference_steps, guidance_scale, preset
+        )
+        step_callbacks = self._start_step_callbacks(cancel_token, timeout, deadline)
+        if adapters is not None:
+            self.set_adapters(adapters)
+        
+        if seed is not None:
+            torch.manual_seed(seed)
+        
+        print(f"🖌️  Image-to-image with prompt: '{prompt}' (strength {strength})")
+        
+        result = self._run_pipeline(
+            pipeline, "img2img", int(num_inference_steps * strength), step_callbacks,
+            prompt=prompt,
+            image=self._load_input_image(image),
+            strength=strength,
+            negative_prompt=negative_prompt,
+            num_inference_steps=num_inference_steps,
+            guidance_scale=guidance_scale
+        )
+        
+        print("✅ Image transformed successfully!")
+        return result.images[0]
+    
+    def inpaint(self,
+                prompt: str,
+                image: Union[Image.Image, str],
+                mask_image: Union[Image.Image, str],
+                strength: float = 1.0,
+                negative_prompt: Optional[str] = None,
+                num_inference_steps: Optional[int] = None,
+                guidance_scale: Optional[float] = None,
+                seed: Optional[int] = None,
+                preset: Optional[str] = None,
+                timeout: Optional[float] = None,
+                deadline: Optional[float] = None,
+                cancel_token: Optional[CancellationToken] = None,
+                adapters: Optional[Dict[str, float]] = None) -> Image.Image:
+        """
+        Repaint the masked region of an image guided by a text prompt
+        
+        Like image_to_image(), the inpainting pipeline shares the loaded
+        components. Dedicated inpainting checkpoints give the best results,
+        but regular text-to-image checkpoints work too.
+        
+        Args:
+            prompt: Text description of what to paint in the masked region
+            image: Input PIL image or path to one
+            mask_image: Mask (white = repaint, black = keep) or path to one
+            strength: How much to change the masked region
+            negative_prompt: What to avoid in the image
+            num_inference_steps: Steps of the full schedule (see generate_image)
+            guidance_scale: How closely to follow the prompt
+            seed: Random seed for reproducibility
+            preset: Step preset for the current scheduler
+            timeout: Give up after this many seconds
+            deadline: Give up at this absolute time.monotonic() value
+            cancel_token: Token another thread can cancel to abandon the call
+            adapters: LoRA adapters to use for this call (see generate_image)
+            
+        Returns:
+            Generated PIL Image
+        """
+        pipeline = self._get_task_pipeline("inpaint")
+        num_inference_steps, guidance_scale = self._resolve_generation_params(
+            num_inference_steps, guidance_scale, preset
+        )
+        step_callbacks = self._start_step_callbacks(cancel_token, timeout, deadline)
+        if adapters is not None:
+            self.set_adapters(adapters)
+        
+        if seed is not None:
+            torch.manual_seed(seed)
+        
+        init_image = self._load_input_image(image)
+        print(f"🩹 Inpainting with prompt: '{prompt}'")
+        
+        result = self._run_pipeline(
+            pipeline, "inpaint", int(num_inference_steps * strength), step_callbacks,
+            prompt=prompt,
+            image=init_image,
+            mask_image=self._load_input_image(mask_image, mode="L"),
+            strength=strength,
+            negative_prompt=negative_prompt,
+            num_inference_steps=num_inference_steps,
+            guidance_scale=guidance_scale,
+            width=init_image.width,
+            height=init_image.height
+        )
+        
+        print("✅ Image inpainted successfully!")
+        return result.images[0]
+    
+    @property
+    def adapters(self) -> AdapterManager:
+        """LoRA adapter manager of the current model"""
+        if self.pipeline is None:
+            raise ValueError("No model loaded. Call load_model() first.")
+        # Stored on the pipeline so it lives exactly as long as the cached model
+        manager = getattr(self.pipeline, "_lab_adapters", None)
+        if manager is None:
+            manager = AdapterManager(self.pipeline, max_adapters=self.max_adapters)
+            self.pipeline._lab_adapters = manager
+        return manager
+    
+    def load_adapter(self, name: str, source: str, weight_name: Optional[str] = None,
+                     scale: Optional[float] = None, **kwargs):
+        """
+        Load a LoRA adapter into the current model without reloading it
+        
+        Args:
+            name: Adapter name used to refer to it later
+            source: HuggingFace repo id, local directory or file
+            weight_name: Weight file inside the repo or directory
+            scale: If given, also activate the adapter alone at this scale
+            **kwargs: Additional arguments for load_lora_weights()
+        """
+        if self.adapters.load(name, source, weight_name, **kwargs):
+            self.metrics.inc("cache_hits_total", cache="adapter")
+        else:
+            self.metrics.inc("cache_misses_total", cache="adapter")
+            text_encoder = getattr(self.pipeline, "text_encoder", None)
+            if (self.component_pool is not None
+                    and name in getattr(text_encoder, "peft_config", {})):
+                print(f"⚠️  Adapter {name} patches the text encoder, which may be shared "
+                      f"with other cached models")
+        if scale is not None:
+            self.set_adapters({name: scale})
+    
+    def set_adapters(self, adapters: Dict[str, float]):
+        """
+        Choose the LoRA adapters and scales for the next generations
+        
+        Args:
+            adapters: adapter name -> scale; {} disables LoRA
+        """
+        self.adapters.activate(adapters)
+    
+    def fuse_adapters(self, adapters: Optional[Dict[str, float]] = None):
+        """
+        Fuse LoRA adapters into the weights for faster generation
+        
+        Requests that ask for a different adapter combination unfuse automatically.
+        
+        Args:
+            adapters: adapter name -> scale (default: the active adapters)
+        """
+        self.adapters.fuse(adapters)
+    
+    def unfuse_adapters(self):
+        """Restore the base weights after fuse_adapters()"""
+        self.adapters.unfuse()
+    
+    def load_tiny_decoder(self, model_id: Optional[str] = None):
+        """
+        Load the tiny autoencoder used by decoder='tiny' ahead of time
         
-        return image
+        Otherwise it is loaded by the first request that asks for it.
+        
+        Args:
+            model_id: Tiny autoencoder (default: taesd/taesdxl/taesd3 to match the model)
+        """
+        if self.pipeline is None:
+            raise ValueError("No model loaded. Call load_model() first.")
+        return load_tiny_decoder(self.pipeline, model_id)
+    
+    @property
+    def deepcache(self) -> Optional[DeepCache]:
+        """Cross-step feature cache of the current model, if enabled"""
+        unet = getattr(self.pipeline, "unet", None)
+        return getattr(unet, "_lab_deepcache", None)
     
-    def display_image(self, image: Image.Image, title: str = "Generated Image"):
-        """Display an image with matplotlib"""
+    def enable_deepcache(self, interval: int = 3, branch: int = 0) -> DeepCache:
+        """
+        Speed up generation by reusing deep UNet features across steps
+        
+        The full UNet runs every `interval` steps; the steps in between only
+        recompute the shallow blocks. Meant for previews: expect roughly
+        interval-fold fewer deep-block evaluations at a small quality cost
+        (see deepcache_report() in deepcache.py).
+        
+        Args:
+            interval: Run the full UNet every `interval` steps
+            branch: Shallow levels recomputed on cached steps
+            
+        Returns:
+            The installed cache
+        """
+        if self.pipeline is None:
+            raise ValueError("No model loaded. Call load_model() first.")
+        self.disable_deepcache()
+        cache = DeepCache(self.pipeline.unet, interval=interval, branch=branch)
+        cache.install()
+        print(f"⚡ DeepCache enabled (full UNet every {interval} steps)")
+        return cache
+    
+    def disable_deepcache(self):
+        """Run the full UNet on every step again"""
+        cache = self.deepcache
+        if cache is not None:
+            cache.remove()
+            print("⚡ DeepCache disabled")
+    
+    def enable_capture(self, **kwargs) -> AttentionCapture:
+        """
+        Record cross-attention maps and latents during the next generations
+        
+        Args:
+            **kwargs: AttentionCapture options (steps, layers, heads,
+                latents, capacity, sample, dtype)
+            
+        Returns:
+            The capture; read it with records() or export()
+        """
+        if self.pipeline is None:
+            raise ValueError("No model loaded. Call load_model() first.")
+        self.disable_capture()
+        capture = AttentionCapture(**kwargs)
+        layers = capture.attach(self.pipeline)
+        self.capture = capture
+        print(f"🔬 Capturing {len(layers)} cross-attention layers")
+        return capture
+    
+    def disable_capture(self) -> Optional[AttentionCapture]:
+        """Remove the capture hooks; the returned capture keeps its records"""
+        capture, self.capture = self.capture, None
+        if capture is not None:
+            capture.detach()
+        return capture
+    
+    def _get_task_pipeline(self, task: str):
+        """
+        Get an image-to-image or inpainting view of the loaded pipeline
+        
+        Views are built with from_pipe(), which reuses the already-loaded
+        modules instead of loading the weights again.
+        """
+        if self.pipeline is None:
+            raise ValueError("No model loaded. Call load_model() first.")
+        
+        if task not in self._task_pipelines:
+            pipeline_classes = {
+                "img2img": AutoPipelineForImage2Image,
+                "inpaint": AutoPipelineForInpainting,
+            }
+            self._task_pipelines[task] = pipeline_classes[task].from_pipe(self.pipeline)
+        
+        pipeline = self._task_pipelines[task]
+        # Keep scheduler changes made through set_scheduler() in sync
+        pipeline.scheduler = self.pipeline.scheduler
+        return pipeline
+    
+    @staticmethod
+    def _load_input_image(image: Union[Image.Image, str], mode: str = "RGB") -> Image.Image:
+        """Open an input image from a path if needed"""
+        if isinstance(image, str):
+            image = Image.open(image)
+        return image.convert(mode)
+    
+    def _start_step_callbacks(self,
+                              cancel_token: Optional[CancellationToken],
+                              timeout: Optional[float],
+                              deadline: Optional[float]) -> List:
+        """Create the per-call step callbacks, shedding already-abandoned work"""
+        step_callbacks = []
+        guard = StepGuard.create(cancel_token, timeout, deadline)
+        if guard is not None:
+            # Shed work that is already abandoned before any UNet step runs
+            guard.check()
+            step_callbacks.append(guard)
+        if self.capture is not None and self.capture.attached_to(self.pipeline):
+            self.capture.start()
+            step_callbacks.append(self.capture)
+        if self.deepcache is not None:
+            self.deepcache.reset()
+        return step_callbacks
+    
+    def _run_pipeline(self, pipeline, task: str, steps: int, step_callbacks: List, **call_kwargs):
+        """
+        Call a pipeline with step callbacks, metrics and cancellation handling
+        
+        Args:
+            pipeline: Pipeline to call
+            task: Task name used as a metrics label ('txt2img', 'img2img', ...)
+            steps: Denoising steps the call will run, for the steps counter
+            step_callbacks: Callbacks run after every denoising step
+            **call_kwargs: Arguments for the pipeline call
+            
+        Returns:
+            The pipeline output
+        """
+        try:
+            with self.metrics.timer("generation_seconds", model=self.current_model, task=task), \
+                    torch.autocast(self.device):
+                result = pipeline(**call_kwargs, **self._step_callback_kwargs(step_callbacks))
+        except GenerationCancelled as e:
+            status = "timeout" if isinstance(e, GenerationTimeout) else "cancelled"
+            self.metrics.inc("generations_total", status=status, task=task)
+            if e.step is not None:
+                self.metrics.inc("steps_total", e.step + 1)
+            self._release_memory()
+            print(f"🛑 Generation stopped at step {e.step}: {e}")
+            raise
+        except Exception:
+            self.metrics.inc("generations_total", status="error", task=task)
+            self.metrics.inc("failures_total", operation=task)
+            raise
+        
+        self.metrics.inc("generations_total", status="ok", task=task)
+        self.metrics.inc("steps_total", steps)
+        return result
+    
+    @staticmethod
+    def _step_callback_kwargs(callbacks: List) -> dict:
+        """
+        Combine step callbacks into pipeline callback_on_step_end arguments
+        
+        Each callback takes (pipe, step, timestep, callback_kwargs) and may
+        return updated tensors; callbacks can list the tensors they need in a
+        `tensor_inputs` attribute.
+        """
+        if not callbacks:
+            return {}
+        
+        tensor_inputs = []
+        for callback in callbacks:
+            for name in getattr(callback, "tensor_inputs", []):
+                if name not in tensor_inputs:
+                    tensor_inputs.append(name)
+        
+        def on_step_end(pipe, step, timestep, callback_kwargs):
+            for callback in callbacks:
+                updates = callback(pipe, step, timestep, callback_kwargs)
+                if updates:
+                    callback_kwargs.update(updates)
+            return callback_kwargs
+        
+        return {
+            "callback_on_step_end": on_step_end,
+            "callback_on_step_end_tensor_inputs": tensor_inputs or ["latents"],
+        }
+    
+    def _release_memory(self):
+        """Free cached accelerator memory after an aborted generation"""
+        gc.collect()
+        if self.device == "cuda":
+            torch.cuda.empty_cache()
+        elif self.device == "mps":
+            torch.mps.empty_cache()
+    
+    def display_image(self, image: ImageLike, title: str = "Generated Image"):
+        """Display an image (PIL, uint8 array or tensor) with matplotlib"""
+        if not isinstance(image, Image.Image):
+            # matplotlib draws arrays directly, no PIL round-trip needed
+            image = to_uint8_array(image)
+            if image.ndim == 4:
+                image = image[0]
         plt.figure(figsize=(8, 8))
         plt.imshow(image)
         plt.title(title)
         plt.axis('off')
         plt.show()
     
-    def save_image(self, image: Image.Image, filename: str, output_dir: str = "outputs"):
-        """Save an image to disk"""
+    def save_image(self, image: ImageLike, filename: str, output_dir: str = "outputs"):
+        """Save an image (PIL, uint8 array or tensor) to disk"""
         os.makedirs(output_dir, exist_ok=True)
         filepath = os.path.join(output_dir, filename)
-        image.save(filepath)
+        with self.metrics.timer("save_seconds", target="file"):
+            to_pil(image).save(filepath)
+        self.metrics.inc("saves_total", target="file")
         print(f"💾 Image saved to: {filepath}")
         return filepath
     
-    def compare_schedulers(self, prompt: str, schedulers: List[str], **kwargs):
+    def open_output_store(self, root: str = "outputs/store", **kwargs) -> ShardedOutputStore:
+        """
+        Open a sharded output store for large runs
+        
+        Images written with store_images() are appended to a few tar shards
+        instead of creating one PNG file per image.
+        
+        Args:
+            root: Directory for the shards and index
+            **kwargs: Additional arguments for ShardedOutputStore
+            
+        Returns:
+            The opened store (also available as self.output_store)
+        """
+        if self.output_store is not None:
+            self.output_store.close()
+        self.output_store = ShardedOutputStore(root, **kwargs)
+        print(f"🗄️  Output store opened at: {root} ({len(self.output_store)} images)")
+        return self.output_store
+    
+    def store_images(self, images: List, keys: List[str], metadata: Optional[List[dict]] = None):
+        """
+        Bulk-write images to the open output store
+        
+        Args:
+            images: Images to store
+            keys: One unique generation key per image
+            metadata: Optional per-image generation parameters
+            
+        Returns:
+            List of index entries for the stored images
+        """
+        if self.output_store is None:
+            raise ValueError("No output store open. Call open_output_store() first.")
+        if metadata is None:
+            metadata = [None] * len(images)
+        with self.metrics.timer("save_seconds", target="store"):
+            entries = self.output_store.put_many(zip(keys, images, metadata))
+        self.metrics.inc("saves_total", len(entries), target="store")
+        print(f"💾 Stored {len(entries)} images in output store")
+        return entries
+    
+    def compare_schedulers(self, prompt: str, schedulers: List[str],
+                           store_prefix: Optional[str] = None,
+                           sheet_path: Optional[str] = None, **kwargs):
         """
         Compare different schedulers with the same prompt
         
         Args:
             prompt: Text prompt to use
-            schedulers: List of scheduler names to compare
+            schedulers: List of registered scheduler names to compare
+            store_prefix: If set, also write the images to the open output
+                store under keys "<store_prefix>/<scheduler name>"
+            sheet_path: If set, also write a contact sheet (.png, .jpg,
+                .webp or .html)
             **kwargs: Additional generation parameters
         """
         if self.pipeline is None:
@@ -177,28 +1508,14 @@ class DiffusionLab:
         titles = []
         
         original_scheduler = self.pipeline.scheduler
+        base_config = base_scheduler_config(self.pipeline)
         
         for scheduler_name in schedulers:
             try:
-                # Import and set the scheduler
-                from diffusers import (DDIMScheduler, PNDMScheduler, LMSDiscreteScheduler, 
-                                     EulerDiscreteScheduler, DPMSolverMultistepScheduler)
-                
-                scheduler_map = {
-                    'DDIMScheduler': DDIMScheduler,
-                    'PNDMScheduler': PNDMScheduler,
-                    'LMSDiscreteScheduler': LMSDiscreteScheduler,
-                    'EulerDiscreteScheduler': EulerDiscreteScheduler,
-                    'DPMSolverMultistepScheduler': DPMSolverMultistepScheduler
-                }
-                
-                if scheduler_name in scheduler_map:
-                    scheduler_class = scheduler_map[scheduler_name]
-                    self.pipeline.scheduler = scheduler_class.from_config(
-                        self.pipeline.scheduler.config
-                    )
+                if scheduler_name in list_schedulers():
+                    self.pipeline.scheduler = get_scheduler_spec(scheduler_name).create(base_config)
                     
-                    # Generate image
+                    # Generate image (a preset in kwargs picks per-scheduler steps)
                     image = self.generate_image(prompt, **kwargs)
                     images.append(image)
                     titles.append(f"{scheduler_name}")
@@ -211,21 +1528,80 @@ class DiffusionLab:
         # Restore original scheduler
         self.pipeline.scheduler = original_scheduler
         
+        if store_prefix is not None and images:
+            self.store_images(
+                images,
+                [f"{store_prefix}/{title}" for title in titles],
+                [plain_metadata({"prompt": prompt, "scheduler": title, **kwargs}) for title in titles]
+            )
+        
+        if sheet_path is not None and images:
+            self.contact_sheet(images, titles, sheet_path)
+        
         # Display comparison
-        if images:
-            fig, axes = plt.subplots(1, len(images), figsize=(5*len(images), 5))
-            if len(images) == 1:
-                axes = [axes]
+        self._show_comparison(images, titles)
+        
+        return images, titles
+    
+    def compare_from_store(self, keys: List[str], titles: Optional[List[str]] = None,
+                           sheet_path: Optional[str] = None):
+        """
+        Display a comparison of images read directly from the output store
+        
+        Args:
+            keys: Keys of the stored images to compare
+            titles: Optional titles (defaults to the keys)
+            sheet_path: If set, also write a contact sheet (.png, .jpg,
+                .webp or .html)
             
-            for img, title, ax in zip(images, titles, axes):
-                ax.imshow(img)
-                ax.set_title(title)
-                ax.axis('off')
+        Returns:
+            The images that were read
+        """
+        if self.output_store is None:
+            raise ValueError("No output store open. Call open_output_store() first.")
+        images = self.output_store.get_many(keys)
+        if sheet_path is not None and images:
+            self.contact_sheet(images, titles or list(keys), sheet_path)
+        self._show_comparison(images, titles or list(keys))
+        return images
+    
+    def contact_sheet(self, images: List[ImageLike], labels: Optional[List[str]] = None,
+                      path: Optional[str] = None, columns: Optional[int] = None,
+                      max_cell: int = 256):
+        """
+        Tile images into one labeled grid
+        
+        Args:
+            images: Images (PIL, arrays or tensors) to tile
+            labels: Optional caption per image
+            path: If set, write the sheet (.png, .jpg, .webp or .html)
+            columns: Images per row (default: roughly square)
+            max_cell: Largest cell side; bigger images are downsampled
             
-            plt.tight_layout()
-            plt.show()
+        Returns:
+            The contact sheet as a uint8 array
+        """
+        sheet = ContactSheet(columns=columns, max_cell=max_cell)
+        if path is None:
+            return sheet.build(images, labels)
+        with self.metrics.timer("save_seconds", target="sheet"):
+            grid = sheet.save(images, path, labels)
+        print(f"💾 Contact sheet saved to: {path}")
+        return grid
+    
+    def _show_comparison(self, images: List, titles: List[str]):
+        """Display images side by side as a single contact sheet"""
+        if not images:
+            return
         
-        return images, titles
+        columns = len(images) if len(images) <= 4 else None
+        grid = ContactSheet(columns=columns, max_cell=512).build(images, titles)
+        
+        plt.figure(figsize=(min(20, grid.shape[1] / 100), min(20, grid.shape[0] / 100)))
+        plt.imshow(grid)
+        plt.axis('off')
+        plt.tight_layout()
+        plt.show()
     
     def get_model_info(self):
         """Get information about the currently loaded model"""
@@ -236,7 +1612,18 @@ class DiffusionLab:
             "model_id": self.current_model,
             "device": self.device,
             "scheduler": type(self.pipeline.scheduler).__name__,
-            "components": list(self.pipeline.components.keys())
+            "preset": self.preset,
+            "attention_backend": getattr(self.pipeline, "_lab_attention_backend", None),
+            "components": list(self.pipeline.components.keys()),
+            "resident_models": self.model_cache.residency()
         }
+        if attached_module(self.pipeline, "tiny_vae") is not None:
+            info["tiny_decoder"] = self.pipeline._lab_tiny_vae_id
+        if self.buffer_pool is not None:
+            info["buffer_pool"] = self.buffer_pool.stats()
+        if self.component_pool is not None:
+            info["shared_components"] = self.component_pool.stats()
+        if getattr(self.pipeline, "_lab_adapters", None) is not None:
+            info["adapters"] = self.pipeline._lab_adapters.info()
         
         return info
\ No newline at end of file
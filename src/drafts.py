@@ -0,0 +1,119 @@
+"""
+Draft-Then-Refine Generation
+
+When users pick one image out of many candidates, most full-resolution
+generations are thrown away. This module supports a two-stage mode: many
+cheap low-resolution, few-step drafts generated in batches, then only the
+chosen ones refined by upscaling their latents and partially denoising
+them again at full resolution (image-to-image starting from latents).
+"""
+
+from typing import List, Optional, Tuple
+
+import torch
+import torch.nn.functional as F
+from PIL import Image
+
+
+def draft_size(width: int, height: int, draft_scale: float, multiple: int = 8) -> Tuple[int, int]:
+    """Draft resolution for a target size, snapped to the VAE's multiple"""
+    if not 0.0 < draft_scale <= 1.0:
+        raise ValueError("draft_scale must be in (0, 1]")
+    return tuple(max(multiple * 8, int(round(side * draft_scale / multiple)) * multiple)
+                 for side in (width, height))
+
+
+def upscale_latents(latents: torch.Tensor, width: int, height: int,
+                    scale_factor: int = 8, mode: str = "bicubic") -> torch.Tensor:
+    """
+    Resize latents to the latent grid of a width x height image
+
+    Interpolation blurs the latents; the partial denoising that follows
+    restores the detail.
+    """
+    size = (height // scale_factor, width // scale_factor)
+    return F.interpolate(latents.float(), size=size, mode=mode, align_corners=False).to(latents.dtype)
+
+
+@torch.no_grad()
+def decode_latents(pipeline, latents: torch.Tensor) -> List[Image.Image]:
+    """Decode pipeline latents to PIL images, running the safety checker if there is one"""
+    vae = pipeline.vae
+    images = vae.decode(latents / vae.config.scaling_factor, return_dict=False)[0]
+    has_nsfw_concept = None
+    if hasattr(pipeline, "run_safety_checker"):
+        images, has_nsfw_concept = pipeline.run_safety_checker(images, images.device, latents.dtype)
+    do_denormalize = None if has_nsfw_concept is None else [not flag for flag in has_nsfw_concept]
+    return pipeline.image_processor.postprocess(images, output_type="pil", do_denormalize=do_denormalize)
+
+
+def relative_cost(count: int,
+                  selected: int,
+                  draft_pixels: float,
+                  draft_steps: int,
+                  refine_steps: int,
+                  strength: float,
+                  full_steps: int) -> float:
+    """
+    UNet compute of draft-then-refine relative to generating every candidate in full
+
+    UNet cost is taken as proportional to pixel count times steps.
+
+    Args:
+        count: Drafts generated
+        selected: Drafts refined
+        draft_pixels: Draft pixel count as a fraction of the full size
+        draft_steps: Steps per draft
+        refine_steps: Steps of the refinement schedule (strength of them run)
+        strength: Fraction of the refinement schedule that runs
+        full_steps: Steps of a full generation
+    """
+    drafts = count * draft_pixels * draft_steps
+    refinements = selected * refine_steps * strength
+    return (drafts + refinements) / (count * full_steps)
+
+
+class DraftSet:
+    """
+    Drafts of one prompt: preview images plus the latents to refine from
+    """
+
+    def __init__(self,
+                 prompt: str,
+                 negative_prompt: Optional[str],
+                 width: int,
+                 height: int,
+                 guidance_scale: float,
+                 num_inference_steps: int,
+                 seeds: List[int],
+                 latents: torch.Tensor,
+                 images: List[Image.Image]):
+        """
+        Args:
+            prompt: Prompt of the drafts
+            negative_prompt: Negative prompt of the drafts
+            width: Full-resolution width refinements target
+            height: Full-resolution height refinements target
+            guidance_scale: Guidance scale the drafts used
+            num_inference_steps: Steps per draft
+            seeds: Seed of each draft, reused for its refinement
+            latents: Final draft latents, one per draft
+            images: Preview images, one per draft
+        """
+        self.prompt = prompt
+        self.negative_prompt = negative_prompt
+        self.width = width
+        self.height = height
+        self.guidance_scale = guidance_scale
+        self.num_inference_steps = num_inference_steps
+        self.seeds = seeds
+        self.latents = latents
+        self.images = images
+
+    def __len__(self) -> int:
+        return len(self.images)
+
+    @property
+    def draft_size(self) -> Tuple[int, int]:
+        """(width, height) of the drafts"""
+        return self.images[0].size
@@ -0,0 +1,149 @@
+"""
+Fast Approximate VAE Decoding
+
+At low step counts the full VAE decode is a large share of a generation.
+This module swaps in a tiny distilled autoencoder (TAESD by Ollin Boer Bohan)
+for the decode of individual calls: a few MB of weights and a fraction of
+the decode time, at preview quality. The full VAE stays loaded for final
+renders.
+"""
+
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+import torch
+from diffusers import AutoencoderTiny
+
+try:
+    from .model_cache import attach_module, attached_module
+except ImportError:
+    from model_cache import attach_module, attached_module
+
+DECODERS = ("full", "tiny")
+
+# Tiny autoencoders matching each family's latent space
+TINY_DECODERS = {
+    "sd": "madebyollin/taesd",
+    "sdxl": "madebyollin/taesdxl",
+    "sd3": "madebyollin/taesd3",
+}
+
+
+def tiny_decoder_id(pipeline) -> str:
+    """Tiny autoencoder for a pipeline's latent space"""
+    if pipeline.vae.config.latent_channels == 16:
+        return TINY_DECODERS["sd3"]
+    if getattr(pipeline, "text_encoder_2", None) is not None:
+        return TINY_DECODERS["sdxl"]
+    return TINY_DECODERS["sd"]
+
+
+def load_tiny_decoder(pipeline, model_id: Optional[str] = None) -> AutoencoderTiny:
+    """
+    The pipeline's tiny autoencoder, loaded on first use
+
+    It is attached to the pipeline (see model_cache.attach_module()), so
+    it follows the full VAE's dtype and device, including when the model
+    cache demotes or promotes the pipeline.
+
+    Args:
+        pipeline: Pipeline with a VAE
+        model_id: Tiny autoencoder to load (default: matched to the pipeline)
+    """
+    tiny = attached_module(pipeline, "tiny_vae")
+    if tiny is not None and model_id in (None, pipeline._lab_tiny_vae_id):
+        return tiny
+    model_id = model_id or tiny_decoder_id(pipeline)
+    print(f"🪶 Loading tiny decoder: {model_id}")
+    tiny = AutoencoderTiny.from_pretrained(model_id, torch_dtype=pipeline.vae.dtype)
+    tiny = tiny.to(pipeline.vae.device).eval()
+    attach_module(pipeline, "tiny_vae", tiny)
+    pipeline._lab_tiny_vae_id = model_id
+    return tiny
+
+
+@contextmanager
+def use_decoder(pipeline, decoder: str = "full"):
+    """
+    Decode with the given decoder inside the block
+
+    Args:
+        pipeline: Pipeline about to be called
+        decoder: 'full' (the pipeline's VAE) or 'tiny'
+    """
+    if decoder not in DECODERS:
+        raise ValueError(f"Unknown decoder: {decoder}. Choose from {DECODERS}")
+    if decoder == "full":
+        yield pipeline.vae
+        return
+    tiny = load_tiny_decoder(pipeline)
+    vae = pipeline.vae
+    # Plain attribute swap: the pipeline's config keeps pointing at the full VAE
+    pipeline.__dict__["vae"] = tiny
+    try:
+        yield tiny
+    finally:
+        pipeline.__dict__["vae"] = vae
+
+
+def _decode_time(vae, latents: torch.Tensor, repeats: int) -> Dict[str, float]:
+    device = latents.device
+    latents = latents / vae.config.scaling_factor
+    with torch.no_grad():
+        vae.decode(latents)  # warm-up
+        if device.type == "cuda":
+            torch.cuda.synchronize(device)
+            torch.cuda.reset_peak_memory_stats(device)
+            baseline = torch.cuda.memory_allocated(device)
+        best = float("inf")
+        for _ in range(repeats):
+            start = time.perf_counter()
+            vae.decode(latents)
+            if device.type == "cuda":
+                torch.cuda.synchronize(device)
+            best = min(best, time.perf_counter() - start)
+    peak = (torch.cuda.max_memory_allocated(device) - baseline) / 1024 ** 2 if device.type == "cuda" else None
+    return {
+        "seconds": best,
+        "peak_memory_mb": round(peak, 1) if peak is not None else None,
+        "weights_mb": round(sum(p.numel() * p.element_size() for p in vae.parameters()) / 1024 ** 2, 1),
+    }
+
+
+def benchmark_decoders(lab,
+                       width: int = 512,
+                       height: int = 512,
+                       batch_size: int = 1,
+                       repeats: int = 5) -> List[Dict]:
+    """
+    Compare decode latency and memory of the full VAE and the tiny decoder
+
+    Args:
+        lab: DiffusionLab with a model loaded
+        width: Image width to decode
+        height: Image height to decode
+        batch_size: Latents decoded per call
+        repeats: Timed decodes per decoder (the fastest one counts)
+
+    Returns:
+        One row per decoder with seconds, peak activation memory (CUDA
+        only) and weight size
+    """
+    pipeline = lab.pipeline
+    vae = pipeline.vae
+    scale = pipeline.vae_scale_factor
+    latents = torch.randn(batch_size, vae.config.latent_channels, height // scale, width // scale,
+                          device=vae.device, dtype=vae.dtype)
+
+    rows = []
+    for decoder in DECODERS:
+        with use_decoder(pipeline, decoder) as model:
+            rows.append({"decoder": decoder, **_decode_time(model, latents, repeats)})
+
+    print(f"📊 Decoder benchmark ({batch_size}x {width}x{height})")
+    for row in rows:
+        memory = f"{row['peak_memory_mb']:8.1f} MB peak" if row["peak_memory_mb"] is not None else ""
+        print(f"  {row['decoder']:<5} {row['seconds'] * 1000:8.1f} ms  "
+              f"{rows[0]['seconds'] / row['seconds']:5.1f}x  {row['weights_mb']:7.1f} MB weights  {memory}")
+    return rows
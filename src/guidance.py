@@ -0,0 +1,288 @@
+"""
+Classifier-Free Guidance Schedules
+
+With guidance, every denoising step runs the UNet on a doubled batch
+(unconditional + conditional). This module offers two ways to skip part of
+that work:
+
+- truncation: stop guidance after a fraction of the steps; the remaining
+  steps run a single conditional pass (late steps mostly refine detail)
+- uncond skipping: evaluate the unconditional branch only every k steps
+  and reuse the last unconditional prediction in between
+"""
+
+import math
+import time
+from typing import Dict, List, Optional, Sequence
+
+import torch
+from diffusers.models.unets.unet_2d_condition import UNet2DConditionOutput
+
+
+def relative_unet_cost(num_inference_steps: int,
+                       cfg_cutoff: Optional[float] = None,
+                       uncond_interval: Optional[int] = None) -> float:
+    """
+    UNet compute of a guided generation relative to full guidance
+
+    Args:
+        num_inference_steps: Denoising steps
+        cfg_cutoff: Fraction of steps that use guidance (None: all)
+        uncond_interval: Evaluate the unconditional branch every k guided steps
+
+    Returns:
+        1.0 for full guidance, 0.5 for none
+    """
+    guided = num_inference_steps if cfg_cutoff is None else guided_steps(num_inference_steps, cfg_cutoff)
+    uncond = math.ceil(guided / uncond_interval) if uncond_interval else guided
+    return (num_inference_steps + uncond) / (2 * num_inference_steps)
+
+
+def guided_steps(num_inference_steps: int, cfg_cutoff: float) -> int:
+    """Steps that still use guidance with a cutoff (at least one)"""
+    if not 0.0 < cfg_cutoff <= 1.0:
+        raise ValueError("cfg_cutoff must be in (0, 1]")
+    return max(1, math.ceil(num_inference_steps * cfg_cutoff))
+
+
+# Loop tensors that pipelines double for guidance (SDXL adds the pooled text embeds and time ids)
+GUIDED_TENSORS = ("prompt_embeds", "add_text_embeds", "add_time_ids")
+
+
+class CFGTruncation:
+    """
+    Step callback that turns guidance off after a fraction of the steps
+
+    Sets the pipeline's guidance scale to 0 and drops the unconditional
+    half of the doubled loop tensors, so the remaining steps run a single
+    UNet pass.
+    """
+
+    def __init__(self, cfg_cutoff: float, pipeline=None):
+        """
+        Args:
+            cfg_cutoff: Fraction of steps that use guidance
+            pipeline: Pipeline the callback will run on; decides which
+                doubled tensors are halved (default: prompt_embeds only)
+        """
+        guided_steps(1, cfg_cutoff)  # validate
+        self.cfg_cutoff = cfg_cutoff
+        self.tensor_inputs = ["prompt_embeds"]
+        if pipeline is not None:
+            exposed = getattr(pipeline, "_callback_tensor_inputs", [])
+            self.tensor_inputs = [name for name in GUIDED_TENSORS if name in exposed]
+            unet = getattr(pipeline, "unet", None)
+            needed = ["prompt_embeds"]
+            if getattr(getattr(unet, "config", None), "addition_embed_type", None) is not None:
+                needed += ["add_text_embeds", "add_time_ids"]
+            missing = [name for name in needed if name not in self.tensor_inputs]
+            if missing:
+                raise ValueError(f"cfg_cutoff isn't supported by {type(pipeline).__name__}: "
+                                 f"its step callbacks can't update {missing}")
+
+    def __call__(self, pipe, step, timestep, callback_kwargs):
+        # num_timesteps is the real loop length (shorter for img2img strength < 1)
+        if step + 1 != guided_steps(pipe.num_timesteps, self.cfg_cutoff):
+            return None
+        if not pipe.do_classifier_free_guidance:
+            return None
+        pipe._guidance_scale = 0.0
+        return {name: callback_kwargs[name].chunk(2)[-1]
+                for name in self.tensor_inputs if name in callback_kwargs}
+
+
+def _take_half(value, batch: int):
+    """Conditional half of a batched argument; other values pass through"""
+    if torch.is_tensor(value) and value.ndim > 0 and value.shape[0] == batch:
+        return value[batch // 2:]
+    if isinstance(value, dict):
+        return {key: _take_half(item, batch) for key, item in value.items()}
+    return value
+
+
+class UncondSkipping:
+    """
+    UNet forward wrapper that reuses the unconditional prediction
+
+    On guided calls (unconditional half first, as diffusers batches them)
+    the full batch runs every `interval` calls; in between only the
+    conditional half runs and the cached unconditional prediction is
+    prepended. Also a step callback that follows the pipeline's guidance
+    state, so it stops splitting batches once guidance is switched off.
+    """
+
+    tensor_inputs: List[str] = []
+
+    def __init__(self, unet, interval: int = 2):
+        """
+        Args:
+            unet: UNet to wrap
+            interval: Run the unconditional branch every `interval` steps
+        """
+        if interval < 1:
+            raise ValueError("interval must be at least 1")
+        self.unet = unet
+        self.interval = interval
+        self.guided = False
+        self.skipped = 0
+        self._original_forward = None
+        self._had_instance_forward = False
+        self._uncond = None
+        self._calls = 0
+
+    def __enter__(self):
+        self.install()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.remove()
+
+    def install(self):
+        """Wrap the UNet's current forward (which may itself be wrapped)"""
+        if self._original_forward is not None:
+            return
+        self._had_instance_forward = "forward" in vars(self.unet)
+        self._original_forward = self.unet.forward
+        self.unet.forward = self._forward
+
+    def remove(self):
+        """Restore the forward that was in place before install()"""
+        if self._original_forward is None:
+            return
+        if self._had_instance_forward:
+            self.unet.forward = self._original_forward
+        else:
+            del self.unet.forward
+        self._original_forward = None
+        self._uncond = None
+
+    def start(self, guided: bool):
+        """Begin a generation; guided tells whether it starts with guidance on"""
+        self.guided = guided
+        self._uncond = None
+        self._calls = 0
+
+    def __call__(self, pipe, step, timestep, callback_kwargs):
+        self.guided = bool(pipe.do_classifier_free_guidance)
+        return None
+
+    def _forward(self, sample, timestep, encoder_hidden_states, *args, **kwargs):
+        batch = sample.shape[0]
+        if not self.guided or args or batch % 2:
+            return self._original_forward(sample, timestep, encoder_hidden_states, *args, **kwargs)
+
+        refresh = (self._calls % self.interval == 0 or self._uncond is None
+                   or self._uncond.shape[1:] != sample.shape[1:])
+        self._calls += 1
+        if refresh:
+            output = self._original_forward(sample, timestep, encoder_hidden_states, **kwargs)
+            prediction = output[0] if isinstance(output, tuple) else output.sample
+            self._uncond = prediction[:batch // 2]
+            return output
+
+        self.skipped += 1
+        half = batch // 2
+        output = self._original_forward(
+            sample[half:], _take_half(timestep, batch), encoder_hidden_states[half:],
+            **{key: _take_half(value, batch) for key, value in kwargs.items()}
+        )
+        prediction = output[0] if isinstance(output, tuple) else output.sample
+        prediction = torch.cat([self._uncond, prediction])
+        if not kwargs.get("return_dict", True):
+            return (prediction,)
+        return UNet2DConditionOutput(sample=prediction)
+
+
+class GuidanceSchedule:
+    """
+    Per-call guidance controls: step callbacks plus an optional UNet wrapper
+
+    Use as a context manager around the pipeline call and pass
+    `callbacks` as step callbacks.
+    """
+
+    def __init__(self, pipeline, guidance_scale: float,
+                 cfg_cutoff: Optional[float] = None,
+                 uncond_interval: Optional[int] = None):
+        """
+        Args:
+            pipeline: Pipeline about to be called
+            guidance_scale: Guidance scale of the call
+            cfg_cutoff: Fraction of steps that use guidance (None: all)
+            uncond_interval: Evaluate the unconditional branch every k steps
+        """
+        unet = getattr(pipeline, "unet", None)
+        if unet is None and (cfg_cutoff is not None or uncond_interval is not None):
+            raise ValueError(f"Guidance schedules need a UNet pipeline, not {type(pipeline).__name__}")
+        self.guided = (unet is not None and guidance_scale > 1.0
+                       and getattr(unet.config, "time_cond_proj_dim", None) is None)
+        self.callbacks = []
+        self.skipping = None
+        if not self.guided:
+            return
+        if cfg_cutoff is not None and cfg_cutoff < 1.0:
+            self.callbacks.append(CFGTruncation(cfg_cutoff, pipeline))
+        if uncond_interval is not None and uncond_interval > 1:
+            self.skipping = UncondSkipping(unet, uncond_interval)
+            # Runs after truncation, so it sees guidance switching off
+            self.callbacks.append(self.skipping)
+
+    def __enter__(self):
+        if self.skipping is not None:
+            self.skipping.install()
+            self.skipping.start(self.guided)
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.skipping is not None:
+            self.skipping.remove()
+
+
+def benchmark_guidance(lab,
+                       prompt: str,
+                       num_inference_steps: int = 30,
+                       configs: Optional[Sequence[Dict]] = None,
+                       seed: int = 0,
+                       repeats: int = 2) -> List[Dict]:
+    """
+    Time generate_image() under different guidance schedules
+
+    Args:
+        lab: DiffusionLab with a model loaded
+        prompt: Prompt to generate
+        num_inference_steps: Steps per generation
+        configs: generate_image() keyword sets to compare (default: full
+            guidance, cfg_cutoff 0.6, uncond_interval 2, both)
+        seed: Fixed seed
+        repeats: Generations per config (the fastest one counts)
+
+    Returns:
+        One row per config with seconds per step and the expected UNet cost
+    """
+    if configs is None:
+        configs = [{}, {"cfg_cutoff": 0.6}, {"uncond_interval": 2},
+                   {"cfg_cutoff": 0.6, "uncond_interval": 2}]
+
+    lab.generate_image(prompt, num_inference_steps=1, seed=seed)  # warm-up
+    rows = []
+    for config in configs:
+        best = float("inf")
+        for _ in range(repeats):
+            start = time.perf_counter()
+            lab.generate_image(prompt, num_inference_steps=num_inference_steps, seed=seed, **config)
+            best = min(best, time.perf_counter() - start)
+        rows.append({
+            **config,
+            "seconds": best,
+            "seconds_per_step": best / num_inference_steps,
+            "expected_unet_cost": relative_unet_cost(num_inference_steps, config.get("cfg_cutoff"),
+                                                     config.get("uncond_interval")),
+        })
+
+    baseline = rows[0]["seconds"]
+    print("📊 Guidance schedule benchmark")
+    for row in rows:
+        label = ", ".join(f"{key}={row[key]}" for key in ("cfg_cutoff", "uncond_interval") if key in row)
+        print(f"  {label or 'full guidance':<36} {row['seconds_per_step'] * 1000:7.0f} ms/step  "
+              f"{row['seconds'] / baseline:5.2f}x time  (expected {row['expected_unet_cost']:.2f}x UNet)")
+    return rows
@@ -0,0 +1,69 @@
+"""
+Image Conversion Utilities
+
+This module converts between the image representations the lab hands out:
+PIL images, uint8 NumPy arrays and torch tensors. Conversions to PIL are
+deferred until something (saving, displaying) actually needs one.
+"""
+
+from typing import Optional, Union
+
+import numpy as np
+import torch
+from PIL import Image
+
+ImageLike = Union[Image.Image, np.ndarray, torch.Tensor]
+
+
+def pipeline_tensor_to_uint8(images: torch.Tensor, out: Optional[torch.Tensor] = None) -> torch.Tensor:
+    """
+    Convert a pipeline "pt" output to a contiguous uint8 NHWC batch
+
+    Diffusers returns float images in [0, 1] with NCHW layout; the
+    conversion runs on the images' device in a single pass.
+
+    Args:
+        images: Float NCHW batch
+        out: Optional preallocated uint8 NHWC buffer to write into (the
+            float input is then scaled in place)
+    """
+    images = images.detach()
+    if out is not None:
+        if images.dtype != torch.uint8:
+            images = images.mul_(255).round_().clamp_(0, 255)
+        return out.copy_(images.permute(0, 2, 3, 1))
+    if images.dtype != torch.uint8:
+        images = images.mul(255).round_().clamp_(0, 255).to(torch.uint8)
+    return images.permute(0, 2, 3, 1).contiguous()
+
+
+def to_uint8_array(image: ImageLike) -> np.ndarray:
+    """
+    View any supported image as an HWC (or NHWC) uint8 NumPy array
+
+    NumPy arrays and CPU tensors are returned without copying when they
+    already have the right dtype.
+    """
+    if isinstance(image, Image.Image):
+        return np.asarray(image.convert("RGB"))
+    if isinstance(image, torch.Tensor):
+        image = image.detach()
+        if image.dtype != torch.uint8:
+            image = image.float().mul(255).round_().clamp_(0, 255).to(torch.uint8)
+        return image.cpu().numpy()
+    array = np.asarray(image)
+    if array.dtype != np.uint8:
+        array = (np.clip(array, 0, 1) * 255).round().astype(np.uint8)
+    return array
+
+
+def to_pil(image: ImageLike) -> Image.Image:
+    """Convert a PIL image, uint8 array or tensor (HWC, or NHWC with N=1) to PIL"""
+    if isinstance(image, Image.Image):
+        return image
+    array = to_uint8_array(image)
+    if array.ndim == 4:
+        if array.shape[0] != 1:
+            raise ValueError(f"Expected a single image, got a batch of {array.shape[0]}")
+        array = array[0]
+    return Image.fromarray(array)
@@ -0,0 +1,288 @@
+"""
+Lab Metrics
+
+This module provides a small metrics registry (counters and histograms) for
+DiffusionLab operations, a Prometheus text-format exporter that can be served
+over HTTP or written to a file, and hooks for user callbacks. A disabled
+registry returns immediately from every call, so instrumentation costs
+next to nothing when metrics are off.
+"""
+
+import math
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+# Latency buckets in seconds, from a single step up to a long high-res render
+DEFAULT_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+# Metrics the lab reports: name -> (type, help)
+LAB_METRICS = {
+    "model_loads_total": ("counter", "Model loads by model and status"),
+    "model_load_seconds": ("histogram", "Model load latency in seconds"),
+    "generations_total": ("counter", "Generations by status"),
+    "generation_seconds": ("histogram", "Generation latency in seconds"),
+    "steps_total": ("counter", "Denoising steps executed"),
+    "saves_total": ("counter", "Images saved by target"),
+    "save_seconds": ("histogram", "Image save latency in seconds"),
+    "cache_hits_total": ("counter", "Cache hits by cache"),
+    "cache_misses_total": ("counter", "Cache misses by cache"),
+    "failures_total": ("counter", "Failed operations by operation"),
+}
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: Dict[str, object]) -> LabelKey:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _format_labels(key: LabelKey, extra: Sequence[Tuple[str, str]] = ()) -> str:
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    escaped = []
+    for name, value in pairs:
+        value = value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        escaped.append(f'{name}="{value}"')
+    return "{" + ",".join(escaped) + "}"
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value))
+
+
+class Counter:
+    """Monotonically increasing value per label set"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str = ""):
+        self.name = name
+        self.help = help_text
+        self.values: Dict[LabelKey, float] = {}
+
+    def inc(self, key: LabelKey, value: float = 1.0):
+        self.values[key] = self.values.get(key, 0.0) + value
+
+    def render(self) -> List[str]:
+        return [f"{self.name}{_format_labels(key)} {_format_value(value)}"
+                for key, value in sorted(self.values.items())]
+
+
+class Histogram:
+    """Bucketed distribution per label set (Prometheus cumulative buckets)"""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str = "", buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(sorted(buckets))
+        self.counts: Dict[LabelKey, List[int]] = {}
+        self.sums: Dict[LabelKey, float] = {}
+
+    def observe(self, key: LabelKey, value: float):
+        counts = self.counts.get(key)
+        if counts is None:
+            counts = self.counts[key] = [0] * (len(self.buckets) + 1)
+            self.sums[key] = 0.0
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                counts[i] += 1
+                break
+        else:
+            counts[-1] += 1
+        self.sums[key] += value
+
+    def render(self) -> List[str]:
+        lines = []
+        for key in sorted(self.counts):
+            cumulative = 0
+            bounds = list(self.buckets) + [math.inf]
+            for bound, count in zip(bounds, self.counts[key]):
+                cumulative += count
+                lines.append(f"{self.name}_bucket"
+                             f"{_format_labels(key, [('le', _format_value(bound))])} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {_format_value(self.sums[key])}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """
+    Registry of lab counters and histograms
+
+    Metric names passed to inc()/observe() are short names (e.g.
+    "generations_total"); the namespace prefix is added on export.
+    """
+
+    def __init__(self, enabled: bool = True, namespace: str = "diffusion_lab"):
+        """
+        Initialize the registry
+
+        Args:
+            enabled: Record metrics; when False every call is a no-op
+            namespace: Prefix for exported metric names
+        """
+        self.enabled = enabled
+        self.namespace = namespace
+        self._metrics: Dict[str, object] = {}
+        self._hooks: List[Callable[[dict], None]] = []
+        self._lock = threading.Lock()
+        self._server: Optional[ThreadingHTTPServer] = None
+
+        for name, (kind, help_text) in LAB_METRICS.items():
+            if kind == "counter":
+                self.counter(name, help_text)
+            else:
+                self.histogram(name, help_text)
+
+    @classmethod
+    def from_env(cls) -> "MetricsRegistry":
+        """Create a registry enabled by DIFFUSION_LAB_METRICS=1"""
+        enabled = os.getenv("DIFFUSION_LAB_METRICS", "0").lower() in ("1", "true", "yes")
+        return cls(enabled=enabled)
+
+    def _full_name(self, name: str) -> str:
+        return f"{self.namespace}_{name}" if self.namespace else name
+
+    def counter(self, name: str, help_text: str = "") -> Counter:
+        """Register (or fetch) a counter"""
+        with self._lock:
+            if name not in self._metrics:
+                self._metrics[name] = Counter(self._full_name(name), help_text)
+            return self._metrics[name]
+
+    def histogram(self, name: str, help_text: str = "",
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        """Register (or fetch) a histogram"""
+        with self._lock:
+            if name not in self._metrics:
+                self._metrics[name] = Histogram(self._full_name(name), help_text, buckets)
+            return self._metrics[name]
+
+    def add_hook(self, hook: Callable[[dict], None]):
+        """
+        Call `hook(event)` for every recorded value
+
+        Events are dicts with "type" ("inc" or "observe"), "name", "value"
+        and "labels". Hooks run synchronously on the recording thread.
+        """
+        self._hooks.append(hook)
+
+    def remove_hook(self, hook: Callable[[dict], None]):
+        self._hooks.remove(hook)
+
+    def _emit(self, kind: str, name: str, value: float, labels: Dict[str, object]):
+        event = {"type": kind, "name": name, "value": value, "labels": labels}
+        for hook in self._hooks:
+            try:
+                hook(event)
+            except Exception as e:
+                print(f"⚠️  Metrics hook failed: {e}")
+
+    def inc(self, name: str, value: float = 1.0, **labels):
+        """Increment a counter"""
+        if not self.enabled:
+            return
+        metric = self._metrics.get(name) or self.counter(name)
+        with self._lock:
+            metric.inc(_label_key(labels), value)
+        if self._hooks:
+            self._emit("inc", name, value, labels)
+
+    def observe(self, name: str, value: float, **labels):
+        """Record a histogram observation"""
+        if not self.enabled:
+            return
+        metric = self._metrics.get(name) or self.histogram(name)
+        with self._lock:
+            metric.observe(_label_key(labels), value)
+        if self._hooks:
+            self._emit("observe", name, value, labels)
+
+    def timer(self, name: str, **labels):
+        """Context manager observing the elapsed seconds into a histogram"""
+        if not self.enabled:
+            return nullcontext()
+        return self._timer(name, labels)
+
+    @contextmanager
+    def _timer(self, name: str, labels: Dict[str, object]):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def render_prometheus(self) -> str:
+        """Render all metrics in the Prometheus text exposition format"""
+        lines = []
+        with self._lock:
+            for metric in self._metrics.values():
+                if metric.help:
+                    lines.append(f"# HELP {metric.name} {metric.help}")
+                lines.append(f"# TYPE {metric.name} {metric.kind}")
+                lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path: str):
+        """
+        Write the metrics to a file (e.g. for the node_exporter textfile collector)
+
+        The file is replaced atomically so scrapers never see a partial write.
+        """
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            f.write(self.render_prometheus())
+        os.replace(tmp_path, path)
+
+    def serve(self, port: int = 9100, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+        """
+        Serve GET /metrics from a background thread
+
+        Args:
+            port: Port to listen on (0 picks a free port)
+            host: Interface to bind
+
+        Returns:
+            The running server; call stop_server() to shut it down
+        """
+        registry = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = registry.render_prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.stop_server()
+        self._server = ThreadingHTTPServer((host, port), MetricsHandler)
+        thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        thread.start()
+        print(f"📊 Metrics available at http://{host}:{self._server.server_address[1]}/metrics")
+        return self._server
+
+    def stop_server(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
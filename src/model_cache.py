@@ -0,0 +1,243 @@
+"""
+Model Residency Cache
+
+This module keeps several loaded pipelines resident under a memory budget.
+The active pipeline lives on the compute device; least-recently-used
+pipelines are demoted to CPU RAM and, past the CPU budget, dropped so the
+next load maps the weights back in from the local HuggingFace cache.
+"""
+
+import gc
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Set
+
+import torch
+
+DEVICE = "device"
+CPU = "cpu"
+
+
+def attach_module(pipeline, name: str, module: torch.nn.Module):
+    """
+    Keep an auxiliary module (e.g. a tiny decoder) with a pipeline
+
+    Attached modules aren't pipeline components, but the cache counts,
+    demotes and promotes them together with the pipeline.
+    """
+    if not hasattr(pipeline, "_lab_attached_modules"):
+        pipeline._lab_attached_modules = {}
+    pipeline._lab_attached_modules[name] = module
+
+
+def attached_module(pipeline, name: str) -> Optional[torch.nn.Module]:
+    """A module attached with attach_module(), or None"""
+    return getattr(pipeline, "_lab_attached_modules", {}).get(name)
+
+
+def _attached_modules(pipeline) -> List[torch.nn.Module]:
+    return list(getattr(pipeline, "_lab_attached_modules", {}).values())
+
+
+def _modules(pipeline) -> Iterable[torch.nn.Module]:
+    components = [c for c in pipeline.components.values() if isinstance(c, torch.nn.Module)]
+    return components + _attached_modules(pipeline)
+
+
+def pipeline_bytes(pipeline, exclude: Optional[Set[int]] = None) -> int:
+    """
+    Size of a pipeline's parameters and buffers in bytes
+
+    Args:
+        pipeline: Diffusers pipeline
+        exclude: ids of modules not to count (e.g. modules shared with
+            another pipeline that is already counted)
+    """
+    exclude = exclude or set()
+    seen = set()
+    total = 0
+    for module in _modules(pipeline):
+        if id(module) in exclude:
+            continue
+        for tensor in list(module.parameters()) + list(module.buffers()):
+            if id(tensor) not in seen:
+                seen.add(id(tensor))
+                total += tensor.numel() * tensor.element_size()
+    return total
+
+
+class ModelResidencyCache:
+    """
+    LRU cache of pipelines split between device memory and CPU RAM
+
+    When the device is "cpu" there is a single tier: pipelines over the
+    budget are dropped instead of demoted.
+    """
+
+    def __init__(self,
+                 device: str,
+                 max_device_models: int = 1,
+                 max_device_bytes: Optional[int] = None,
+                 max_cached_models: int = 1,
+                 max_cpu_bytes: Optional[int] = None):
+        """
+        Initialize the cache
+
+        Args:
+            device: Compute device pipelines are promoted to
+            max_device_models: Pipelines kept on the device at once
+            max_device_bytes: Optional device memory budget in bytes
+            max_cached_models: Pipelines kept in memory at all (device + CPU)
+            max_cpu_bytes: Optional CPU RAM budget in bytes for demoted pipelines
+        """
+        self.device = device
+        self.max_device_models = max(1, max_device_models)
+        self.max_device_bytes = max_device_bytes
+        self.max_cached_models = max(1, max_cached_models)
+        self.max_cpu_bytes = max_cpu_bytes
+        if device == "cpu":
+            # Single tier: every cached pipeline is already "on the device"
+            self.max_device_models = self.max_cached_models
+            self.max_device_bytes = max_device_bytes or max_cpu_bytes
+        self._entries: "OrderedDict[str, Dict]" = OrderedDict()
+
+    def __contains__(self, model_id: str) -> bool:
+        return model_id in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _device_entries(self):
+        return [(key, entry) for key, entry in self._entries.items() if entry["location"] == DEVICE]
+
+    def _protected_modules(self, exclude_key: str) -> Set[int]:
+        """ids of modules used by other device-resident pipelines"""
+        protected = set()
+        for key, entry in self._device_entries():
+            if key != exclude_key:
+                protected.update(id(m) for m in _modules(entry["pipeline"]))
+        return protected
+
+    def _demote(self, key: str):
+        """Move a pipeline to CPU RAM, or drop it when the device is the CPU"""
+        entry = self._entries[key]
+        if self.device == "cpu":
+            self._evict(key)
+            return
+
+        # Modules shared with a pipeline still on the device stay there
+        protected = self._protected_modules(key)
+        for module in _modules(entry["pipeline"]):
+            if id(module) not in protected:
+                module.to("cpu")
+        entry["location"] = CPU
+        print(f"⬇️  Demoted {key} to CPU memory")
+
+        self._empty_device_cache()
+
+    def _evict(self, key: str):
+        """Drop a pipeline entirely; its weights reload from the disk cache"""
+        del self._entries[key]
+        gc.collect()
+        self._empty_device_cache()
+        print(f"🗑️  Evicted {key} from memory")
+
+    def _empty_device_cache(self):
+        if self.device == "cuda":
+            torch.cuda.empty_cache()
+        elif self.device == "mps":
+            torch.mps.empty_cache()
+
+    def reserve_slot(self):
+        """
+        Make room for a pipeline about to be loaded from disk
+
+        Evicts LRU pipelines past max_cached_models, then demotes LRU
+        device-resident pipelines so the new one fits on the device.
+        """
+        while len(self._entries) >= self.max_cached_models:
+            self._evict(next(iter(self._entries)))
+        device_entries = self._device_entries()
+        while len(device_entries) >= self.max_device_models:
+            self._demote(device_entries[0][0])
+            device_entries = self._device_entries()
+
+    def get(self, model_id: str):
+        """
+        Fetch a cached pipeline, promoting it to the device
+
+        Returns:
+            The pipeline, or None if it isn't cached
+        """
+        entry = self._entries.get(model_id)
+        if entry is None:
+            return None
+
+        self._entries.move_to_end(model_id)
+        entry["last_used"] = time.time()
+        if entry["location"] != DEVICE:
+            # Make room first so promotion doesn't overshoot the budget
+            others = [key for key, _ in self._device_entries()]
+            while len(others) >= self.max_device_models:
+                self._demote(others.pop(0))
+            entry["pipeline"].to(self.device)
+            for module in _attached_modules(entry["pipeline"]):
+                module.to(self.device)
+            entry["location"] = DEVICE
+            print(f"⬆️  Promoted {model_id} to {self.device}")
+        self._enforce_budgets(active=model_id)
+        return entry["pipeline"]
+
+    def put(self, model_id: str, pipeline):
+        """Add a freshly loaded pipeline that is already on the device"""
+        self._entries[model_id] = {
+            "pipeline": pipeline,
+            "location": DEVICE,
+            "bytes": pipeline_bytes(pipeline),
+            "last_used": time.time(),
+        }
+        self._entries.move_to_end(model_id)
+        self._enforce_budgets(active=model_id)
+
+    def _location_bytes(self, location: str) -> int:
+        """Bytes held in a tier, counting shared modules once"""
+        counted: Set[int] = set()
+        total = 0
+        for entry in self._entries.values():
+            if entry["location"] == location:
+                total += pipeline_bytes(entry["pipeline"], exclude=counted)
+                counted.update(id(m) for m in _modules(entry["pipeline"]))
+        return total
+
+    def _enforce_budgets(self, active: str):
+        """Demote/evict LRU pipelines until every budget holds"""
+        while True:
+            device_keys = [key for key, _ in self._device_entries() if key != active]
+            over_count = len(device_keys) + 1 > self.max_device_models
+            over_bytes = (self.max_device_bytes is not None
+                          and self._location_bytes(DEVICE) > self.max_device_bytes)
+            if not device_keys or not (over_count or over_bytes):
+                break
+            self._demote(device_keys[0])
+        self._enforce_cpu_budget()
+
+    def _enforce_cpu_budget(self):
+        while True:
+            cpu_keys = [key for key, entry in self._entries.items() if entry["location"] == CPU]
+            over_count = len(self._entries) > self.max_cached_models
+            over_bytes = (self.max_cpu_bytes is not None
+                          and self._location_bytes(CPU) > self.max_cpu_bytes)
+            if not cpu_keys or not (over_count or over_bytes):
+                break
+            self._evict(cpu_keys[0])
+
+    def residency(self) -> Dict[str, Dict]:
+        """Report where each cached pipeline lives, least recently used first"""
+        return {
+            key: {
+                "location": self.device if entry["location"] == DEVICE else CPU,
+                "size_gb": round(entry["bytes"] / 1024 ** 3, 2),
+                "last_used": entry["last_used"],
+            }
+            for key, entry in self._entries.items()
+        }
@@ -0,0 +1,292 @@
+"""
+Local Model Mirror
+
+This module stages a pipeline from the HuggingFace hub (or a local
+hub-compatible mirror server) into a plain directory, verifies every file
+against the hub's checksums in parallel, and records a manifest.json along
+with the size and mtime of each verified file. DiffusionLab can then load
+the model on offline nodes: it re-hashes only files changed since they were
+verified and reads the rest concurrently to warm the page cache, so the
+load that follows is bound by disk bandwidth rather than per-file latency.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from huggingface_hub import HfApi, snapshot_download
+
+MANIFEST = "manifest.json"
+WEIGHT_EXTENSIONS = (".safetensors", ".bin", ".ckpt", ".pt", ".pth", ".msgpack", ".h5", ".onnx", ".pb")
+CHUNK_SIZE = 16 * 1024 * 1024
+
+
+def mirror_path(root: str, model_id: str) -> str:
+    """Directory a model is staged in under a mirror root"""
+    return os.path.join(root, model_id.replace("/", "--"))
+
+
+def find_mirror(root: str, model_id: str) -> Optional[str]:
+    """Staged directory of a model, or None if it hasn't been staged"""
+    path = mirror_path(root, model_id)
+    return path if os.path.isfile(os.path.join(path, MANIFEST)) else None
+
+
+def weight_variant(filename: str) -> Optional[str]:
+    """Variant of a weight file name, e.g. "fp16" for model.fp16.safetensors"""
+    parts = os.path.basename(filename).split(".")
+    # Sharded variants look like model.fp16-00001-of-00002.safetensors
+    return parts[-2].split("-")[0] if len(parts) >= 3 else None
+
+
+def select_files(filenames: List[str], variant: Optional[str] = None,
+                 prefer_safetensors: bool = True) -> List[str]:
+    """
+    Files of a hub repo that a diffusers pipeline load actually reads
+
+    Keeps component folders and top-level configs, drops single-file
+    checkpoints at the repo root, weight files of other variants (folders
+    without the requested variant keep their default weights, as diffusers
+    falls back to them), and (with prefer_safetensors) other weight formats
+    in folders that have safetensors.
+    """
+    folders_with_variant = {os.path.dirname(name) for name in filenames
+                            if name.endswith(WEIGHT_EXTENSIONS) and variant is not None
+                            and weight_variant(name) == variant}
+    selected = []
+    for name in filenames:
+        folder = os.path.dirname(name)
+        if not name.endswith(WEIGHT_EXTENSIONS):
+            selected.append(name)
+            continue
+        if not folder:
+            continue  # root-level single-file checkpoints aren't part of the pipeline
+        wanted = variant if folder in folders_with_variant else None
+        if weight_variant(name) == wanted:
+            selected.append(name)
+
+    if prefer_safetensors:
+        folders_with_safetensors = {os.path.dirname(name) for name in selected if name.endswith(".safetensors")}
+        selected = [name for name in selected
+                    if not (name.endswith(WEIGHT_EXTENSIONS) and not name.endswith(".safetensors")
+                            and os.path.dirname(name) in folders_with_safetensors)]
+    return sorted(selected)
+
+
+def content_id(path: str, algorithm: str) -> str:
+    """
+    Hash a file the way the hub identifies it
+
+    Args:
+        path: File to hash
+        algorithm: 'sha256' (LFS files) or 'git-sha1' (git blob id of small files)
+    """
+    if algorithm == "sha256":
+        digest = hashlib.sha256()
+    elif algorithm == "git-sha1":
+        digest = hashlib.sha1()
+        digest.update(f"blob {os.path.getsize(path)}\0".encode())
+    else:
+        raise ValueError(f"Unknown hash algorithm: {algorithm}")
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def stage_model(model_id: str,
+                root: str = "models",
+                revision: Optional[str] = None,
+                variant: Optional[str] = None,
+                prefer_safetensors: bool = True,
+                workers: int = 8,
+                endpoint: Optional[str] = None,
+                token: Optional[str] = None) -> str:
+    """
+    Mirror a pipeline into a local directory and verify it
+
+    Args:
+        model_id: HuggingFace model identifier
+        root: Mirror root directory
+        revision: Branch, tag or commit (resolved to a commit in the manifest)
+        variant: Weight variant to stage (e.g. "fp16")
+        prefer_safetensors: Skip .bin/.ckpt weights where safetensors exist
+        workers: Parallel downloads and checksum workers
+        endpoint: Hub-compatible server to stage from (default: huggingface.co)
+        token: HuggingFace token (default: the logged-in token)
+
+    Returns:
+        The staged directory
+    """
+    api = HfApi(endpoint=endpoint, token=token)
+    info = api.model_info(model_id, revision=revision, files_metadata=True)
+    siblings = {sibling.rfilename: sibling for sibling in info.siblings or []}
+    files = select_files(list(siblings), variant, prefer_safetensors)
+
+    path = mirror_path(root, model_id)
+    print(f"📦 Staging {model_id}@{info.sha[:10]}: {len(files)} files -> {path}")
+    start = time.perf_counter()
+    snapshot_download(model_id, revision=info.sha, local_dir=path, allow_patterns=files,
+                      max_workers=workers, endpoint=endpoint, token=token)
+
+    entries = {}
+    for name in files:
+        sibling = siblings[name]
+        if sibling.lfs:
+            entries[name] = {"size": sibling.lfs.size, "algorithm": "sha256", "content_id": sibling.lfs.sha256}
+        else:
+            entries[name] = {"size": sibling.size, "algorithm": "git-sha1", "content_id": sibling.blob_id}
+    manifest = {
+        "model_id": model_id,
+        "revision": info.sha,
+        "variant": variant,
+        "staged_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "files": entries,
+    }
+
+    report = verify_files(path, entries, workers)
+    if report["missing"] or report["mismatch"]:
+        raise RuntimeError(f"Staged files failed verification: {report}")
+    write_manifest(path, {**manifest, "verified": verification_record(path, files)})
+
+    total = sum(entry["size"] or 0 for entry in entries.values())
+    print(f"✅ Staged and verified {total / 1024 ** 3:.2f} GB in {time.perf_counter() - start:.1f}s")
+    return path
+
+
+def read_manifest(path: str) -> Dict:
+    """Manifest of a staged model directory"""
+    with open(os.path.join(path, MANIFEST)) as f:
+        return json.load(f)
+
+
+def write_manifest(path: str, manifest: Dict):
+    """Write a staged model directory's manifest"""
+    with open(os.path.join(path, MANIFEST), "w") as f:
+        json.dump(manifest, f, indent=2)
+
+
+def _stamp(file_path: str) -> Optional[List[int]]:
+    try:
+        stat = os.stat(file_path)
+    except FileNotFoundError:
+        return None
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def verification_record(path: str, names: List[str]) -> Dict:
+    """When files were verified, with the (size, mtime) each had at the time"""
+    return {
+        "at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "stamps": {name: _stamp(os.path.join(path, name)) for name in names},
+    }
+
+
+def changed_files(path: str) -> List[str]:
+    """
+    Staged files whose size or mtime differs from when they were verified
+
+    All files count as changed for manifests without a verification record.
+    """
+    manifest = read_manifest(path)
+    stamps = manifest.get("verified", {}).get("stamps", {})
+    return [name for name in manifest["files"]
+            if stamps.get(name) is None or _stamp(os.path.join(path, name)) != stamps[name]]
+
+
+def verify_files(path: str, entries: Dict[str, Dict], workers: int = 8) -> Dict[str, List[str]]:
+    """
+    Check staged files against their recorded hashes in parallel
+
+    Returns:
+        {'ok': [...], 'mismatch': [...], 'missing': [...]}
+    """
+    def check(name: str) -> str:
+        entry = entries[name]
+        file_path = os.path.join(path, name)
+        if not os.path.isfile(file_path):
+            return "missing"
+        if entry.get("size") is not None and os.path.getsize(file_path) != entry["size"]:
+            return "mismatch"
+        return "ok" if content_id(file_path, entry["algorithm"]) == entry["content_id"] else "mismatch"
+
+    report = {"ok": [], "mismatch": [], "missing": []}
+    # Largest files first so the slowest hashes start early
+    names = sorted(entries, key=lambda name: entries[name].get("size") or 0, reverse=True)
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        for name, status in zip(names, pool.map(check, names)):
+            report[status].append(name)
+    return report
+
+
+def verify_mirror(path: str, workers: int = 8) -> Dict[str, List[str]]:
+    """Verify a staged model directory against its manifest"""
+    return verify_files(path, read_manifest(path)["files"], workers)
+
+
+def prefetch(path: str, workers: int = 8) -> int:
+    """
+    Read every staged file concurrently to pull it into the page cache
+
+    Returns:
+        Bytes read
+    """
+    def read(name: str) -> int:
+        size = 0
+        with open(os.path.join(path, name), "rb", buffering=0) as f:
+            while True:
+                chunk = f.read(CHUNK_SIZE)
+                if not chunk:
+                    return size
+                size += len(chunk)
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        return sum(pool.map(read, list(read_manifest(path)["files"])))
+
+
+def manifest_content_ids(path: str) -> Dict[str, str]:
+    """Staged file name -> hub content id (LFS sha256 or git blob id)"""
+    return {name: entry["content_id"] for name, entry in read_manifest(path)["files"].items()}
+
+
+def main():
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(description="Stage a model into a local mirror, or verify one")
+    parser.add_argument("models", nargs="+", help="HuggingFace model identifiers")
+    parser.add_argument("--root", default=os.getenv("DIFFUSION_LAB_MODEL_MIRROR", "models"),
+                        help="Mirror root directory")
+    parser.add_argument("--revision", default=None)
+    parser.add_argument("--variant", default=None, help='Weight variant, e.g. "fp16"')
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--endpoint", default=None, help="Hub-compatible server to stage from")
+    parser.add_argument("--verify", action="store_true", help="Only verify already staged models")
+    args = parser.parse_args()
+
+    for model_id in args.models:
+        if args.verify:
+            path = find_mirror(args.root, model_id)
+            if path is None:
+                print(f"❌ {model_id} is not staged under {args.root}")
+                continue
+            report = verify_mirror(path, args.workers)
+            if not report["mismatch"] and not report["missing"]:
+                manifest = read_manifest(path)
+                manifest["verified"] = verification_record(path, list(manifest["files"]))
+                write_manifest(path, manifest)
+            status = "✅" if not report["mismatch"] and not report["missing"] else "❌"
+            print(f"{status} {model_id}: {len(report['ok'])} ok, {len(report['mismatch'])} mismatched, "
+                  f"{len(report['missing'])} missing")
+        else:
+            stage_model(model_id, args.root, args.revision, args.variant,
+                        workers=args.workers, endpoint=args.endpoint)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,302 @@
+"""
+Sharded Output Store
+
+This module provides an append-only, WebDataset-style store for generated
+images. Instead of writing one file per image into a flat directory, images
+are appended to a small number of tar shards and an index maps each
+generation key to the byte offset of its data inside a shard.
+"""
+
+import io
+import json
+import os
+import tarfile
+import threading
+import time
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from PIL import Image
+
+try:
+    from .image_utils import to_pil
+except ImportError:
+    from image_utils import to_pil
+
+INDEX_FILENAME = "index.jsonl"
+SHARD_PATTERN = "shard-{:06d}.tar"
+JSON_SCALARS = (str, int, float, bool, type(None))
+
+
+def plain_metadata(params: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Keep only the JSON-plain entries of generation parameters
+
+    Drops values such as generators, tensors or cancellation tokens that
+    cannot be stored as metadata.
+    """
+    def plain(value) -> bool:
+        if isinstance(value, (list, tuple)):
+            return all(plain(item) for item in value)
+        if isinstance(value, dict):
+            return all(isinstance(k, str) and plain(v) for k, v in value.items())
+        return isinstance(value, JSON_SCALARS)
+
+    return {key: value for key, value in params.items() if plain(value)}
+
+
+class ShardedOutputStore:
+    """
+    Append-only image store backed by tar shards and a JSON-lines index
+
+    Every image is written as ``<key>.<ext>`` (plus an optional
+    ``<key>.json`` metadata member) so shards can be read by standard
+    WebDataset tooling. The index records the shard and data offset of each
+    image, which makes random-access reads a single seek + read.
+    """
+
+    def __init__(self,
+                 root: str,
+                 max_shard_items: int = 10000,
+                 max_shard_bytes: int = 1 << 30,
+                 image_format: str = "png"):
+        """
+        Open (or create) an output store
+
+        Args:
+            root: Directory holding the shards and the index
+            max_shard_items: Number of images after which a new shard is started
+            max_shard_bytes: Shard size in bytes after which a new shard is started
+            image_format: Encoding used for images ('png', 'webp' or 'jpeg')
+        """
+        self.root = root
+        self.max_shard_items = max_shard_items
+        self.max_shard_bytes = max_shard_bytes
+        self.image_format = image_format.lower()
+        self._lock = threading.Lock()
+        self._index: Dict[str, Dict[str, Any]] = {}
+        self._tar: Optional[tarfile.TarFile] = None
+        self._shard_items = 0
+
+        os.makedirs(root, exist_ok=True)
+        self._index_path = os.path.join(root, INDEX_FILENAME)
+        self._load_index()
+
+        # Shards are never reopened for writing: each session appends to a
+        # fresh shard so existing shards stay immutable.
+        existing = [name for name in os.listdir(root) if name.startswith("shard-")]
+        self._shard_id = len(existing)
+        self._index_file = open(self._index_path, "a", encoding="utf-8")
+
+    def _load_index(self):
+        """
+        Load the key -> location index from disk
+
+        A torn final line (a write interrupted by a crash) is skipped and cut
+        off, so the next append starts on a clean line.
+        """
+        if not os.path.exists(self._index_path):
+            return
+        with open(self._index_path, "rb") as f:
+            lines = f.readlines()
+        end = 0
+        for number, line in enumerate(lines):
+            if line.strip():
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    if number < len(lines) - 1:
+                        raise
+                    print(f"⚠️  Skipping torn last line of {self._index_path}")
+                    with open(self._index_path, "r+b") as f:
+                        f.truncate(end)
+                    return
+                self._index[entry["key"]] = entry
+            end += len(line)
+        if lines and not lines[-1].endswith(b"\n"):
+            # Complete entry without its newline: terminate it before appending
+            with open(self._index_path, "ab") as f:
+                f.write(b"\n")
+
+    def _shard_path(self, shard_id: int) -> str:
+        return os.path.join(self.root, SHARD_PATTERN.format(shard_id))
+
+    def _current_tar(self) -> tarfile.TarFile:
+        """Return the shard being written, rolling over to a new one when full"""
+        if self._tar is not None and (
+            self._shard_items >= self.max_shard_items
+            or self._tar.offset >= self.max_shard_bytes
+        ):
+            self._close_shard()
+            self._shard_id += 1
+
+        if self._tar is None:
+            self._tar = tarfile.open(self._shard_path(self._shard_id), "w",
+                                     format=tarfile.USTAR_FORMAT)
+            self._shard_items = 0
+        return self._tar
+
+    def _close_shard(self):
+        if self._tar is not None:
+            self._tar.close()
+            self._tar = None
+
+    def _append_member(self, tar: tarfile.TarFile, name: str, data: bytes) -> int:
+        """Append one member and return the offset of its data in the shard"""
+        info = tarfile.TarInfo(name=name)
+        info.size = len(data)
+        info.mtime = int(time.time())
+        header = info.tobuf(tar.format, tar.encoding, tar.errors)
+        data_offset = tar.offset + len(header)
+        tar.addfile(info, io.BytesIO(data))
+        return data_offset
+
+    def _encode(self, image) -> bytes:
+        """
+        Encode an image for storage
+
+        Accepts encoded bytes or anything to_pil() takes: PIL images, uint8
+        or float [0, 1] arrays and tensors, HWC or NHWC with a batch of one
+        (e.g. output_type="np" results).
+        """
+        if isinstance(image, (bytes, bytearray)):
+            return bytes(image)
+        image = to_pil(image)
+        buffer = io.BytesIO()
+        save_format = "JPEG" if self.image_format in ("jpg", "jpeg") else self.image_format.upper()
+        image.save(buffer, format=save_format)
+        return buffer.getvalue()
+
+    def put(self, key: str, image, metadata: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Append a single image to the store
+
+        Args:
+            key: Unique generation key (e.g. "sweep42/seed7")
+            image: PIL image, array or tensor (see _encode()), or
+                already-encoded bytes
+            metadata: Optional JSON-serializable generation parameters
+
+        Returns:
+            The index entry for the stored image
+        """
+        return self.put_many([(key, image, metadata)])[0]
+
+    def put_many(self, items: Iterable[Tuple[str, Any, Optional[Dict[str, Any]]]]) -> List[Dict[str, Any]]:
+        """
+        Append a batch of images, flushing the index once for the whole batch
+
+        Args:
+            items: Iterable of (key, image, metadata) tuples
+
+        Returns:
+            List of index entries, in input order
+        """
+        # Encode outside the lock; only the append itself is serialized
+        encoded = [(key, self._encode(image), metadata) for key, image, metadata in items]
+
+        entries = []
+        with self._lock:
+            # Check the whole batch first so a duplicate leaves nothing half-written
+            seen = set()
+            for key, _, _ in encoded:
+                if key in self._index or key in seen:
+                    raise KeyError(f"Key already present in output store: {key}")
+                seen.add(key)
+
+            for key, data, metadata in encoded:
+                tar = self._current_tar()
+                offset = self._append_member(tar, f"{key}.{self.image_format}", data)
+                if metadata is not None:
+                    self._append_member(tar, f"{key}.json",
+                                        json.dumps(metadata).encode("utf-8"))
+                self._shard_items += 1
+
+                entry = {
+                    "key": key,
+                    "shard": os.path.basename(self._shard_path(self._shard_id)),
+                    "offset": offset,
+                    "size": len(data),
+                    "format": self.image_format,
+                }
+                if metadata is not None:
+                    entry["metadata"] = metadata
+                self._index[key] = entry
+                self._index_file.write(json.dumps(entry) + "\n")
+                entries.append(entry)
+
+            # Make the appended data visible to readers before the index
+            if self._tar is not None:
+                self._tar.fileobj.flush()
+            self._index_file.flush()
+
+        return entries
+
+    def get_bytes(self, key: str) -> bytes:
+        """Read the encoded bytes of an image by key"""
+        entry = self._index[key]
+        with open(os.path.join(self.root, entry["shard"]), "rb") as f:
+            f.seek(entry["offset"])
+            return f.read(entry["size"])
+
+    def get(self, key: str) -> Image.Image:
+        """Read an image by key"""
+        image = Image.open(io.BytesIO(self.get_bytes(key)))
+        image.load()
+        return image
+
+    def get_many(self, keys: Iterable[str]) -> List[Image.Image]:
+        """
+        Read several images, grouping reads by shard
+
+        Args:
+            keys: Keys to read
+
+        Returns:
+            Images in the same order as ``keys``
+        """
+        keys = list(keys)
+        by_shard: Dict[str, List[int]] = {}
+        for position, key in enumerate(keys):
+            by_shard.setdefault(self._index[key]["shard"], []).append(position)
+
+        images: List[Optional[Image.Image]] = [None] * len(keys)
+        for shard, positions in by_shard.items():
+            positions.sort(key=lambda p: self._index[keys[p]]["offset"])
+            with open(os.path.join(self.root, shard), "rb") as f:
+                for position in positions:
+                    entry = self._index[keys[position]]
+                    f.seek(entry["offset"])
+                    image = Image.open(io.BytesIO(f.read(entry["size"])))
+                    image.load()
+                    images[position] = image
+        return images
+
+    def metadata(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return the metadata stored with an image, if any"""
+        return self._index[key].get("metadata")
+
+    def keys(self, prefix: str = "") -> List[str]:
+        """List stored keys, optionally restricted to a prefix"""
+        return [key for key in self._index if key.startswith(prefix)]
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._index
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(list(self._index))
+
+    def close(self):
+        """Finish the current shard and close the index"""
+        with self._lock:
+            self._close_shard()
+            if not self._index_file.closed:
+                self._index_file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -0,0 +1,78 @@
+"""
+Deduplicated Prompt Encoding
+
+Batch workloads repeat the same prompts and, far more often, the same
+negative prompts. This module runs the text encoder once per unique string
+and gathers the embeddings back into batch order by index, so duplicates
+cost an index lookup instead of a CLIP forward pass.
+"""
+
+import inspect
+from typing import Dict, List, Sequence, Tuple
+
+import torch
+
+
+def dedupe(strings: Sequence[str]) -> Tuple[List[str], List[int]]:
+    """
+    Unique strings in first-seen order, and each input's index into them
+
+    None is treated as the empty string, as the pipelines do for negatives.
+    """
+    rows: Dict[str, int] = {}
+    inverse = []
+    for string in strings:
+        inverse.append(rows.setdefault(string or "", len(rows)))
+    return list(rows), inverse
+
+
+class PromptEmbeddings:
+    """
+    Text embeddings of a set of strings, each encoded once
+
+    Works with pipelines whose encode_prompt() returns (prompt_embeds,
+    negative_prompt_embeds) and whose call accepts those embeddings
+    (Stable Diffusion 1.x/2.x and their img2img/inpainting variants).
+    """
+
+    def __init__(self, pipeline, strings: Sequence[str], batch_size: int = 64):
+        """
+        Encode the unique strings
+
+        Args:
+            pipeline: Pipeline whose text encoder to use
+            strings: Prompts and negative prompts, duplicates allowed
+            batch_size: Strings per text encoder call
+        """
+        self.unique, _ = dedupe(strings)
+        self.requested = len(strings)
+        self._rows = {string: row for row, string in enumerate(self.unique)}
+
+        device = pipeline._execution_device
+        chunks = []
+        with torch.no_grad():
+            for start in range(0, len(self.unique), batch_size):
+                chunk = self.unique[start:start + batch_size]
+                chunks.append(pipeline.encode_prompt(chunk, device, 1, False)[0])
+        self.embeds = torch.cat(chunks) if chunks else None
+
+    @staticmethod
+    def supported(pipeline) -> bool:
+        """Whether a pipeline can take precomputed embeddings from this class"""
+        if not hasattr(pipeline, "encode_prompt"):
+            return False
+        parameters = inspect.signature(pipeline.__call__).parameters
+        # Pipelines with pooled embeddings (e.g. SDXL) need more than two tensors
+        return ("negative_prompt_embeds" in parameters
+                and "pooled_prompt_embeds" not in parameters)
+
+    @property
+    def duplicates(self) -> int:
+        """Encoder passes saved by deduplication"""
+        return self.requested - len(self.unique)
+
+    def take(self, strings: Sequence[str]) -> torch.Tensor:
+        """Embeddings for strings (which must have been encoded), in order"""
+        index = torch.tensor([self._rows[string or ""] for string in strings],
+                             device=self.embeds.device)
+        return self.embeds.index_select(0, index)
@@ -0,0 +1,296 @@
+"""
+Scheduler Auto-Tuner
+
+This module sweeps schedulers x step counts for a model and a prompt set,
+measures latency, and scores each configuration by how close its output gets
+to a high-step reference render. The Pareto-optimal configurations are written
+to a JSON profile that DiffusionLab.load_generation_profile() can use as
+generation defaults.
+"""
+
+import argparse
+import json
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+import torch
+
+try:
+    from .schedulers import base_scheduler_config, get_scheduler_spec
+except ImportError:
+    from schedulers import base_scheduler_config, get_scheduler_spec
+
+DEFAULT_SCHEDULERS = ("DDIMScheduler", "EulerDiscreteScheduler", "DPMSolverMultistepScheduler",
+                      "DPM++ 2M Karras", "UniPCMultistepScheduler")
+DEFAULT_STEP_COUNTS = (8, 12, 16, 20, 30)
+
+
+def _rmse(a: np.ndarray, b: np.ndarray) -> float:
+    return float(np.sqrt(np.mean((a.astype(np.float32) - b.astype(np.float32)) ** 2)))
+
+
+def pareto_front(results: List[Dict[str, Any]],
+                 cost_key: str = "latency_s",
+                 error_key: str = "pixel_distance") -> List[Dict[str, Any]]:
+    """
+    Select the configurations no other configuration beats on both axes
+
+    Args:
+        results: Sweep results
+        cost_key: Metric to minimize first (latency)
+        error_key: Metric to minimize second (distance to the reference)
+
+    Returns:
+        Pareto-optimal results sorted by increasing cost
+    """
+    front = []
+    best_error = float("inf")
+    for result in sorted(results, key=lambda r: (r[cost_key], r[error_key])):
+        if result[error_key] < best_error:
+            front.append(result)
+            best_error = result[error_key]
+    return front
+
+
+class SchedulerTuner:
+    """
+    Sweep schedulers and step counts against a high-step reference
+
+    The tuner drives ``lab.pipeline`` directly with fixed seeds so every
+    configuration denoises the same starting noise.
+    """
+
+    def __init__(self,
+                 lab,
+                 prompts: Sequence[str],
+                 seed: int = 0,
+                 width: int = 512,
+                 height: int = 512,
+                 guidance_scale: float = 7.5,
+                 negative_prompt: Optional[str] = None):
+        """
+        Initialize the tuner
+
+        Args:
+            lab: DiffusionLab with a model loaded
+            prompts: Prompts to evaluate every configuration on
+            seed: Base seed (prompt i uses seed + i)
+            width: Image width
+            height: Image height
+            guidance_scale: Guidance scale used for every run
+            negative_prompt: Optional negative prompt used for every run
+        """
+        if lab.pipeline is None:
+            raise ValueError("No model loaded. Call load_model() first.")
+        self.lab = lab
+        self.prompts = list(prompts)
+        self.seed = seed
+        self.width = width
+        self.height = height
+        self.guidance_scale = guidance_scale
+        self.negative_prompt = negative_prompt
+
+    def _synchronize(self):
+        if self.lab.device == "cuda":
+            torch.cuda.synchronize()
+
+    def _run(self, steps: int, prompt_index: int):
+        """Run one generation and return (latency, final latents, pixels)"""
+        pipeline = self.lab.pipeline
+        final = {}
+
+        def keep_latents(pipe, step, timestep, callback_kwargs):
+            final["latents"] = callback_kwargs["latents"]
+            return callback_kwargs
+
+        generator = torch.Generator(device="cpu").manual_seed(self.seed + prompt_index)
+        self._synchronize()
+        start = time.perf_counter()
+        result = pipeline(
+            prompt=self.prompts[prompt_index],
+            negative_prompt=self.negative_prompt,
+            num_inference_steps=steps,
+            guidance_scale=self.guidance_scale,
+            width=self.width,
+            height=self.height,
+            generator=generator,
+            output_type="np",
+            callback_on_step_end=keep_latents,
+            callback_on_step_end_tensor_inputs=["latents"],
+        )
+        self._synchronize()
+        latency = time.perf_counter() - start
+
+        latents = final["latents"].float().cpu().numpy()
+        return latency, latents, np.asarray(result.images[0])
+
+    def sweep(self,
+              schedulers: Sequence[str] = DEFAULT_SCHEDULERS,
+              step_counts: Sequence[int] = DEFAULT_STEP_COUNTS,
+              reference_scheduler: str = "DDIMScheduler",
+              reference_steps: int = 100) -> List[Dict[str, Any]]:
+        """
+        Measure every scheduler x step count configuration
+
+        Args:
+            schedulers: Registered scheduler names to try
+            step_counts: Step counts to try for each scheduler
+            reference_scheduler: Scheduler used for the reference renders
+            reference_steps: Step count of the reference renders
+
+        Returns:
+            One result dict per configuration with mean latency and mean
+            latent/pixel RMSE against the reference
+        """
+        pipeline = self.lab.pipeline
+        original_scheduler = pipeline.scheduler
+        base_config = base_scheduler_config(pipeline)
+        results = []
+
+        try:
+            print(f"🎯 Rendering {len(self.prompts)} reference images "
+                  f"({reference_scheduler}, {reference_steps} steps)")
+            pipeline.scheduler = get_scheduler_spec(reference_scheduler).create(base_config)
+            # Warm-up run so one-time setup costs don't land on the first configuration
+            self._run(2, 0)
+            references = [self._run(reference_steps, i)[1:]
+                          for i in range(len(self.prompts))]
+
+            for scheduler_name in schedulers:
+                pipeline.scheduler = get_scheduler_spec(scheduler_name).create(base_config)
+                for steps in step_counts:
+                    latencies, latent_errors, pixel_errors = [], [], []
+                    for i, (ref_latents, ref_pixels) in enumerate(references):
+                        latency, latents, pixels = self._run(steps, i)
+                        latencies.append(latency)
+                        latent_errors.append(_rmse(latents, ref_latents))
+                        pixel_errors.append(_rmse(pixels, ref_pixels))
+
+                    result = {
+                        "scheduler": scheduler_name,
+                        "num_inference_steps": steps,
+                        "guidance_scale": self.guidance_scale,
+                        "latency_s": float(np.mean(latencies)),
+                        "latent_distance": float(np.mean(latent_errors)),
+                        "pixel_distance": float(np.mean(pixel_errors)),
+                    }
+                    results.append(result)
+                    print(f"  {scheduler_name:32s} {steps:3d} steps: "
+                          f"{result['latency_s']:.2f}s, pixel RMSE {result['pixel_distance']:.4f}")
+        finally:
+            pipeline.scheduler = original_scheduler
+
+        return results
+
+    def build_profile(self,
+                      results: List[Dict[str, Any]],
+                      max_pixel_distance: float = 0.05,
+                      reference: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Turn sweep results into a generation profile
+
+        Args:
+            results: Output of sweep()
+            max_pixel_distance: Largest acceptable pixel RMSE (images in [0, 1])
+                for the profile's default configuration
+            reference: Optional description of the reference configuration
+
+        Returns:
+            Profile dict with the Pareto front and a default configuration
+            (the fastest one within max_pixel_distance, else the most accurate)
+        """
+        front = pareto_front(results)
+        acceptable = [r for r in front if r["pixel_distance"] <= max_pixel_distance]
+        default = acceptable[0] if acceptable else front[-1]
+
+        return {
+            "model_id": self.lab.current_model,
+            "device": self.lab.device,
+            "width": self.width,
+            "height": self.height,
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "reference": reference,
+            "max_pixel_distance": max_pixel_distance,
+            "default": default,
+            "pareto": front,
+            "results": results,
+        }
+
+
+def tune_schedulers(lab,
+                    prompts: Sequence[str],
+                    output_path: str,
+                    schedulers: Sequence[str] = DEFAULT_SCHEDULERS,
+                    step_counts: Sequence[int] = DEFAULT_STEP_COUNTS,
+                    reference_scheduler: str = "DDIMScheduler",
+                    reference_steps: int = 100,
+                    max_pixel_distance: float = 0.05,
+                    **tuner_kwargs) -> Dict[str, Any]:
+    """
+    Sweep schedulers for a loaded model and write a generation profile
+
+    Args:
+        lab: DiffusionLab with a model loaded
+        prompts: Prompts to evaluate on
+        output_path: Where to write the JSON profile
+        schedulers: Registered scheduler names to try
+        step_counts: Step counts to try
+        reference_scheduler: Scheduler used for the reference renders
+        reference_steps: Step count of the reference renders
+        max_pixel_distance: Quality threshold for the default configuration
+        **tuner_kwargs: Additional arguments for SchedulerTuner
+
+    Returns:
+        The written profile
+    """
+    tuner = SchedulerTuner(lab, prompts, **tuner_kwargs)
+    results = tuner.sweep(schedulers, step_counts, reference_scheduler, reference_steps)
+    profile = tuner.build_profile(
+        results,
+        max_pixel_distance=max_pixel_distance,
+        reference={"scheduler": reference_scheduler, "num_inference_steps": reference_steps},
+    )
+
+    with open(output_path, "w") as f:
+        json.dump(profile, f, indent=2)
+
+    default = profile["default"]
+    print(f"💾 Profile saved to: {output_path} ({len(profile['pareto'])} Pareto configurations)")
+    print(f"⭐ Default: {default['scheduler']} with {default['num_inference_steps']} steps")
+    return profile
+
+
+def main():
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(description="Tune scheduler and step count for a model")
+    parser.add_argument("--model", required=True, help="HuggingFace model identifier")
+    parser.add_argument("--prompt", action="append", required=True,
+                        help="Prompt to evaluate (repeat for several)")
+    parser.add_argument("--output", default="generation_profile.json", help="Profile path")
+    parser.add_argument("--schedulers", nargs="+", default=list(DEFAULT_SCHEDULERS))
+    parser.add_argument("--steps", nargs="+", type=int, default=list(DEFAULT_STEP_COUNTS))
+    parser.add_argument("--reference-steps", type=int, default=100)
+    parser.add_argument("--max-pixel-distance", type=float, default=0.05)
+    parser.add_argument("--size", type=int, default=512)
+    parser.add_argument("--device", default=None)
+    args = parser.parse_args()
+
+    try:
+        from .diffusion_lab import DiffusionLab
+    except ImportError:
+        from diffusion_lab import DiffusionLab
+
+    lab = DiffusionLab(device=args.device)
+    lab.load_model(args.model)
+    tune_schedulers(lab, args.prompt, args.output,
+                    schedulers=args.schedulers,
+                    step_counts=args.steps,
+                    reference_steps=args.reference_steps,
+                    max_pixel_distance=args.max_pixel_distance,
+                    width=args.size,
+                    height=args.size)
+
+
+if __name__ == "__main__":
+    main()
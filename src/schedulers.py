@@ -0,0 +1,176 @@
+"""
+Scheduler Registry
+
+This module keeps a pluggable registry of the noise schedulers the lab knows
+about, including fast few-step samplers, together with recommended step
+counts for a few quality presets.
+"""
+
+from typing import Any, Dict, List, Optional
+
+import diffusers
+
+# Step-count presets, from lowest latency to highest fidelity
+PRESETS = ("fast", "balanced", "quality")
+
+
+class SchedulerSpec:
+    """
+    Description of a registered scheduler
+
+    Attributes:
+        name: Registry name used by the lab (e.g. "DPM++ 2M Karras")
+        class_name: Name of the diffusers scheduler class
+        config_overrides: Config values applied on top of the model's scheduler config
+        steps: Recommended num_inference_steps per preset
+        guidance_scale: Recommended guidance scale, or None for the lab default
+        description: Short human-readable note
+    """
+
+    def __init__(self,
+                 name: str,
+                 class_name: str,
+                 steps: Dict[str, int],
+                 config_overrides: Optional[Dict[str, Any]] = None,
+                 guidance_scale: Optional[float] = None,
+                 description: str = ""):
+        missing = [preset for preset in PRESETS if preset not in steps]
+        if missing:
+            raise ValueError(f"Scheduler {name} is missing step counts for presets: {missing}")
+        self.name = name
+        self.class_name = class_name
+        self.steps = dict(steps)
+        self.config_overrides = dict(config_overrides or {})
+        self.guidance_scale = guidance_scale
+        self.description = description
+
+    def create(self, base_config):
+        """Instantiate the scheduler from a pipeline's scheduler config"""
+        scheduler_class = getattr(diffusers, self.class_name, None)
+        if scheduler_class is None:
+            raise ValueError(
+                f"Scheduler class {self.class_name} is not available in diffusers {diffusers.__version__}"
+            )
+        return scheduler_class.from_config(base_config, **self.config_overrides)
+
+    def __repr__(self):
+        return f"SchedulerSpec({self.name!r}, {self.class_name}, steps={self.steps})"
+
+
+SCHEDULER_REGISTRY: Dict[str, SchedulerSpec] = {}
+
+
+def register_scheduler(spec: SchedulerSpec, overwrite: bool = False):
+    """
+    Add a scheduler to the registry
+
+    Args:
+        spec: Scheduler description
+        overwrite: Replace an existing entry with the same name
+    """
+    if spec.name in SCHEDULER_REGISTRY and not overwrite:
+        raise ValueError(f"Scheduler already registered: {spec.name}")
+    SCHEDULER_REGISTRY[spec.name] = spec
+
+
+def get_scheduler_spec(name: str) -> SchedulerSpec:
+    """Look up a registered scheduler by name"""
+    if name not in SCHEDULER_REGISTRY:
+        raise KeyError(f"Unknown scheduler: {name}. Available: {list_schedulers()}")
+    return SCHEDULER_REGISTRY[name]
+
+
+def find_scheduler_spec(scheduler) -> Optional[SchedulerSpec]:
+    """
+    Find the registry entry matching a scheduler instance
+
+    Entries that set config overrides (e.g. Karras sigmas) only match when
+    the instance's config carries the same values.
+    """
+    best = None
+    for spec in SCHEDULER_REGISTRY.values():
+        if type(scheduler).__name__ != spec.class_name:
+            continue
+        config = getattr(scheduler, "config", {})
+        if all(config.get(key) == value for key, value in spec.config_overrides.items()):
+            if best is None or len(spec.config_overrides) > len(best.config_overrides):
+                best = spec
+    return best
+
+
+def list_schedulers() -> List[str]:
+    """Names of all registered schedulers"""
+    return list(SCHEDULER_REGISTRY)
+
+
+def remember_base_config(pipeline, config=None):
+    """
+    Record the scheduler config a pipeline was loaded with
+
+    Registered schedulers are built from this config rather than from the
+    active scheduler's, so one spec's config_overrides never carry over into
+    the next.
+    """
+    pipeline._lab_scheduler_config = config if config is not None else pipeline.scheduler.config
+
+
+def base_scheduler_config(pipeline):
+    """The config recorded by remember_base_config(), or the active scheduler's"""
+    config = getattr(pipeline, "_lab_scheduler_config", None)
+    return config if config is not None else pipeline.scheduler.config
+
+
+def create_scheduler(name: str, base_config):
+    """Instantiate a registered scheduler from a pipeline's scheduler config"""
+    return get_scheduler_spec(name).create(base_config)
+
+
+def recommended_steps(name: str, preset: str = "fast") -> int:
+    """Recommended num_inference_steps for a scheduler and preset"""
+    if preset not in PRESETS:
+        raise ValueError(f"Unknown preset: {preset}. Choose from {PRESETS}")
+    return get_scheduler_spec(name).steps[preset]
+
+
+# Classic samplers
+register_scheduler(SchedulerSpec(
+    "DDIMScheduler", "DDIMScheduler",
+    steps={"fast": 20, "balanced": 30, "quality": 50},
+    description="Deterministic DDIM sampler"))
+register_scheduler(SchedulerSpec(
+    "PNDMScheduler", "PNDMScheduler",
+    steps={"fast": 25, "balanced": 35, "quality": 50},
+    description="Default Stable Diffusion v1 sampler"))
+register_scheduler(SchedulerSpec(
+    "LMSDiscreteScheduler", "LMSDiscreteScheduler",
+    steps={"fast": 25, "balanced": 35, "quality": 50},
+    description="Linear multistep sampler"))
+register_scheduler(SchedulerSpec(
+    "EulerDiscreteScheduler", "EulerDiscreteScheduler",
+    steps={"fast": 20, "balanced": 30, "quality": 50},
+    description="Euler sampler"))
+register_scheduler(SchedulerSpec(
+    "DPMSolverMultistepScheduler", "DPMSolverMultistepScheduler",
+    steps={"fast": 12, "balanced": 20, "quality": 25},
+    description="DPM-Solver multistep sampler"))
+
+# Fast samplers
+register_scheduler(SchedulerSpec(
+    "EulerAncestralDiscreteScheduler", "EulerAncestralDiscreteScheduler",
+    steps={"fast": 15, "balanced": 25, "quality": 40},
+    description="Euler ancestral sampler (adds fresh noise every step)"))
+register_scheduler(SchedulerSpec(
+    "DPM++ 2M Karras", "DPMSolverMultistepScheduler",
+    steps={"fast": 8, "balanced": 15, "quality": 25},
+    config_overrides={"algorithm_type": "dpmsolver++", "solver_order": 2,
+                      "use_karras_sigmas": True},
+    description="DPM-Solver++ 2M with Karras sigmas"))
+register_scheduler(SchedulerSpec(
+    "UniPCMultistepScheduler", "UniPCMultistepScheduler",
+    steps={"fast": 8, "balanced": 12, "quality": 20},
+    description="UniPC predictor-corrector sampler"))
+register_scheduler(SchedulerSpec(
+    "LCMScheduler", "LCMScheduler",
+    steps={"fast": 4, "balanced": 6, "quality": 8},
+    guidance_scale=1.5,
+    description="Latent Consistency sampler (needs LCM-distilled weights or an LCM-LoRA)"))
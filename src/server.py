@@ -0,0 +1,688 @@
+"""
+Local HTTP Inference Server
+
+This module serves one DiffusionLab to many clients over HTTP. A single
+worker thread owns the pipeline; requests that arrive within a short window
+are merged into one generate_batch() call, so concurrent clients share
+bucketed batches instead of queueing behind each other's generations.
+
+Endpoints:
+    POST /generate  one image (JSON body with generate_image() style keys)
+    POST /batch     {"requests": [...]}
+    GET  /status    queue, throughput and model information
+    GET  /healthz   the server process is up
+    GET  /readyz    the model is loaded and warmed up
+
+Bodies with "stream": true get newline-delimited JSON events (queued,
+started, progress, result) over a chunked response. Connections are kept
+alive between requests. A client that disconnects cancels its job; a batch
+stops at its next step once every client sharing it has gone.
+"""
+
+import argparse
+import base64
+import http.client
+import io
+import json
+import queue
+import select
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+from PIL import Image
+
+try:
+    from .cancellation import CancellationToken, GenerationCancelled, GenerationTimeout
+    from .schedulers import PRESETS
+except ImportError:
+    from cancellation import CancellationToken, GenerationCancelled, GenerationTimeout
+    from schedulers import PRESETS
+
+REQUEST_KEYS = {"prompt", "negative_prompt", "width", "height", "seed",
+                "num_inference_steps", "guidance_scale", "preset"}
+INT_KEYS = ("width", "height", "seed", "num_inference_steps")
+
+
+class ServerError(RuntimeError):
+    """Error response from a LabServer"""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(f"{status}: {message}")
+        self.status = status
+
+
+def validate_request(request: Dict[str, Any]) -> Dict[str, Any]:
+    """Check one generation request, raising ValueError on bad input"""
+    if not isinstance(request, dict):
+        raise ValueError("Each request must be a JSON object")
+    unknown = set(request) - REQUEST_KEYS
+    if unknown:
+        raise ValueError(f"Unknown request keys: {sorted(unknown)}")
+    if not isinstance(request.get("prompt"), str):
+        raise ValueError("prompt must be a string")
+    if request.get("negative_prompt") is not None and not isinstance(request["negative_prompt"], str):
+        raise ValueError("negative_prompt must be a string")
+    for key in INT_KEYS:
+        value = request.get(key)
+        if value is not None and (not isinstance(value, int) or isinstance(value, bool)):
+            raise ValueError(f"{key} must be an integer")
+    for key in ("width", "height", "num_inference_steps"):
+        if request.get(key) is not None and request[key] <= 0:
+            raise ValueError(f"{key} must be positive")
+    guidance_scale = request.get("guidance_scale")
+    if guidance_scale is not None and (not isinstance(guidance_scale, (int, float))
+                                       or isinstance(guidance_scale, bool)):
+        raise ValueError("guidance_scale must be a number")
+    preset = request.get("preset")
+    if preset is not None and preset not in PRESETS:
+        raise ValueError(f"Unknown preset: {preset}. Choose from {PRESETS}")
+    return request
+
+
+def encode_image(image) -> str:
+    """PNG bytes of an image, base64-encoded for JSON"""
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    return base64.b64encode(buffer.getvalue()).decode("ascii")
+
+
+def decode_image(data: str) -> Image.Image:
+    """Inverse of encode_image()"""
+    image = Image.open(io.BytesIO(base64.b64decode(data)))
+    image.load()
+    return image
+
+
+class _Job:
+    """Requests from one HTTP call and the events reported back to it"""
+
+    def __init__(self, requests: List[Dict[str, Any]], deadline: Optional[float]):
+        self.requests = requests
+        self.deadline = deadline
+        self.cancel_token = CancellationToken()
+        self.finished = False
+        self.events: "queue.Queue[Dict[str, Any]]" = queue.Queue()
+
+    def put(self, event: str, **data):
+        self.events.put({"event": event, **data})
+
+
+class LabServer:
+    """
+    HTTP front end sharing one loaded pipeline between many clients
+    """
+
+    def __init__(self,
+                 lab,
+                 host: str = "127.0.0.1",
+                 port: int = 8000,
+                 model_id: Optional[str] = None,
+                 snapshot: Optional[str] = None,
+                 max_batch_size: int = 4,
+                 batch_window: float = 0.05,
+                 max_pending: int = 16,
+                 warmup: bool = True,
+                 warmup_size: Tuple[int, int] = (512, 512)):
+        """
+        Initialize the server
+
+        Args:
+            lab: DiffusionLab (or anything with its generate_batch())
+            host: Interface to bind
+            port: Port to listen on (0 picks a free port)
+            model_id: Model to load on the worker thread before serving
+            snapshot: Snapshot file to load instead (see export_snapshot())
+            max_batch_size: Most images per pipeline call; also how many
+                queued requests one batch collects
+            batch_window: Seconds to wait for more requests to batch with
+            max_pending: Queued plus running HTTP requests; more get 503
+            warmup: Run a one-step generation before reporting ready
+            warmup_size: (width, height) of the warm-up generation
+        """
+        self.lab = lab
+        self.host = host
+        self.port = port
+        self.model_id = model_id
+        self.snapshot = snapshot
+        self.max_batch_size = max_batch_size
+        self.batch_window = batch_window
+        self.max_pending = max_pending
+        self.warmup = warmup
+        self.warmup_size = warmup_size
+        self.ready = threading.Event()
+        self.error: Optional[str] = None
+        self._queue: "queue.Queue[_Job]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._running = False
+        self._stopping = threading.Event()
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._threads: List[threading.Thread] = []
+        self._started = time.time()
+        self.stats = {"completed": 0, "failed": 0, "rejected": 0, "cancelled": 0, "images": 0,
+                      "batches": 0, "busy_seconds": 0.0}
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2] if self._server else (self.host, self.port)
+        return f"http://{host}:{port}"
+
+    def start(self) -> "LabServer":
+        """Start the HTTP and worker threads; returns immediately"""
+        self._server = ThreadingHTTPServer((self.host, self.port), self._handler_class())
+        self._stopping.clear()
+        self._started = time.time()
+        self._threads = [
+            threading.Thread(target=self._server.serve_forever, daemon=True),
+            threading.Thread(target=self._work, daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+        print(f"🌐 Diffusion Lab server listening on {self.url}")
+        return self
+
+    def stop(self):
+        """Stop accepting connections and let the worker exit"""
+        self._stopping.set()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        for thread in self._threads:
+            thread.join(timeout=5)
+        self._threads = []
+
+    def serve_forever(self):
+        """Start and block until interrupted"""
+        self.start()
+        try:
+            while not self._stopping.wait(1.0):
+                pass
+        except KeyboardInterrupt:
+            print("👋 Shutting down")
+        finally:
+            self.stop()
+
+    def submit(self, requests: List[Dict[str, Any]], timeout: Optional[float] = None) -> Optional[_Job]:
+        """
+        Queue requests for the worker
+
+        Returns:
+            The job to read events from, or None if max_pending is reached
+        """
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self.stats["rejected"] += 1
+                return None
+            self._pending += 1
+        job = _Job(requests, time.monotonic() + timeout if timeout else None)
+        job.put("queued", position=self._queue.qsize())
+        self._queue.put(job)
+        return job
+
+    def status(self) -> Dict[str, Any]:
+        """Readiness, queue depth and throughput counters"""
+        with self._lock:
+            stats = dict(self.stats)
+            pending, running = self._pending, self._running
+        return {
+            "ready": self.ready.is_set(),
+            "error": self.error,
+            "model": getattr(self.lab, "current_model", None),
+            "queued": self._queue.qsize(),
+            "pending": pending,
+            "running": running,
+            "max_pending": self.max_pending,
+            "mean_batch_size": stats["images"] / stats["batches"] if stats["batches"] else 0.0,
+            "uptime_seconds": round(time.time() - self._started, 1),
+            **stats,
+        }
+
+    def _finish(self, job: _Job, ok: bool, event: str, **data):
+        job.finished = True
+        with self._lock:
+            self._pending -= 1
+            if ok:
+                self.stats["completed"] += 1
+            else:
+                self.stats["cancelled" if job.cancel_token.cancelled else "failed"] += 1
+        job.put(event, **data)
+
+    def _work(self):
+        try:
+            if self.snapshot:
+                self.lab.load_snapshot(self.snapshot, self.model_id)
+            elif self.model_id:
+                self.lab.load_model(self.model_id)
+            if self.warmup:
+                width, height = self.warmup_size
+                self.lab.generate_batch([{"prompt": "", "num_inference_steps": 1,
+                                          "width": width, "height": height}])
+        except Exception as e:
+            self.error = f"Startup failed: {e}"
+            print(f"❌ {self.error}")
+            return
+        self.ready.set()
+        print("✅ Server ready")
+
+        while not self._stopping.is_set():
+            try:
+                job = self._queue.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            jobs = [job]
+            try:
+                jobs = self._collect(job)
+                self._run(jobs)
+            except Exception as e:
+                # Never let one batch take the worker down with it
+                print(f"❌ Batch failed unexpectedly: {e}")
+                with self._lock:
+                    self._running = False
+                for job in jobs:
+                    if not job.finished:
+                        self._finish(job, False, "error", status=500, error=f"Internal error: {e}")
+
+    def _collect(self, job: _Job) -> List[_Job]:
+        """Gather queued jobs arriving within the batch window"""
+        jobs, count = [job], len(job.requests)
+        end = time.monotonic() + self.batch_window
+        while count < self.max_batch_size:
+            remaining = end - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                job = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            jobs.append(job)
+            count += len(job.requests)
+        return jobs
+
+    def _run(self, jobs: List[_Job]):
+        now = time.monotonic()
+        live = []
+        for job in jobs:
+            if job.cancel_token.cancelled:
+                self._finish(job, False, "error", status=499, error="Client disconnected")
+            elif job.deadline is not None and job.deadline <= now:
+                self._finish(job, False, "error", status=504, error="Deadline exceeded while queued")
+            else:
+                live.append(job)
+        if not live:
+            return
+
+        requests, owners = [], []
+        for job in live:
+            job.put("started", batch_size=sum(len(j.requests) for j in live))
+            requests.extend(job.requests)
+            owners.extend([job] * len(job.requests))
+
+        # The batch is abandoned once every client sharing it has gone
+        cancel_token = CancellationToken()
+
+        def progress(indices: List[int], step: int, total: int):
+            if all(job.cancel_token.cancelled for job in live):
+                cancel_token.cancel("client disconnected")
+            for job in {id(owners[i]): owners[i] for i in indices}.values():
+                job.put("progress", step=step, total=total)
+
+        # The batch stops only once every job in it is overdue
+        deadlines = [job.deadline for job in live]
+        deadline = max(deadlines) if None not in deadlines else None
+
+        with self._lock:
+            self._running = True
+        start = time.perf_counter()
+        try:
+            images = self.lab.generate_batch(requests, max_batch_size=self.max_batch_size,
+                                             deadline=deadline, cancel_token=cancel_token,
+                                             progress=progress)
+        except Exception as e:
+            if len(live) > 1 and not isinstance(e, GenerationCancelled):
+                # Rerun each job alone so only the offending client sees the error
+                failed = None
+            elif isinstance(e, GenerationTimeout):
+                failed = 504
+            elif isinstance(e, GenerationCancelled):
+                failed = 499 if cancel_token.cancelled else 503
+            elif isinstance(e, (ValueError, KeyError)):
+                failed = 400
+            else:
+                failed = 500
+            error = str(e)
+        else:
+            failed = None
+            error = None
+        finally:
+            seconds = time.perf_counter() - start
+            with self._lock:
+                self._running = False
+                self.stats["busy_seconds"] += seconds
+
+        if error is not None:
+            if failed is None:
+                print(f"⚠️  Batch of {len(live)} requests failed ({error}); retrying them one by one")
+                for job in live:
+                    self._run([job])
+            else:
+                for job in live:
+                    self._finish(job, False, "error", status=failed, error=error)
+            return
+
+        with self._lock:
+            self.stats["batches"] += 1
+            self.stats["images"] += len(images)
+        offset = 0
+        for job in live:
+            count = len(job.requests)
+            self._finish(job, True, "result", images=images[offset:offset + count], seconds=seconds)
+            offset += count
+
+    def _handler_class(self):
+        server = self
+
+        class LabHandler(BaseHTTPRequestHandler):
+            # HTTP/1.1 keeps connections alive between requests
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                path = self.path.split("?")[0]
+                if path == "/healthz":
+                    self._send_json(200, {"status": "ok"})
+                elif path == "/readyz":
+                    if server.ready.is_set():
+                        self._send_json(200, {"status": "ready"})
+                    else:
+                        self._send_json(503, {"status": "failed" if server.error else "warming_up",
+                                              "error": server.error})
+                elif path == "/status":
+                    self._send_json(200, server.status())
+                else:
+                    self._send_json(404, {"error": f"Unknown endpoint: {path}"})
+
+            def do_POST(self):
+                path = self.path.split("?")[0]
+                try:
+                    body = self._read_json()
+                    if path == "/generate":
+                        stream = bool(body.pop("stream", False))
+                        timeout = body.pop("timeout", None)
+                        requests = [validate_request(body)]
+                    elif path == "/batch":
+                        stream = bool(body.get("stream", False))
+                        timeout = body.get("timeout")
+                        requests = [validate_request(request) for request in body.get("requests", [])]
+                        if not requests:
+                            raise ValueError("requests must be a non-empty list")
+                    else:
+                        self._send_json(404, {"error": f"Unknown endpoint: {path}"})
+                        return
+                    if timeout is not None and not isinstance(timeout, (int, float)):
+                        raise ValueError("timeout must be a number")
+                except ValueError as e:
+                    self._send_json(400, {"error": str(e)})
+                    return
+
+                if not server.ready.is_set():
+                    self._send_json(503, {"error": server.error or "Model is warming up"},
+                                    {"Retry-After": "5"})
+                    return
+                job = server.submit(requests, timeout)
+                if job is None:
+                    self._send_json(503, {"error": "Too many pending requests"}, {"Retry-After": "1"})
+                    return
+
+                if stream:
+                    self._stream(job)
+                    return
+                while True:
+                    event = self._next_event(job)
+                    if event is None:
+                        return
+                    if event["event"] == "result":
+                        self._send_json(200, self._result(event))
+                        return
+                    if event["event"] == "error":
+                        self._send_json(event["status"], {"error": event["error"]})
+                        return
+
+            def _read_json(self) -> Dict[str, Any]:
+                length = int(self.headers.get("Content-Length") or 0)
+                try:
+                    body = json.loads(self.rfile.read(length) or b"{}")
+                except json.JSONDecodeError as e:
+                    raise ValueError(f"Invalid JSON: {e}")
+                if not isinstance(body, dict):
+                    raise ValueError("Body must be a JSON object")
+                return body
+
+            @staticmethod
+            def _result(event: Dict[str, Any]) -> Dict[str, Any]:
+                # PNG encoding runs here, in parallel, rather than on the worker
+                return {"event": "result", "seconds": round(event["seconds"], 3),
+                        "images": [encode_image(image) for image in event["images"]]}
+
+            def _client_gone(self) -> bool:
+                # A readable socket with nothing to read was closed by the client
+                readable, _, _ = select.select([self.connection], [], [], 0)
+                if not readable:
+                    return False
+                try:
+                    return not self.connection.recv(1, socket.MSG_PEEK)
+                except OSError:
+                    return True
+
+            def _cancel(self, job: _Job):
+                job.cancel_token.cancel("client disconnected")
+                self.close_connection = True
+
+            def _next_event(self, job: _Job) -> Optional[Dict[str, Any]]:
+                """Next event of a job, or None (cancelling it) once the client has gone"""
+                while True:
+                    try:
+                        event = job.events.get(timeout=0.5)
+                    except queue.Empty:
+                        event = None
+                    if event is not None and event["event"] in ("result", "error"):
+                        return event
+                    if self._client_gone():
+                        self._cancel(job)
+                        return None
+                    if event is not None:
+                        return event
+
+            def _stream(self, job: _Job):
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                try:
+                    while True:
+                        event = self._next_event(job)
+                        if event is None:
+                            return
+                        done = event["event"] in ("result", "error")
+                        if event["event"] == "result":
+                            event = self._result(event)
+                        line = (json.dumps(event) + "\n").encode("utf-8")
+                        self.wfile.write(f"{len(line):x}\r\n".encode() + line + b"\r\n")
+                        self.wfile.flush()
+                        if done:
+                            break
+                    self.wfile.write(b"0\r\n\r\n")
+                except (BrokenPipeError, ConnectionResetError):
+                    self._cancel(job)
+
+            def _send_json(self, status: int, payload: Dict[str, Any],
+                           headers: Optional[Dict[str, str]] = None):
+                body = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return LabHandler
+
+
+class DiffusionLabClient:
+    """
+    Client for LabServer over one keep-alive connection
+
+    Not thread-safe: use one client per thread.
+    """
+
+    def __init__(self, url: str = "http://127.0.0.1:8000", timeout: float = 600.0):
+        """
+        Initialize the client
+
+        Args:
+            url: Server base URL
+            timeout: Socket timeout in seconds
+        """
+        parts = urlsplit(url)
+        self.host = parts.hostname or "127.0.0.1"
+        self.port = parts.port or 80
+        self.timeout = timeout
+        self._connection: Optional[http.client.HTTPConnection] = None
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def _request(self, method: str, path: str, payload: Optional[Dict[str, Any]] = None):
+        body = json.dumps(payload).encode("utf-8") if payload is not None else None
+        headers = {"Content-Type": "application/json"} if body is not None else {}
+        for attempt in range(2):
+            if self._connection is None:
+                self._connection = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            try:
+                self._connection.request(method, path, body=body, headers=headers)
+                return self._connection.getresponse()
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                # A kept-alive connection the server has since closed
+                self.close()
+                if attempt or method != "GET":
+                    raise
+
+    def _json(self, method: str, path: str, payload: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        response = self._request(method, path, payload)
+        data = json.loads(response.read() or b"{}")
+        if response.status >= 400:
+            raise ServerError(response.status, data.get("error") or data.get("status", ""))
+        return data
+
+    def healthy(self) -> bool:
+        """Whether /healthz answers"""
+        try:
+            response = self._request("GET", "/healthz")
+            response.read()
+            return response.status == 200
+        except OSError:
+            self.close()
+            return False
+
+    def ready(self) -> bool:
+        """Whether the model is loaded and warmed up"""
+        response = self._request("GET", "/readyz")
+        response.read()
+        return response.status == 200
+
+    def wait_until_ready(self, timeout: float = 600.0, interval: float = 0.5) -> bool:
+        """Poll /readyz until the server is ready or the timeout passes"""
+        end = time.monotonic() + timeout
+        while time.monotonic() < end:
+            try:
+                if self.ready():
+                    return True
+            except OSError:
+                self.close()
+            time.sleep(interval)
+        return False
+
+    def status(self) -> Dict[str, Any]:
+        return self._json("GET", "/status")
+
+    def generate(self, prompt: str, **params) -> Image.Image:
+        """Generate one image; params are generate_image() style keys"""
+        data = self._json("POST", "/generate", {"prompt": prompt, **params})
+        return decode_image(data["images"][0])
+
+    def batch(self, requests: List[Dict[str, Any]], timeout: Optional[float] = None) -> List[Image.Image]:
+        """Generate one image per request dict"""
+        data = self._json("POST", "/batch", {"requests": requests, "timeout": timeout})
+        return [decode_image(image) for image in data["images"]]
+
+    def stream(self, prompt: str, **params) -> Iterator[Dict[str, Any]]:
+        """
+        Generate one image and yield progress events as they arrive
+
+        The final event is {"event": "result", "images": [PIL Image]}.
+        """
+        response = self._request("POST", "/generate", {"prompt": prompt, **params, "stream": True})
+        if response.status >= 400:
+            data = json.loads(response.read() or b"{}")
+            raise ServerError(response.status, data.get("error", ""))
+        finished = False
+        try:
+            for line in response:
+                event = json.loads(line)
+                if event["event"] == "error":
+                    raise ServerError(event["status"], event["error"])
+                if event["event"] == "result":
+                    event["images"] = [decode_image(image) for image in event["images"]]
+                yield event
+            response.read()
+            finished = True
+        finally:
+            if not finished:
+                # The rest of the response is still on the wire
+                self.close()
+
+
+def main():
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(description="Serve a DiffusionLab model over HTTP")
+    parser.add_argument("--model", default=None, help="HuggingFace model identifier")
+    parser.add_argument("--snapshot", default=None, help="Snapshot file to load instead of --model")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--device", default=None)
+    parser.add_argument("--max-batch-size", type=int, default=4)
+    parser.add_argument("--batch-window", type=float, default=0.05, help="Seconds to wait for batch mates")
+    parser.add_argument("--max-pending", type=int, default=16)
+    parser.add_argument("--no-warmup", action="store_true")
+    args = parser.parse_args()
+    if not args.model and not args.snapshot:
+        parser.error("one of --model or --snapshot is required")
+
+    try:
+        from .diffusion_lab import DiffusionLab
+    except ImportError:
+        from diffusion_lab import DiffusionLab
+
+    server = LabServer(DiffusionLab(device=args.device),
+                       host=args.host,
+                       port=args.port,
+                       model_id=args.model,
+                       snapshot=args.snapshot,
+                       max_batch_size=args.max_batch_size,
+                       batch_window=args.batch_window,
+                       max_pending=args.max_pending,
+                       warmup=not args.no_warmup)
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,351 @@
+"""
+Fast-Load Pipeline Snapshots
+
+from_pretrained() parses configs, builds every module with random init,
+converts dtypes and moves components one by one. This module writes a fully
+configured pipeline (dtype, fused LoRA, scheduler) into a single file of
+pre-converted, page-aligned tensors, and restores it by building modules on
+the meta device and pointing their weights straight into a memory map, so
+a cold start costs little more than reading the file.
+
+File layout: 8-byte magic, little-endian uint64 header length, JSON header,
+then tensor data and small files (tokenizer vocabularies, ...), each
+starting on a 4096-byte boundary.
+"""
+
+import argparse
+import importlib
+import json
+import mmap
+import os
+import struct
+import tempfile
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import torch
+from diffusers import SchedulerMixin
+
+MAGIC = b"DLABSNAP"
+FORMAT_VERSION = 1
+ALIGNMENT = 4096
+# Only classes from these packages are imported when a snapshot is loaded
+TRUSTED_PACKAGES = ("diffusers", "transformers")
+
+
+def _align(offset: int) -> int:
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+def _class_path(obj) -> str:
+    cls = type(obj)
+    return f"{cls.__module__}:{cls.__qualname__}"
+
+
+def _import_class(path: str):
+    module_name, _, qualname = path.partition(":")
+    if module_name.split(".")[0] not in TRUSTED_PACKAGES:
+        raise ValueError(f"Refusing to import {path} from a snapshot")
+    obj = importlib.import_module(module_name)
+    for part in qualname.split("."):
+        obj = getattr(obj, part)
+    return obj
+
+
+def _is_transformers_model(module: torch.nn.Module) -> bool:
+    return hasattr(type(module), "config_class")
+
+
+def export_name(name: str) -> Optional[str]:
+    """
+    Tensor name as it exists in the plain module, or None to drop it
+
+    PEFT wraps LoRA-patched layers: base weights move to `<layer>.base_layer`
+    and adapters add `lora_*` tensors. With the adapters fused, the base
+    weights already contain them, so the wrapper is stripped.
+    """
+    parts = name.split(".")
+    if any(part.startswith("lora_") for part in parts):
+        return None
+    return ".".join(part for part in parts if part != "base_layer")
+
+
+class _Writer:
+    """Collects tensors (deduplicated by storage) and files, then writes them"""
+
+    def __init__(self):
+        self.tensors: List[Dict[str, Any]] = []
+        self.blobs: List[Dict[str, Any]] = []
+        self._data: List[Any] = []
+        self._ids: Dict[Tuple, int] = {}
+        self._size = 0
+
+    def _reserve(self, nbytes: int) -> int:
+        offset = _align(self._size)
+        self._size = offset + nbytes
+        return offset
+
+    def add_tensor(self, tensor: torch.Tensor) -> int:
+        if tensor.is_meta:
+            raise ValueError("Cannot snapshot a module with weights on the meta device (offloaded?)")
+        key = (tensor.device, tensor.data_ptr(), tensor.dtype, tuple(tensor.shape), tensor.stride())
+        if key in self._ids:
+            return self._ids[key]
+        nbytes = tensor.numel() * tensor.element_size()
+        self.tensors.append({
+            "dtype": str(tensor.dtype).replace("torch.", ""),
+            "shape": list(tensor.shape),
+            "offset": self._reserve(nbytes),
+            "nbytes": nbytes,
+        })
+        self._data.append(tensor)
+        self._ids[key] = len(self.tensors) - 1
+        return self._ids[key]
+
+    def add_blob(self, data: bytes) -> int:
+        self.blobs.append({"offset": self._reserve(len(data)), "nbytes": len(data)})
+        self._data.append(data)
+        return len(self.blobs) - 1
+
+    def write(self, path: str, header: Dict[str, Any]) -> int:
+        header = {**header, "tensors": self.tensors, "blobs": self.blobs}
+        encoded = json.dumps(header).encode()
+        data_start = _align(len(MAGIC) + 8 + len(encoded))
+        entries = self.tensors + self.blobs
+
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(MAGIC + struct.pack("<Q", len(encoded)) + encoded)
+            for entry, data in zip(entries, self._data):
+                f.write(b"\0" * (data_start + entry["offset"] - f.tell()))
+                if isinstance(data, torch.Tensor):
+                    data = data.detach().to("cpu").contiguous().reshape(-1).view(torch.uint8).numpy()
+                f.write(memoryview(data))
+            size = f.tell()
+        os.replace(tmp_path, path)
+        return size
+
+
+def _export_module(writer: _Writer, module: torch.nn.Module) -> Dict[str, Any]:
+    if _is_transformers_model(module):
+        config = json.loads(module.config.to_json_string(use_diff=False))
+    else:
+        config = json.loads(module.to_json_string())
+
+    def tensors(named) -> Dict[str, int]:
+        result = {}
+        for name, tensor in named:
+            name = export_name(name)
+            if name is not None:
+                result[name] = writer.add_tensor(tensor)
+        return result
+
+    return {
+        "kind": "module",
+        "class": _class_path(module),
+        "config": config,
+        # Buffers include non-persistent ones (absent from state_dict) so nothing stays on meta
+        "parameters": tensors(module.named_parameters(remove_duplicate=False)),
+        "buffers": tensors(module.named_buffers(remove_duplicate=False)),
+    }
+
+
+def _export_files(writer: _Writer, component) -> Dict[str, Any]:
+    files = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        component.save_pretrained(tmp)
+        for folder, _, names in os.walk(tmp):
+            for name in names:
+                file_path = os.path.join(folder, name)
+                with open(file_path, "rb") as f:
+                    files[os.path.relpath(file_path, tmp)] = writer.add_blob(f.read())
+    return {"kind": "files", "class": _class_path(component), "files": files}
+
+
+def export_snapshot(pipeline, path: str, metadata: Optional[Dict[str, Any]] = None) -> int:
+    """
+    Write a pipeline into a single fast-load snapshot file
+
+    Weights are stored in their current dtype. Runtime patches (attention
+    processors, forward wrappers) aren't part of the snapshot; record what
+    to reapply in metadata.
+
+    Args:
+        pipeline: Loaded diffusers pipeline
+        path: Snapshot file to write
+        metadata: JSON-serializable extras returned again by load_snapshot()
+
+    Returns:
+        Size of the written file in bytes
+    """
+    writer = _Writer()
+    components = {}
+    for name, component in pipeline.components.items():
+        if component is None:
+            components[name] = {"kind": "none"}
+        elif isinstance(component, torch.nn.Module):
+            components[name] = _export_module(writer, component)
+        elif isinstance(component, SchedulerMixin):
+            components[name] = {"kind": "config", "class": _class_path(component),
+                                "config": json.loads(component.to_json_string())}
+        elif hasattr(component, "save_pretrained"):
+            components[name] = _export_files(writer, component)
+        else:
+            raise ValueError(f"Cannot snapshot component {name} of type {type(component).__name__}")
+
+    init_kwargs = {key: value for key, value in pipeline.config.items()
+                   if not key.startswith("_") and key not in components}
+    header = {
+        "format": FORMAT_VERSION,
+        "pipeline": _class_path(pipeline),
+        "init_kwargs": init_kwargs,
+        "components": components,
+        "metadata": metadata or {},
+        "torch_version": torch.__version__,
+    }
+    start = time.perf_counter()
+    size = writer.write(path, header)
+    print(f"💾 Snapshot saved to: {path} ({size / 1024 ** 3:.2f} GB, "
+          f"{len(writer.tensors)} tensors, {time.perf_counter() - start:.1f}s)")
+    return size
+
+
+def read_header(path: str) -> Dict[str, Any]:
+    """Header of a snapshot file (components, tensor table and metadata)"""
+    with open(path, "rb") as f:
+        prefix = f.read(len(MAGIC) + 8)
+        if prefix[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not a pipeline snapshot")
+        (length,) = struct.unpack("<Q", prefix[len(MAGIC):])
+        header = json.loads(f.read(length))
+    if header.get("format") != FORMAT_VERSION:
+        raise ValueError(f"Unsupported snapshot format {header.get('format')} in {path}")
+    header["data_start"] = _align(len(MAGIC) + 8 + length)
+    return header
+
+
+def _assign(module: torch.nn.Module, name: str, tensor: torch.Tensor, parameter: bool):
+    owner_name, _, leaf = name.rpartition(".")
+    owner = module.get_submodule(owner_name) if owner_name else module
+    slots = owner._parameters if parameter else owner._buffers
+    if leaf not in slots:
+        raise ValueError(f"{type(module).__name__} has no {'parameter' if parameter else 'buffer'} {name}")
+    slots[leaf] = tensor
+
+
+def _load_module(entry: Dict[str, Any], tensor: Callable[[int], torch.Tensor]) -> torch.nn.Module:
+    cls = _import_class(entry["class"])
+    # Build the module structure without allocating or initializing weights
+    with torch.device("meta"):
+        if hasattr(cls, "config_class"):
+            module = cls(cls.config_class.from_dict(entry["config"]))
+        else:
+            module = cls.from_config(entry["config"])
+
+    parameters: Dict[int, torch.nn.Parameter] = {}
+    for name, index in entry["parameters"].items():
+        if index not in parameters:
+            # Shared by tied weights, so they stay tied
+            parameters[index] = torch.nn.Parameter(tensor(index), requires_grad=False)
+        _assign(module, name, parameters[index], parameter=True)
+    for name, index in entry["buffers"].items():
+        _assign(module, name, tensor(index), parameter=False)
+
+    missing = [name for name, value in list(module.named_parameters()) + list(module.named_buffers())
+               if value.is_meta]
+    if missing:
+        raise ValueError(f"Snapshot has no weights for {type(module).__name__}: {missing[:5]}")
+    return module.eval()
+
+
+def load_snapshot(path: str, device: Optional[str] = None) -> Tuple[Any, Dict[str, Any]]:
+    """
+    Restore a pipeline written by export_snapshot()
+
+    The file is memory-mapped copy-on-write: CPU weights are views of the
+    page cache (in-place changes such as fusing LoRA never reach the file),
+    and other devices copy straight from it.
+
+    Args:
+        path: Snapshot file
+        device: Device to move the pipeline to (default: stay on CPU)
+
+    Returns:
+        (pipeline, metadata)
+    """
+    start = time.perf_counter()
+    header = read_header(path)
+    data_start = header["data_start"]
+    with open(path, "rb") as f:
+        # The tensors keep the map alive; closing the file doesn't unmap it
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+
+    tensors: Dict[int, torch.Tensor] = {}
+
+    def tensor(index: int) -> torch.Tensor:
+        if index not in tensors:
+            entry = header["tensors"][index]
+            dtype = getattr(torch, entry["dtype"])
+            if entry["nbytes"]:
+                raw = torch.frombuffer(buffer, dtype=torch.uint8, count=entry["nbytes"],
+                                       offset=data_start + entry["offset"])
+                tensors[index] = raw.view(dtype).reshape(entry["shape"])
+            else:
+                tensors[index] = torch.empty(entry["shape"], dtype=dtype)
+        return tensors[index]
+
+    def blob(index: int) -> bytes:
+        entry = header["blobs"][index]
+        offset = data_start + entry["offset"]
+        return buffer[offset:offset + entry["nbytes"]]
+
+    components = {}
+    for name, entry in header["components"].items():
+        kind = entry["kind"]
+        if kind == "none":
+            components[name] = None
+        elif kind == "module":
+            components[name] = _load_module(entry, tensor)
+        elif kind == "config":
+            components[name] = _import_class(entry["class"]).from_config(entry["config"])
+        elif kind == "files":
+            with tempfile.TemporaryDirectory() as tmp:
+                for relative, index in entry["files"].items():
+                    file_path = os.path.join(tmp, relative)
+                    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+                    with open(file_path, "wb") as f:
+                        f.write(blob(index))
+                components[name] = _import_class(entry["class"]).from_pretrained(tmp)
+        else:
+            raise ValueError(f"Unknown snapshot component kind: {kind}")
+
+    pipeline = _import_class(header["pipeline"])(**components, **header["init_kwargs"])
+    if device is not None and device != "cpu":
+        pipeline = pipeline.to(device)
+    print(f"⚡ Snapshot loaded in {time.perf_counter() - start:.1f}s: {path}")
+    return pipeline, header["metadata"]
+
+
+def main():
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(description="Load a model with the lab's settings and snapshot it")
+    parser.add_argument("model", help="HuggingFace model identifier")
+    parser.add_argument("output", help="Snapshot file to write")
+    parser.add_argument("--device", default=None, help="Device (and so dtype) to load the model with")
+    parser.add_argument("--scheduler", default=None, help="Scheduler to store in the snapshot")
+    args = parser.parse_args()
+
+    try:
+        from .diffusion_lab import DiffusionLab
+    except ImportError:
+        from diffusion_lab import DiffusionLab
+
+    lab = DiffusionLab(device=args.device)
+    lab.load_model(args.model)
+    if args.scheduler:
+        lab.set_scheduler(args.scheduler)
+    lab.export_snapshot(args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+"""
+Tiled High-Resolution Generation
+
+This module denoises large images as overlapping latent tiles
+(MultiDiffusion-style): every step, the UNet runs on fixed-size tiles and the
+per-tile noise predictions are blended with feathered weights before a
+single scheduler step on the full latent. The VAE decodes in tiles as well,
+so peak memory depends on the tile size rather than the output size.
+"""
+
+from typing import List, Optional, Tuple
+
+import torch
+from diffusers.pipelines.stable_diffusion import StableDiffusionPipelineOutput
+from diffusers.utils.torch_utils import randn_tensor
+
+View = Tuple[int, int]
+
+
+def tile_starts(size: int, tile: int, stride: int) -> List[int]:
+    """Start offsets of tiles covering [0, size) with the given stride"""
+    if size <= tile:
+        return [0]
+    starts = list(range(0, size - tile + 1, stride))
+    if starts[-1] + tile < size:
+        starts.append(size - tile)
+    return starts
+
+
+def tile_weights(height: int, width: int, overlap: int, device, dtype) -> torch.Tensor:
+    """Feathered blending window: ramps up over `overlap` pixels at every edge"""
+    def ramp(length: int) -> torch.Tensor:
+        position = torch.arange(length, dtype=torch.float32)
+        edge = torch.minimum(position + 1, length - position)
+        return torch.clamp(edge / (overlap + 1), max=1.0)
+
+    window = ramp(height)[:, None] * ramp(width)[None, :]
+    return window.to(device=device, dtype=dtype)[None, None]
+
+
+class TiledGenerator:
+    """
+    Callable with a pipeline-like interface that generates in latent tiles
+
+    Works with Stable Diffusion style pipelines (encode_prompt, unet,
+    scheduler, vae, image_processor). Pipelines whose UNet needs extra
+    conditioning, such as SDXL's pooled text embeddings and size ids, are
+    rejected.
+    """
+
+    def __init__(self,
+                 pipeline,
+                 tile_size: int = 512,
+                 overlap: int = 128,
+                 tile_batch_size: Optional[int] = None,
+                 buffer_pool=None):
+        """
+        Initialize the generator
+
+        Args:
+            pipeline: Loaded text-to-image pipeline
+            tile_size: Tile side in pixels (the model's native resolution works best)
+            overlap: Overlap between neighbouring tiles in pixels
+            tile_batch_size: Tiles per UNet call (default: estimated from free
+                device memory on CUDA, 1 elsewhere)
+            buffer_pool: Optional BufferPool for the blending accumulators
+        """
+        unet = getattr(pipeline, "unet", None)
+        missing = [name for name in ("encode_prompt", "prepare_extra_step_kwargs", "vae", "image_processor")
+                   if not hasattr(pipeline, name)]
+        if unet is None or missing:
+            raise ValueError(f"Tiled generation needs a Stable Diffusion style UNet pipeline; "
+                             f"{type(pipeline).__name__} has no {', '.join(missing or ['unet'])}")
+        if unet.config.addition_embed_type is not None:
+            raise ValueError(f"Tiled generation does not support {type(pipeline).__name__}: its UNet "
+                             f"needs {unet.config.addition_embed_type!r} added conditioning")
+        self.pipeline = pipeline
+        self.scale = pipeline.vae_scale_factor
+        if tile_size % self.scale or overlap % self.scale:
+            raise ValueError(f"tile_size and overlap must be multiples of {self.scale}")
+        if overlap >= tile_size:
+            raise ValueError("overlap must be smaller than tile_size")
+        self.tile = tile_size // self.scale
+        self.overlap = overlap // self.scale
+        self.tile_batch_size = tile_batch_size
+        self.buffer_pool = buffer_pool
+
+    def views(self, latent_height: int, latent_width: int) -> List[View]:
+        """Top-left corners of all latent tiles"""
+        stride = self.tile - self.overlap
+        return [(y, x)
+                for y in tile_starts(latent_height, self.tile, stride)
+                for x in tile_starts(latent_width, self.tile, stride)]
+
+    def _auto_batch_size(self, device: torch.device, num_views: int, do_cfg: bool) -> int:
+        if self.tile_batch_size is not None:
+            return max(1, self.tile_batch_size)
+        if device.type != "cuda":
+            return 1
+        # Rough activation footprint of one 64x64 latent tile in fp16 with attention
+        per_tile = 1.5 * 1024 ** 3 * (self.tile * self.tile) / (64 * 64) * (2 if do_cfg else 1)
+        free, _ = torch.cuda.mem_get_info(device)
+        return int(max(1, min(num_views, free * 0.8 // per_tile)))
+
+    @torch.no_grad()
+    def __call__(self,
+                 prompt: str,
+                 negative_prompt: Optional[str] = None,
+                 width: int = 2048,
+                 height: int = 2048,
+                 num_inference_steps: int = 50,
+                 guidance_scale: float = 7.5,
+                 generator: Optional[torch.Generator] = None,
+                 output_type: str = "pil",
+                 callback_on_step_end=None,
+                 callback_on_step_end_tensor_inputs: Optional[List[str]] = None):
+        """
+        Generate one image of arbitrary size
+
+        Arguments mirror the diffusers text-to-image pipeline call; step
+        callbacks receive {"latents": full_latents}.
+
+        Returns:
+            StableDiffusionPipelineOutput with the generated image
+        """
+        pipeline = self.pipeline
+        unet = pipeline.unet
+        scheduler = pipeline.scheduler
+        device = pipeline._execution_device
+        do_cfg = guidance_scale > 1.0
+
+        if width % self.scale or height % self.scale:
+            raise ValueError(f"width and height must be multiples of {self.scale}")
+
+        prompt_embeds, negative_embeds = pipeline.encode_prompt(
+            prompt, device, 1, do_cfg, negative_prompt
+        )[:2]
+
+        latent_height, latent_width = height // self.scale, width // self.scale
+        latents = randn_tensor(
+            (1, unet.config.in_channels, latent_height, latent_width),
+            generator=generator, device=device, dtype=prompt_embeds.dtype,
+        )
+        scheduler.set_timesteps(num_inference_steps, device=device)
+        latents = latents * scheduler.init_noise_sigma
+        extra_step_kwargs = pipeline.prepare_extra_step_kwargs(generator, 0.0)
+
+        views = self.views(latent_height, latent_width)
+        tile_h = min(self.tile, latent_height)
+        tile_w = min(self.tile, latent_width)
+        window = tile_weights(tile_h, tile_w, self.overlap, device, latents.dtype)
+
+        # Accumulators are reused across steps (and across calls with a pool)
+        noise_sum = self._buffer(latents.shape, latents.dtype, device)
+        weight_sum = self._buffer((1, 1, latent_height, latent_width), latents.dtype, device).zero_()
+        for y, x in views:
+            weight_sum[:, :, y:y + tile_h, x:x + tile_w] += window
+        try:
+            latents = self._denoise(latents, views, tile_h, tile_w, window, noise_sum, weight_sum,
+                                    prompt_embeds, negative_embeds, guidance_scale, do_cfg,
+                                    extra_step_kwargs, callback_on_step_end)
+        finally:
+            if self.buffer_pool is not None:
+                self.buffer_pool.release(noise_sum, weight_sum)
+
+        if output_type == "latent":
+            return StableDiffusionPipelineOutput(images=latents, nsfw_content_detected=None)
+
+        image = self.decode(latents)
+        image, has_nsfw_concept = pipeline.run_safety_checker(image, device, prompt_embeds.dtype)
+        do_denormalize = None if has_nsfw_concept is None else [not flag for flag in has_nsfw_concept]
+        image = pipeline.image_processor.postprocess(image, output_type=output_type,
+                                                     do_denormalize=do_denormalize)
+        return StableDiffusionPipelineOutput(images=image, nsfw_content_detected=has_nsfw_concept)
+
+    def _buffer(self, shape, dtype, device) -> torch.Tensor:
+        if self.buffer_pool is None:
+            return torch.zeros(shape, dtype=dtype, device=device)
+        return self.buffer_pool.acquire(shape, dtype, device)
+
+    def _denoise(self, latents, views, tile_h, tile_w, window, noise_sum, weight_sum,
+                 prompt_embeds, negative_embeds, guidance_scale, do_cfg,
+                 extra_step_kwargs, callback_on_step_end) -> torch.Tensor:
+        pipeline = self.pipeline
+        unet = pipeline.unet
+        scheduler = pipeline.scheduler
+        batch_size = self._auto_batch_size(latents.device, len(views), do_cfg)
+
+        for i, t in enumerate(scheduler.timesteps):
+            model_input = scheduler.scale_model_input(latents, t)
+            noise_sum.zero_()
+
+            for start in range(0, len(views), batch_size):
+                batch_views = views[start:start + batch_size]
+                tiles = torch.cat([model_input[:, :, y:y + tile_h, x:x + tile_w]
+                                   for y, x in batch_views])
+                count = len(batch_views)
+                if do_cfg:
+                    tiles = torch.cat([tiles, tiles])
+                    embeds = torch.cat([negative_embeds.expand(count, -1, -1),
+                                        prompt_embeds.expand(count, -1, -1)])
+                else:
+                    embeds = prompt_embeds.expand(count, -1, -1)
+
+                noise_pred = unet(tiles, t, encoder_hidden_states=embeds, return_dict=False)[0]
+                if do_cfg:
+                    noise_uncond, noise_text = noise_pred.chunk(2)
+                    noise_pred = noise_uncond + guidance_scale * (noise_text - noise_uncond)
+
+                for k, (y, x) in enumerate(batch_views):
+                    noise_sum[:, :, y:y + tile_h, x:x + tile_w] += noise_pred[k:k + 1] * window
+
+            latents = scheduler.step(noise_sum / weight_sum, t, latents,
+                                     **extra_step_kwargs, return_dict=False)[0]
+
+            if callback_on_step_end is not None:
+                updates = callback_on_step_end(pipeline, i, t, {"latents": latents})
+                latents = (updates or {}).get("latents", latents)
+        return latents
+
+    def decode(self, latents: torch.Tensor) -> torch.Tensor:
+        """Decode latents with the VAE in tiles"""
+        vae = self.pipeline.vae
+        was_tiling = getattr(vae, "use_tiling", False)
+        vae.enable_tiling()
+        try:
+            return vae.decode(latents / vae.config.scaling_factor, return_dict=False)[0]
+        finally:
+            if not was_tiling:
+                vae.disable_tiling()
@@ -0,0 +1,1264 @@
+#!/usr/bin/env python3
+"""
+Tests for the DiffusionLab feature modules that don't need a model download
+"""
+
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+# Add src to path
+sys.path.insert(0, str(Path(__file__).parent / "src"))
+
+# Third-party packages whose absence skips a test instead of failing it
+OPTIONAL_DEPENDENCIES = {"torch", "numpy", "PIL", "diffusers", "transformers",
+                         "huggingface_hub", "tomesd"}
+
+def _reraise(e: Exception):
+    """Fail the test with e, or skip it when an optional dependency is missing"""
+    if isinstance(e, ModuleNotFoundError) and (e.name or "").split(".")[0] in OPTIONAL_DEPENDENCIES:
+        raise unittest.SkipTest(f"{e.name} is not installed") from e
+    raise e
+
+def test_output_store():
+    """Test that the sharded output store round-trips images by key"""
+    print("🧪 Testing sharded output store...")
+
+    try:
+        from output_store import ShardedOutputStore
+
+        with tempfile.TemporaryDirectory() as root:
+            with ShardedOutputStore(root, max_shard_items=2) as store:
+                store.put_many([
+                    (f"run/{i}", f"image-{i}".encode(), {"seed": i})
+                    for i in range(5)
+                ])
+
+            # Reopen: the index must be reloaded and shards left untouched
+            store = ShardedOutputStore(root)
+            assert len(store) == 5
+            assert store.get_bytes("run/3") == b"image-3"
+            assert store.metadata("run/4") == {"seed": 4}
+            assert len(list(Path(root).glob("shard-*.tar"))) == 3
+
+            # A duplicate anywhere in a batch rejects the whole batch
+            try:
+                store.put_many([("run/5", b"new", None), ("run/0", b"dup", None)])
+                assert False, "expected a duplicate key error"
+            except KeyError:
+                pass
+            assert "run/5" not in store
+            store.close()
+
+            # A torn last index line (crash mid-write) is dropped on reopen
+            index = Path(root) / "index.jsonl"
+            index.write_bytes(index.read_bytes() + b'{"key": "run/')
+            with ShardedOutputStore(root) as store:
+                assert len(store) == 5
+                store.put("run/5", b"image-5")
+            with ShardedOutputStore(root) as store:
+                assert store.get_bytes("run/5") == b"image-5"
+
+        # output_type="np" images: float [0, 1], with or without the batch dimension
+        import numpy as np
+        from PIL import Image
+        with tempfile.TemporaryDirectory() as root:
+            with ShardedOutputStore(root) as store:
+                pixels = np.random.rand(1, 8, 6, 3).astype(np.float32)
+                store.put_many([("np/batched", pixels, None), ("np/single", pixels[0], None),
+                                ("np/uint8", (pixels[0] * 255).round().astype(np.uint8), None)])
+                for key in ("np/batched", "np/single", "np/uint8"):
+                    image = store.get(key)
+                    assert image.size == (6, 8) and image.mode == "RGB"
+                    assert np.abs(np.asarray(image, dtype=np.float32) / 255 - pixels[0]).max() <= 1 / 255
+
+        from output_store import plain_metadata
+        assert plain_metadata({"seed": 1, "size": [512, 512], "generator": object()}) == {
+            "seed": 1, "size": [512, 512]}
+
+        print("✅ Output store round-trip successful")
+        return True
+    except Exception as e:
+        print(f"❌ Output store test failed: {e}")
+        _reraise(e)
+
+def test_scheduler_registry():
+    """Test scheduler registry lookups and presets"""
+    print("🧪 Testing scheduler registry...")
+
+    try:
+        from schedulers import find_scheduler_spec, list_schedulers, recommended_steps
+
+        for name in ["LCMScheduler", "DPM++ 2M Karras", "UniPCMultistepScheduler",
+                     "EulerAncestralDiscreteScheduler", "DDIMScheduler"]:
+            assert name in list_schedulers()
+        assert recommended_steps("LCMScheduler", "fast") == 4
+
+        # A Karras-configured DPM solver maps to the Karras entry
+        class DPMSolverMultistepScheduler:
+            config = {"algorithm_type": "dpmsolver++", "solver_order": 2,
+                      "use_karras_sigmas": True}
+        assert find_scheduler_spec(DPMSolverMultistepScheduler()).name == "DPM++ 2M Karras"
+
+        # Switching specs starts from the loaded config, so Karras sigmas don't leak
+        from diffusers import DPMSolverMultistepScheduler
+        from schedulers import base_scheduler_config, create_scheduler, remember_base_config
+
+        class FakePipeline:
+            scheduler = DPMSolverMultistepScheduler()
+
+        pipeline = FakePipeline()
+        remember_base_config(pipeline)
+        pipeline.scheduler = create_scheduler("DPM++ 2M Karras", base_scheduler_config(pipeline))
+        assert pipeline.scheduler.config.use_karras_sigmas
+        pipeline.scheduler = create_scheduler("DPMSolverMultistepScheduler", base_scheduler_config(pipeline))
+        assert not pipeline.scheduler.config.use_karras_sigmas
+
+        print("✅ Scheduler registry working")
+        return True
+    except Exception as e:
+        print(f"❌ Scheduler registry test failed: {e}")
+        _reraise(e)
+
+def test_pareto_front():
+    """Test Pareto selection used by the scheduler tuner"""
+    print("🧪 Testing scheduler tuner Pareto front...")
+
+    try:
+        from scheduler_tuner import pareto_front
+
+        results = [
+            {"name": "a", "latency_s": 1.0, "pixel_distance": 0.10},
+            {"name": "b", "latency_s": 2.0, "pixel_distance": 0.05},
+            {"name": "c", "latency_s": 2.5, "pixel_distance": 0.08},  # dominated by b
+            {"name": "d", "latency_s": 4.0, "pixel_distance": 0.01},
+        ]
+        front = pareto_front(results)
+        assert [r["name"] for r in front] == ["a", "b", "d"]
+
+        print("✅ Pareto front selection working")
+        return True
+    except Exception as e:
+        print(f"❌ Pareto front test failed: {e}")
+        _reraise(e)
+
+def test_step_guard():
+    """Test that the step guard enforces cancellation and deadlines"""
+    print("🧪 Testing cancellation step guard...")
+
+    try:
+        import time
+        from cancellation import (CancellationToken, GenerationCancelled,
+                                  GenerationTimeout, StepGuard)
+
+        assert StepGuard.create() is None
+
+        token = CancellationToken()
+        guard = StepGuard.create(cancel_token=token)
+        assert guard(None, 0, 999, {"latents": 1}) == {"latents": 1}
+        token.cancel("client disconnected")
+        try:
+            guard(None, 3, 500, {})
+            raise AssertionError("cancelled guard didn't raise")
+        except GenerationCancelled as e:
+            assert e.step == 3
+
+        guard = StepGuard.create(timeout=10, deadline=time.monotonic() - 1)
+        try:
+            guard.check()
+            raise AssertionError("expired guard didn't raise")
+        except GenerationTimeout:
+            pass
+
+        print("✅ Step guard working")
+        return True
+    except Exception as e:
+        print(f"❌ Step guard test failed: {e}")
+        _reraise(e)
+
+def test_metrics_registry():
+    """Test metrics recording and Prometheus rendering"""
+    print("🧪 Testing metrics registry...")
+
+    try:
+        from metrics import MetricsRegistry
+
+        disabled = MetricsRegistry(enabled=False)
+        disabled.inc("generations_total", status="ok")
+        assert "generations_total{" not in disabled.render_prometheus()
+
+        events = []
+        metrics = MetricsRegistry()
+        metrics.add_hook(events.append)
+        metrics.inc("generations_total", status="ok")
+        metrics.inc("generations_total", status="ok")
+        metrics.observe("generation_seconds", 0.3, model="sd")
+        metrics.observe("generation_seconds", 7.0, model="sd")
+
+        text = metrics.render_prometheus()
+        assert 'diffusion_lab_generations_total{status="ok"} 2.0' in text
+        assert 'diffusion_lab_generation_seconds_bucket{model="sd",le="0.5"} 1' in text
+        assert 'diffusion_lab_generation_seconds_bucket{model="sd",le="+Inf"} 2' in text
+        assert 'diffusion_lab_generation_seconds_count{model="sd"} 2' in text
+        assert len(events) == 4
+
+        print("✅ Metrics registry working")
+        return True
+    except Exception as e:
+        print(f"❌ Metrics registry test failed: {e}")
+        _reraise(e)
+
+def test_model_residency_cache():
+    """Test LRU demotion and eviction of cached pipelines"""
+    print("🧪 Testing model residency cache...")
+
+    try:
+        import torch
+        from model_cache import ModelResidencyCache
+
+        class FakePipeline:
+            def __init__(self):
+                self.components = {"unet": torch.nn.Linear(4, 4)}
+
+            def to(self, device):
+                for module in self.components.values():
+                    module.to(device)
+                return self
+
+        cache = ModelResidencyCache("cpu", max_cached_models=2)
+        for model_id in ["a", "b"]:
+            cache.reserve_slot()
+            cache.put(model_id, FakePipeline())
+        assert cache.get("a") is not None  # "b" is now least recently used
+
+        cache.reserve_slot()
+        cache.put("c", FakePipeline())
+        assert "b" not in cache and "a" in cache and "c" in cache
+        assert list(cache.residency()) == ["a", "c"]
+
+        # Attached modules (like a tiny decoder) move with their pipeline
+        from model_cache import attach_module
+
+        class RecordingModule(torch.nn.Linear):
+            # Records moves so a "cuda" tier can be tested without a GPU
+            def to(self, device):
+                self.device = device
+                return self
+
+        cache = ModelResidencyCache("cuda", max_device_models=1, max_cached_models=2)
+        first = FakePipeline()
+        first.components["unet"] = RecordingModule(4, 4)
+        tiny = RecordingModule(2, 2)
+        attach_module(first, "tiny_vae", tiny)
+        cache.reserve_slot()
+        cache.put("a", first)
+        cache.reserve_slot()  # demotes "a" to make room
+        cache.put("b", FakePipeline())
+        assert tiny.device == "cpu" and first.components["unet"].device == "cpu"
+        cache.get("a")
+        assert tiny.device == "cuda"
+
+        print("✅ Model residency cache working")
+        return True
+    except Exception as e:
+        print(f"❌ Model residency cache test failed: {e}")
+        _reraise(e)
+
+def test_component_pool():
+    """Test that identical components are deduplicated across pipelines"""
+    print("🧪 Testing shared component pool...")
+
+    try:
+        import torch
+        from component_pool import ComponentPool
+
+        class FakePipeline:
+            def __init__(self, seed):
+                torch.manual_seed(0)
+                self.vae = torch.nn.Linear(4, 4)  # identical in both pipelines
+                torch.manual_seed(seed)
+                self.unet = torch.nn.Linear(4, 4)
+
+            def register_modules(self, **modules):
+                for name, module in modules.items():
+                    setattr(self, name, module)
+
+        pool = ComponentPool(components=("vae", "unet"))
+        first, second = FakePipeline(1), FakePipeline(2)
+        pool.register(first)
+        pool.register(second)
+
+        assert second.vae is first.vae
+        assert second.unet is not first.unet
+        assert pool.stats()["reused"] == 1
+
+        # Cache snapshots are identified by the blobs their files link to
+        import os
+        with tempfile.TemporaryDirectory() as tmp:
+            blobs = Path(tmp) / "blobs"
+            blobs.mkdir()
+            (blobs / "abc123").write_bytes(b"weights")
+            fingerprints = []
+            for snapshot in ("one", "two"):
+                (Path(tmp) / snapshot / "vae").mkdir(parents=True)
+                os.symlink(blobs / "abc123", Path(tmp) / snapshot / "vae" / "model.safetensors")
+                fingerprints.append(pool.file_hashes(str(Path(tmp) / snapshot)))
+            assert fingerprints[0] == fingerprints[1] and set(fingerprints[0]) == {"vae"}
+
+        print("✅ Shared component pool working")
+        return True
+    except Exception as e:
+        print(f"❌ Shared component pool test failed: {e}")
+        _reraise(e)
+
+def test_adapter_manager():
+    """Test LoRA adapter caching, switching and fusing"""
+    print("🧪 Testing LoRA adapter manager...")
+
+    try:
+        from adapters import AdapterManager
+
+        class FakePipeline:
+            def __init__(self):
+                self.calls = []
+
+            def load_lora_weights(self, source, weight_name=None, adapter_name=None):
+                self.calls.append(("load", adapter_name))
+
+            def set_adapters(self, names, adapter_weights=None):
+                self.calls.append(("set", tuple(names), tuple(adapter_weights)))
+
+            def disable_lora(self):
+                self.calls.append(("disable",))
+
+            def delete_adapters(self, name):
+                self.calls.append(("delete", name))
+
+            def fuse_lora(self, adapter_names=None, lora_scale=1.0):
+                self.calls.append(("fuse", tuple(adapter_names)))
+
+            def unfuse_lora(self):
+                self.calls.append(("unfuse",))
+
+        pipeline = FakePipeline()
+        manager = AdapterManager(pipeline, max_adapters=2)
+        assert manager.load("style", "repo/style") is False
+        assert manager.load("style", "repo/style") is True  # cache hit
+        manager.activate({"style": 0.8})
+        manager.load("other", "repo/other")
+        manager.load("third", "repo/third")  # evicts "other", "style" is active
+        assert ("delete", "other") in pipeline.calls
+        assert list(manager.loaded) == ["style", "third"]
+
+        manager.fuse()
+        assert manager.info()["fused"] == {"style": 0.8}
+        manager.activate({"third": 1.0})  # different combination unfuses
+        assert ("unfuse",) in pipeline.calls and manager.fused is None
+
+        print("✅ LoRA adapter manager working")
+        return True
+    except Exception as e:
+        print(f"❌ LoRA adapter manager test failed: {e}")
+        _reraise(e)
+
+def test_resolution_buckets():
+    """Test bucket snapping and grouping"""
+    print("🧪 Testing resolution buckets...")
+
+    try:
+        from bucketing import ResolutionBuckets, make_buckets, native_size
+
+        assert all(w % 64 == 0 and h % 64 == 0 for w, h in make_buckets())
+
+        buckets = ResolutionBuckets([(512, 512), (640, 384), (384, 640), (768, 768)])
+        assert buckets.snap(500, 510) == (512, 512)
+        assert buckets.snap(1000, 600) == (640, 384)
+        assert buckets.snap(760, 780) == (768, 768)
+
+        # Valid sizes within range run as requested; SDXL's native size isn't shrunk
+        assert buckets.snap(640, 640) == (640, 640)
+        sdxl = ResolutionBuckets.for_native_size(1024)
+        assert sdxl.snap(1024, 1024) == (1024, 1024) and sdxl.snap(1000, 1010) == (1024, 1024)
+        assert ResolutionBuckets.for_native_size(512).buckets == make_buckets()
+
+        class FakeConfig:
+            sample_size = 128
+
+        class FakePipeline:
+            unet = type("FakeUNet", (), {"config": FakeConfig()})()
+            vae_scale_factor = 8
+
+        assert native_size(FakePipeline()) == 1024 and native_size(object()) == 512
+
+        sizes = [(512, 512), (640, 400), (500, 500), (620, 380)]
+        groups = buckets.group(sizes, keys=[30, 30, 30, 20])
+        assert groups[((512, 512), 30)] == [0, 2]
+        assert len(groups) == 3
+
+        print("✅ Resolution buckets working")
+        return True
+    except Exception as e:
+        print(f"❌ Resolution buckets test failed: {e}")
+        _reraise(e)
+
+def test_tile_layout():
+    """Test that latent tiles cover the whole image"""
+    print("🧪 Testing tiled generation layout...")
+
+    try:
+        from tiled import tile_starts
+
+        assert tile_starts(64, 64, 48) == [0]
+        assert tile_starts(32, 64, 48) == [0]
+        starts = tile_starts(256, 64, 48)
+        assert starts[0] == 0 and starts[-1] + 64 == 256
+        assert all(b - a <= 48 for a, b in zip(starts, starts[1:]))
+
+        # SDXL-style UNets with added conditioning are rejected up front
+        from tiled import TiledGenerator
+
+        class FakeConfig:
+            addition_embed_type = "text_time"
+
+        class FakePipeline:
+            unet = type("FakeUNet", (), {"config": FakeConfig()})()
+            vae = image_processor = None
+            vae_scale_factor = 8
+
+            def encode_prompt(self):
+                pass
+
+            def prepare_extra_step_kwargs(self):
+                pass
+
+        try:
+            TiledGenerator(FakePipeline())
+            assert False, "expected an SDXL-style pipeline to be rejected"
+        except ValueError:
+            pass
+        FakeConfig.addition_embed_type = None
+        assert TiledGenerator(FakePipeline(), tile_size=512, overlap=128).tile == 64
+
+        print("✅ Tile layout covers the image")
+        return True
+    except Exception as e:
+        print(f"❌ Tile layout test failed: {e}")
+        _reraise(e)
+
+def test_image_conversion():
+    """Test the uint8 conversions behind the tensor output path"""
+    print("🧪 Testing image conversion...")
+
+    try:
+        import numpy as np
+        import torch
+        from image_utils import pipeline_tensor_to_uint8, to_pil, to_uint8_array
+
+        images = torch.rand(2, 3, 8, 16)
+        batch = pipeline_tensor_to_uint8(images)
+        assert batch.dtype == torch.uint8 and batch.shape == (2, 8, 16, 3)
+        assert batch.is_contiguous()
+        assert int(batch[1, 4, 5, 2]) == round(float(images[1, 2, 4, 5]) * 255)
+
+        single = batch[:1].numpy()
+        assert to_uint8_array(single) is single
+        image = to_pil(single)
+        assert image.size == (16, 8)
+        assert np.array_equal(np.asarray(image), single[0])
+
+        print("✅ Image conversion works")
+        return True
+    except Exception as e:
+        print(f"❌ Image conversion test failed: {e}")
+        _reraise(e)
+
+def test_contact_sheet():
+    """Test grid layout, downsampling and gallery output of contact sheets"""
+    print("🧪 Testing contact sheet...")
+
+    try:
+        import numpy as np
+        from contact_sheet import ContactSheet, downsample
+
+        batch = np.zeros((5, 64, 32, 3), dtype=np.uint8)
+        batch[:, :, :, 0] = np.arange(5, dtype=np.uint8)[:, None, None] * 40
+
+        assert downsample(batch, 2).shape == (5, 32, 16, 3)
+        assert downsample(np.full((1, 4, 4, 3), 10, dtype=np.uint8), 2).max() == 10
+
+        sheet = ContactSheet(columns=3, max_cell=32, padding=2, label_height=10)
+        grid = sheet.build(batch, labels=[str(i) for i in range(5)])
+        # 2 rows of 32x16 cells plus labels and padding, 3 columns
+        assert grid.shape == (2 + 2 * (32 + 10 + 2), 2 + 3 * (16 + 2), 3)
+        # Top-left pixel of the fifth cell (row 1, column 1) keeps its color
+        y, x = 2 + (32 + 10 + 2), 2 + (16 + 2)
+        assert grid[y, x, 0] == 160
+
+        with tempfile.TemporaryDirectory() as tmp:
+            sheet.save(batch, str(Path(tmp) / "sheet.png"))
+            sheet.save(batch, str(Path(tmp) / "sheet.html"), labels=list("abcde"))
+            with open(Path(tmp) / "sheet.html", encoding="utf-8") as f:
+                assert f.read().count("<figure>") == 5
+
+        print("✅ Contact sheet works")
+        return True
+    except Exception as e:
+        print(f"❌ Contact sheet test failed: {e}")
+        _reraise(e)
+
+def test_attention_capture():
+    """Test step selection and ring-buffer ordering of the capture"""
+    print("🧪 Testing attention capture...")
+
+    try:
+        import numpy as np
+        import torch
+        from capture import AttentionCapture
+
+        capture = AttentionCapture(steps=2, capacity=3, latents=True)
+        capture.start()
+        for step in range(8):
+            if capture.recording:
+                capture._store("layer", torch.full((1, 4, 2), float(step)), capture.step)
+            capture(None, step, 0, {"latents": torch.zeros(1, 4, 8, 8)})
+
+        data, labels = capture.records("layer")
+        # Steps 0, 2, 4, 6 were recorded; the ring keeps the last three
+        assert [step for _, step in labels] == [2, 4, 6]
+        assert data.dtype == torch.float16 and data[:, 0, 0, 0].tolist() == [2.0, 4.0, 6.0]
+        assert len(capture.records("latents")[1]) == 3
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = capture.export(str(Path(tmp) / "capture.npz"))
+            with np.load(path) as archive:
+                assert archive["layer"].shape == (3, 1, 4, 2)
+                assert archive["layer.labels"].tolist() == [[0, 2], [0, 4], [0, 6]]
+
+        print("✅ Attention capture works")
+        return True
+    except Exception as e:
+        print(f"❌ Attention capture test failed: {e}")
+        _reraise(e)
+
+def test_prompt_dedupe():
+    """Test that prompt deduplication maps every string to its unique row"""
+    print("🧪 Testing prompt deduplication...")
+
+    try:
+        from prompt_encoding import dedupe
+
+        negative = "blurry, low quality, bad anatomy, distorted"
+        strings = ["a cat", "a dog", "a cat", negative, negative, None, ""]
+        unique, inverse = dedupe(strings)
+        assert unique == ["a cat", "a dog", negative, ""]
+        assert inverse == [0, 1, 0, 2, 2, 3, 3]
+        assert [unique[i] for i in inverse] == [s or "" for s in strings]
+
+        print("✅ Prompt deduplication works")
+        return True
+    except Exception as e:
+        print(f"❌ Prompt deduplication test failed: {e}")
+        _reraise(e)
+
+def test_attention_backends():
+    """Test attention backend switching on a minimal pipeline"""
+    print("🧪 Testing attention backends...")
+
+    try:
+        from attention import BACKENDS, apply_attention_backend
+
+        class FakeUNet:
+            def set_attn_processor(self, processor):
+                self.processor = processor
+
+        class FakePipeline:
+            def __init__(self):
+                self.unet = FakeUNet()
+                self.sliced = True
+
+            def enable_attention_slicing(self):
+                self.sliced = True
+
+            def disable_attention_slicing(self):
+                self.sliced = False
+
+        pipeline = FakePipeline()
+        assert apply_attention_backend(pipeline, "sdpa") == "sdpa"
+        assert not pipeline.sliced and pipeline.unet.processor is not None
+        apply_attention_backend(pipeline, "sliced")
+        assert pipeline.sliced and pipeline._lab_attention_backend == "sliced"
+        assert "auto" in BACKENDS
+
+        try:
+            apply_attention_backend(pipeline, "flash")
+            raise AssertionError("Unknown backend was accepted")
+        except ValueError:
+            pass
+
+        # An SDXL-style UNet gets its added conditioning; failing backends are skipped
+        import torch
+        from diffusers import UNet2DConditionModel
+        from attention import benchmark_attention_backends
+
+        pipeline.unet = UNet2DConditionModel(
+            sample_size=8, in_channels=4, out_channels=4, layers_per_block=1,
+            block_out_channels=(32, 64), norm_num_groups=8, cross_attention_dim=32,
+            attention_head_dim=8, addition_embed_type="text_time", addition_time_embed_dim=8,
+            projection_class_embeddings_input_dim=16 + 6 * 8,
+            down_block_types=("CrossAttnDownBlock2D", "DownBlock2D"),
+            up_block_types=("UpBlock2D", "CrossAttnUpBlock2D"),
+        ).eval()
+        results = benchmark_attention_backends(pipeline, 64, 64, candidates=["sdpa", "flash"], repeats=1)
+        assert list(results) == ["sdpa"] and results["sdpa"]["peak_bytes"] is None
+
+        print("✅ Attention backends switch correctly")
+        return True
+    except Exception as e:
+        print(f"❌ Attention backend test failed: {e}")
+        _reraise(e)
+
+def test_deepcache():
+    """Test that the cached UNet path matches the full forward on refresh steps"""
+    print("🧪 Testing DeepCache...")
+
+    try:
+        import torch
+        from diffusers import UNet2DConditionModel
+        from deepcache import DeepCache
+
+        torch.manual_seed(0)
+        unet = UNet2DConditionModel(
+            sample_size=8, in_channels=4, out_channels=4, layers_per_block=1,
+            block_out_channels=(32, 64), norm_num_groups=8, cross_attention_dim=32,
+            attention_head_dim=8,
+            down_block_types=("CrossAttnDownBlock2D", "DownBlock2D"),
+            up_block_types=("UpBlock2D", "CrossAttnUpBlock2D"),
+        ).eval()
+        sample = torch.randn(2, 4, 8, 8)
+        context = torch.randn(2, 7, 32)
+
+        with torch.no_grad():
+            expected = [unet(sample, t, context).sample for t in (900, 800, 700, 600)]
+            cache = DeepCache(unet, interval=3)
+            cache.install()
+            outputs = [unet(sample, t, context).sample for t in (900, 800, 700, 600)]
+            cache.remove()
+
+        assert torch.allclose(outputs[0], expected[0], atol=1e-5)
+        assert torch.allclose(outputs[3], expected[3], atol=1e-5)
+        assert cache.stats()["full_calls"] == 2 and cache.stats()["cached_calls"] == 2
+        assert "forward" not in vars(unet)
+
+        print("✅ DeepCache works")
+        return True
+    except Exception as e:
+        print(f"❌ DeepCache test failed: {e}")
+        _reraise(e)
+
+def test_cpu_worker_plan():
+    """Test that workers get disjoint cores from their own NUMA node"""
+    print("🧪 Testing CPU worker planning...")
+
+    try:
+        from cpu_tuning import candidate_splits, parse_cpulist, plan_workers
+
+        assert parse_cpulist("0-3,8,10-11\n") == [0, 1, 2, 3, 8, 10, 11]
+
+        nodes = {0: list(range(0, 8)), 1: list(range(8, 16))}
+        profiles = plan_workers(4, 4, nodes)
+        assert [p.numa_node for p in profiles] == [0, 1, 0, 1]
+        assert profiles[0].cores == [0, 1, 2, 3] and profiles[1].cores == [8, 9, 10, 11]
+        used = [core for p in profiles for core in p.cores]
+        assert len(used) == len(set(used)) == 16
+        for profile in profiles:
+            assert set(profile.cores) <= set(nodes[profile.numa_node])
+
+        splits = candidate_splits(16, max_workers=4)
+        assert [s["threads_per_worker"] for s in splits] == [16, 8, 5, 4]
+
+        # Workers larger than a node straddle both sockets on a two-node host
+        nodes = {0: list(range(0, 32)), 1: list(range(32, 64))}
+        for split in candidate_splits(64, max_workers=4):
+            profiles = plan_workers(split["workers"], split["threads_per_worker"], nodes)
+            used = [core for p in profiles for core in p.cores]
+            assert len(used) == len(set(used)) == split["workers"] * split["threads_per_worker"]
+        profiles = plan_workers(1, 64, nodes)
+        assert profiles[0].cores == list(range(64)) and profiles[0].numa_node is None
+        profiles = plan_workers(3, 21, nodes)
+        assert [p.numa_node for p in profiles] == [0, 1, None]
+        assert sorted(profiles[2].cores) == list(range(21, 32)) + list(range(53, 63))
+        try:
+            plan_workers(2, 33, nodes)
+            assert False, "expected too many threads to be rejected"
+        except ValueError:
+            pass
+
+        print("✅ CPU worker planning works")
+        return True
+    except Exception as e:
+        print(f"❌ CPU worker planning test failed: {e}")
+        _reraise(e)
+
+def test_model_mirror():
+    """Test mirror file selection and parallel verification against a manifest"""
+    print("🧪 Testing model mirror...")
+
+    try:
+        import hashlib
+        from model_mirror import (changed_files, content_id, select_files, verification_record,
+                                  verify_files, write_manifest)
+
+        files = ["model_index.json", "v1-5-pruned.ckpt", "unet/config.json",
+                 "unet/diffusion_pytorch_model.bin", "unet/diffusion_pytorch_model.safetensors",
+                 "unet/diffusion_pytorch_model.fp16.safetensors", "vae/diffusion_pytorch_model.bin"]
+        assert select_files(files) == ["model_index.json", "unet/config.json",
+                                       "unet/diffusion_pytorch_model.safetensors",
+                                       "vae/diffusion_pytorch_model.bin"]
+        assert "unet/diffusion_pytorch_model.fp16.safetensors" in select_files(files, variant="fp16")
+
+        with tempfile.TemporaryDirectory() as tmp:
+            (Path(tmp) / "unet").mkdir()
+            (Path(tmp) / "model_index.json").write_bytes(b"hello\n")
+            weights = b"\x00" * 1000
+            (Path(tmp) / "unet" / "weights.safetensors").write_bytes(weights)
+
+            # Same ids the hub reports: git blob sha1 and LFS sha256
+            assert content_id(str(Path(tmp) / "model_index.json"), "git-sha1") == \
+                "ce013625030ba8dba906f756967f9e9ca394464a"
+            entries = {
+                "model_index.json": {"size": 6, "algorithm": "git-sha1",
+                                     "content_id": "ce013625030ba8dba906f756967f9e9ca394464a"},
+                "unet/weights.safetensors": {"size": 1000, "algorithm": "sha256",
+                                             "content_id": hashlib.sha256(weights).hexdigest()},
+                "vae/missing.safetensors": {"size": 1, "algorithm": "sha256", "content_id": "0"},
+            }
+            report = verify_files(tmp, entries, workers=2)
+            assert sorted(report["ok"]) == ["model_index.json", "unet/weights.safetensors"]
+            assert report["missing"] == ["vae/missing.safetensors"]
+
+            # Files are only re-hashed on load once they change after verification
+            del entries["vae/missing.safetensors"]
+            write_manifest(tmp, {"files": entries,
+                                 "verified": verification_record(tmp, list(entries))})
+            assert changed_files(tmp) == []
+
+            (Path(tmp) / "unet" / "weights.safetensors").write_bytes(b"\x01" * 1001)
+            assert verify_files(tmp, entries)["mismatch"] == ["unet/weights.safetensors"]
+            assert changed_files(tmp) == ["unet/weights.safetensors"]
+
+        print("✅ Model mirror works")
+        return True
+    except Exception as e:
+        print(f"❌ Model mirror test failed: {e}")
+        _reraise(e)
+
+def test_guidance_schedule():
+    """Test guidance truncation and unconditional-branch reuse"""
+    print("🧪 Testing guidance schedules...")
+
+    try:
+        import torch
+        from guidance import CFGTruncation, UncondSkipping, relative_unet_cost
+
+        # Cutting guidance from the last 40% of steps saves 20% of UNet compute
+        assert abs(relative_unet_cost(50, cfg_cutoff=0.6) - 0.8) < 1e-9
+        assert relative_unet_cost(50, uncond_interval=2) == 0.75
+        assert relative_unet_cost(50) == 1.0
+
+        class FakePipe:
+            num_timesteps = 10
+            _guidance_scale = 7.5
+
+            @property
+            def do_classifier_free_guidance(self):
+                return self._guidance_scale > 1
+
+        pipe, truncation = FakePipe(), CFGTruncation(0.6)
+        embeds = torch.arange(4.0).reshape(2, 2)
+        assert truncation(pipe, 4, 0, {"prompt_embeds": embeds}) is None
+        updates = truncation(pipe, 5, 0, {"prompt_embeds": embeds})
+        assert not pipe.do_classifier_free_guidance
+        assert updates["prompt_embeds"].tolist() == [[2.0, 3.0]]
+
+        # SDXL-style pipelines also double the pooled text embeds and time ids
+        class FakeUNetConfig:
+            addition_embed_type = "text_time"
+
+        class FakeXLPipe(FakePipe):
+            _callback_tensor_inputs = ["latents", "prompt_embeds", "add_text_embeds", "add_time_ids"]
+            unet = type("FakeXLUNet", (), {"config": FakeUNetConfig()})()
+
+        pipe = FakeXLPipe()
+        truncation = CFGTruncation(0.6, pipe)
+        updates = truncation(pipe, 5, 0, {"prompt_embeds": embeds, "add_text_embeds": embeds,
+                                          "add_time_ids": embeds})
+        assert set(updates) == {"prompt_embeds", "add_text_embeds", "add_time_ids"}
+        assert updates["add_time_ids"].tolist() == [[2.0, 3.0]]
+        FakeXLPipe._callback_tensor_inputs = ["latents", "prompt_embeds"]
+        try:
+            CFGTruncation(0.6, FakeXLPipe())
+            assert False, "expected truncation to be refused"
+        except ValueError:
+            pass
+
+        class FakeUNet(torch.nn.Module):
+            def forward(self, sample, timestep, encoder_hidden_states, return_dict=True):
+                self.batches.append(sample.shape[0])
+                return (sample * timestep,)
+
+        unet = FakeUNet()
+        unet.batches = []
+        sample = torch.ones(2, 1)
+        with UncondSkipping(unet, interval=2) as skipping:
+            skipping.start(guided=True)
+            outputs = [unet(sample, t, sample, return_dict=False)[0] for t in (3.0, 2.0, 1.0)]
+        assert unet.batches == [2, 1, 2]
+        # The skipped call reuses the unconditional prediction of the previous one
+        assert outputs[1].flatten().tolist() == [3.0, 2.0]
+        assert "forward" not in vars(unet)
+
+        print("✅ Guidance schedules work")
+        return True
+    except Exception as e:
+        print(f"❌ Guidance schedule test failed: {e}")
+        _reraise(e)
+
+def test_buffer_pool():
+    """Test buffer reuse across acquire/release cycles"""
+    print("🧪 Testing buffer pool...")
+
+    try:
+        import torch
+        from buffer_pool import BufferPool
+
+        pool = BufferPool()
+        first = pool.acquire((2, 4, 8, 8), torch.float32, "cpu")
+        pool.release(first)
+        second = pool.acquire((2, 4, 8, 8), torch.float32, "cpu")
+        assert second is first
+        assert pool.acquire((1, 4, 8, 8), torch.float32, "cpu") is not first
+
+        # NumPy views of pooled CPU buffers are taken back too
+        pool.release(second.numpy())
+        assert pool.acquire((2, 4, 8, 8), torch.float32, "cpu") is first
+
+        # Tensors the pool didn't hand out are ignored
+        pool.release(torch.zeros(2, 4, 8, 8))
+        stats = pool.stats()
+        assert stats["hits"] == 2 and stats["misses"] == 2
+        assert stats["pooled_mb"] == 0
+
+        # Steady state: the lab's latent and output buffers are all reused
+        from diffusion_lab import DiffusionLab
+
+        class FakeConfig:
+            in_channels = 4
+
+        class FakeUNet:
+            config = FakeConfig()
+            dtype = torch.float32
+
+        class FakePipeline:
+            unet = FakeUNet()
+            vae_scale_factor = 8
+            _execution_device = torch.device("cpu")
+
+        lab = DiffusionLab(device="cpu", reuse_buffers=True)
+        lab.pipeline = FakePipeline()
+        for generation in range(4):
+            generators = [torch.Generator().manual_seed(seed) for seed in (0, 1)]
+            latents = lab._acquire_latents(2, 64, 64, generators)
+            output = lab._convert_output(torch.rand(2, 3, 64, 64), "np")
+            lab._release_buffers(latents)
+            lab.release_output(output)
+            if generation == 0:
+                allocations = lab.buffer_pool.stats()["misses"]
+        assert lab.buffer_pool.stats()["misses"] == allocations == 3
+
+        # Buffers dropped without release() don't pile up in the bookkeeping
+        for _ in range(200):
+            pool.acquire((3, 4), torch.float32, "cpu")
+        assert len(pool._outstanding) < 100 and pool.stats()["outstanding"] == 1
+
+        print("✅ Buffer pool works")
+        return True
+    except Exception as e:
+        print(f"❌ Buffer pool test failed: {e}")
+        _reraise(e)
+
+def test_pipeline_snapshot():
+    """Test that a snapshot round-trips a pipeline with page-aligned tensors"""
+    print("🧪 Testing pipeline snapshots...")
+
+    try:
+        import torch
+        from diffusers import DDIMScheduler, DDPMPipeline, UNet2DModel
+        from snapshot import ALIGNMENT, export_name, export_snapshot, load_snapshot, read_header
+
+        torch.manual_seed(0)
+        unet = UNet2DModel(sample_size=8, in_channels=3, out_channels=3, layers_per_block=1,
+                           block_out_channels=(32, 64), norm_num_groups=8,
+                           down_block_types=("DownBlock2D", "DownBlock2D"),
+                           up_block_types=("UpBlock2D", "UpBlock2D")).half().eval()
+        pipeline = DDPMPipeline(unet=unet, scheduler=DDIMScheduler())
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = str(Path(tmp) / "model.snapshot")
+            export_snapshot(pipeline, path, {"model_id": "tiny"})
+            header = read_header(path)
+            assert all((header["data_start"] + t["offset"]) % ALIGNMENT == 0 for t in header["tensors"])
+
+            restored, metadata = load_snapshot(path)
+            assert metadata == {"model_id": "tiny"}
+            assert isinstance(restored.scheduler, DDIMScheduler)
+            assert restored.unet.dtype == torch.float16 and not restored.unet.training
+            expected = unet.state_dict()
+            for name, tensor in restored.unet.state_dict().items():
+                assert torch.equal(tensor, expected[name]), name
+            del restored, tensor
+
+        # Fused PEFT layers are stored as the plain layers they replace
+        assert export_name("mid.to_q.base_layer.weight") == "mid.to_q.weight"
+        assert export_name("mid.to_q.lora_A.default.weight") is None
+
+        print("✅ Pipeline snapshots work")
+        return True
+    except Exception as e:
+        print(f"❌ Pipeline snapshot test failed: {e}")
+        _reraise(e)
+
+def test_inference_server():
+    """Test the HTTP server with a stand-in lab and the bundled client"""
+    print("🧪 Testing inference server...")
+
+    try:
+        import threading
+        from PIL import Image
+        from server import DiffusionLabClient, LabServer, ServerError
+
+        class StubLab:
+            current_model = "stub"
+
+            def __init__(self):
+                self.batches = []
+
+            def generate_batch(self, requests, max_batch_size=4, deadline=None, cancel_token=None,
+                               progress=None):
+                self.batches.append(len(requests))
+                if any(request["prompt"] == "bad" for request in requests):
+                    raise ValueError("bad prompt")
+                if progress is not None:
+                    for step in (1, 2):
+                        progress(list(range(len(requests))), step, 2)
+                return [Image.new("RGB", (request.get("width", 8), 8)) for request in requests]
+
+        lab = StubLab()
+        server = LabServer(lab, port=0, max_batch_size=4, batch_window=0.2).start()
+        client = DiffusionLabClient(server.url)
+        try:
+            assert client.healthy()
+            assert client.wait_until_ready(timeout=10)
+            assert client.generate("a cat", width=16).size == (16, 8)
+            # Same keep-alive connection for the next calls
+            images = client.batch([{"prompt": "a"}, {"prompt": "b", "width": 4}])
+            assert [image.size for image in images] == [(8, 8), (4, 8)]
+
+            events = list(client.stream("a dog"))
+            assert [event["event"] for event in events] == ["queued", "started", "progress",
+                                                            "progress", "result"]
+            assert events[-1]["images"][0].size == (8, 8)
+
+            for params in ({"width": "wide"}, {"guidance_scale": "high"},
+                           {"num_inference_steps": 0}, {"preset": "turbo"}):
+                try:
+                    client.generate("a cat", **params)
+                    assert False, f"expected a 400 for {params}"
+                except ServerError as e:
+                    assert e.status == 400
+
+            # Concurrent clients share one pipeline call
+            threads = [threading.Thread(target=lambda: DiffusionLabClient(server.url).generate("x"))
+                       for _ in range(3)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            assert lab.batches[-1] == 3
+            assert client.status()["completed"] == 6
+
+            # A failing request is retried alone, so its batch mates still succeed
+            results = {}
+
+            def generate(prompt):
+                try:
+                    results[prompt] = DiffusionLabClient(server.url).generate(prompt).size
+                except ServerError as e:
+                    results[prompt] = e.status
+
+            threads = [threading.Thread(target=generate, args=(prompt,)) for prompt in ("x", "bad", "y")]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            assert results == {"x": (8, 8), "bad": 400, "y": (8, 8)}
+            assert lab.batches[-4:] == [3, 1, 1, 1]
+
+            # A failure outside generate_batch fails the batch, not the worker
+            finish = server._finish
+
+            def broken_finish(job, ok, event, **data):
+                if ok:
+                    raise RuntimeError("lost result")
+                finish(job, ok, event, **data)
+
+            server._finish = broken_finish
+            try:
+                client.generate("x")
+                assert False, "expected a 500"
+            except ServerError as e:
+                assert e.status == 500
+            server._finish = finish
+            assert client.generate("x").size == (8, 8)
+        finally:
+            client.close()
+            server.stop()
+
+        print("✅ Inference server works")
+        return True
+    except Exception as e:
+        print(f"❌ Inference server test failed: {e}")
+        _reraise(e)
+
+def test_tiny_decoder_swap():
+    """Test that decoder='tiny' swaps the VAE only for the call"""
+    print("🧪 Testing tiny decoder swap...")
+
+    try:
+        from diffusers import AutoencoderTiny
+        from fast_decoder import TINY_DECODERS, tiny_decoder_id, use_decoder
+        from model_cache import attach_module
+
+        class Config:
+            latent_channels = 4
+
+        class FakeVAE:
+            config = Config()
+
+        class FakePipeline:
+            def __init__(self):
+                self.vae = FakeVAE()
+
+        pipeline = FakePipeline()
+        assert tiny_decoder_id(pipeline) == TINY_DECODERS["sd"]
+        pipeline.text_encoder_2 = object()
+        assert tiny_decoder_id(pipeline) == TINY_DECODERS["sdxl"]
+
+        full = pipeline.vae
+        tiny = AutoencoderTiny(encoder_block_out_channels=(8, 8),
+                               decoder_block_out_channels=(8, 8), num_encoder_blocks=(1, 1),
+                               num_decoder_blocks=(1, 1))
+        attach_module(pipeline, "tiny_vae", tiny)
+        pipeline._lab_tiny_vae_id = "tiny"
+        with use_decoder(pipeline, "tiny") as decoder:
+            assert decoder is tiny and pipeline.vae is tiny
+        assert pipeline.vae is full
+        with use_decoder(pipeline, "full") as decoder:
+            assert decoder is full
+
+        print("✅ Tiny decoder swap works")
+        return True
+    except Exception as e:
+        print(f"❌ Tiny decoder swap test failed: {e}")
+        _reraise(e)
+
+def test_draft_refine_helpers():
+    """Test draft sizing, latent upscaling and the compute estimate"""
+    print("🧪 Testing draft-then-refine helpers...")
+
+    try:
+        import torch
+        from drafts import draft_size, relative_cost, upscale_latents
+
+        assert draft_size(512, 768, 0.5) == (256, 384)
+        assert draft_size(100, 100, 0.25) == (64, 64)
+
+        latents = torch.randn(3, 4, 32, 32, dtype=torch.float16)
+        upscaled = upscale_latents(latents[[0, 2]], 512, 384)
+        assert upscaled.shape == (2, 4, 48, 64) and upscaled.dtype == torch.float16
+
+        # 8 quarter-size 10-step drafts, one refined at strength 0.5 of 50 steps
+        cost = relative_cost(8, 1, 0.25, 10, 50, 0.5, 50)
+        assert abs(cost - (8 * 0.25 * 10 + 25) / (8 * 50)) < 1e-9
+        assert cost < 0.15
+
+        # Drafts split across batches encode the prompt once
+        from types import SimpleNamespace
+        from diffusion_lab import DiffusionLab
+
+        class FakePipeline:
+            _execution_device = torch.device("cpu")
+            vae = SimpleNamespace(config=SimpleNamespace(scaling_factor=1.0),
+                                  decode=lambda latents, return_dict: (latents,))
+            image_processor = SimpleNamespace(
+                postprocess=lambda images, output_type, do_denormalize: list(images))
+
+            def __init__(self):
+                self.encoded, self.calls = [], []
+
+            def encode_prompt(self, prompt, device, num_images_per_prompt, do_cfg):
+                self.encoded.append(list(prompt))
+                return torch.arange(len(prompt), dtype=torch.float32).view(-1, 1, 1), None
+
+            def __call__(self, prompt_embeds=None, negative_prompt_embeds=None, generator=None,
+                         callback_on_step_end=None, callback_on_step_end_tensor_inputs=None, **kwargs):
+                self.calls.append((prompt_embeds, negative_prompt_embeds))
+                return SimpleNamespace(images=torch.zeros(len(generator), 4, 8, 8))
+
+        lab = DiffusionLab(device="cpu")
+        lab.pipeline = FakePipeline()
+        drafts = lab.generate_drafts("a fox", count=5, negative_prompt="blurry",
+                                     max_batch_size=2, guidance_scale=7.5, seed=0)
+        assert lab.pipeline.encoded == [["a fox", "blurry"]]
+        assert [len(embeds) for embeds, _ in lab.pipeline.calls] == [2, 2, 1]
+        assert all((embeds == 0).all() and (negatives == 1).all()
+                   for embeds, negatives in lab.pipeline.calls)
+        assert drafts.latents.shape[0] == 5 and len(drafts.images) == 5
+
+        print("✅ Draft-then-refine helpers work")
+        return True
+    except Exception as e:
+        print(f"❌ Draft-then-refine test failed: {e}")
+        _reraise(e)
+
+def test_task_pipelines():
+    """Test that img2img views share the loaded modules and follow model switches"""
+    print("🧪 Testing task pipelines...")
+
+    try:
+        import json
+        import torch
+        from diffusers import (AutoencoderKL, DDIMScheduler, StableDiffusionPipeline,
+                               UNet2DConditionModel)
+        from PIL import Image
+        from transformers import CLIPTextConfig, CLIPTextModel, CLIPTokenizer
+        from diffusion_lab import DiffusionLab
+
+        torch.manual_seed(0)
+        with tempfile.TemporaryDirectory() as tmp:
+            # Offline tokenizer: unknown words map to the end-of-text token
+            vocab, merges = Path(tmp) / "vocab.json", Path(tmp) / "merges.txt"
+            vocab.write_text(json.dumps({"<|startoftext|>": 0, "<|endoftext|>": 1}))
+            merges.write_text("#version: 0.2\n")
+            tokenizer = CLIPTokenizer(str(vocab), str(merges), model_max_length=77)
+
+        def make_pipeline():
+            return StableDiffusionPipeline(
+                unet=UNet2DConditionModel(
+                    sample_size=16, in_channels=4, out_channels=4, layers_per_block=1,
+                    block_out_channels=(32, 64), norm_num_groups=8, cross_attention_dim=32,
+                    attention_head_dim=8,
+                    down_block_types=("CrossAttnDownBlock2D", "DownBlock2D"),
+                    up_block_types=("UpBlock2D", "CrossAttnUpBlock2D"),
+                ),
+                vae=AutoencoderKL(block_out_channels=(32, 64), latent_channels=4, norm_num_groups=8,
+                                  down_block_types=("DownEncoderBlock2D",) * 2,
+                                  up_block_types=("UpDecoderBlock2D",) * 2),
+                text_encoder=CLIPTextModel(CLIPTextConfig(
+                    bos_token_id=0, eos_token_id=1, pad_token_id=1, hidden_size=32,
+                    intermediate_size=37, num_attention_heads=4, num_hidden_layers=2, vocab_size=2)),
+                tokenizer=tokenizer, scheduler=DDIMScheduler(), safety_checker=None,
+                feature_extractor=None, requires_safety_checker=False,
+            )
+
+        lab = DiffusionLab(device="cpu", max_cached_models=2)
+        first, second = make_pipeline(), make_pipeline()
+        lab.model_cache.put("first", first)
+        lab.model_cache.put("second", second)
+        lab.load_model("first")
+
+        view = lab._get_task_pipeline("img2img")
+        assert view is not first and view.unet is first.unet and view.vae is first.vae
+        assert view.text_encoder is first.text_encoder
+        assert lab._get_task_pipeline("img2img") is view
+
+        # strength 0.5 of a 10-step schedule runs 5 UNet steps
+        calls = []
+        hook = first.unet.register_forward_hook(lambda module, args, output: calls.append(1))
+        image = lab.image_to_image("a cat", Image.new("RGB", (32, 32)), strength=0.5,
+                                   num_inference_steps=10, guidance_scale=1.0, seed=0)
+        hook.remove()
+        assert image.size == (32, 32) and len(calls) == 5
+
+        lab.load_model("second")
+        assert lab._task_pipelines == {}
+        assert lab._get_task_pipeline("inpaint").unet is second.unet
+
+        print("✅ Task pipelines work")
+        return True
+    except Exception as e:
+        print(f"❌ Task pipeline test failed: {e}")
+        _reraise(e)
+
+def main():
+    """Run all tests"""
+    print("🚀 Running Lab Feature Tests")
+    print("=" * 60)
+
+    tests = [
+        test_output_store,
+        test_scheduler_registry,
+        test_pareto_front,
+        test_step_guard,
+        test_metrics_registry,
+        test_model_residency_cache,
+        test_component_pool,
+        test_adapter_manager,
+        test_resolution_buckets,
+        test_tile_layout,
+        test_image_conversion,
+        test_contact_sheet,
+        test_attention_capture,
+        test_prompt_dedupe,
+        test_attention_backends,
+        test_deepcache,
+        test_cpu_worker_plan,
+        test_model_mirror,
+        test_guidance_schedule,
+        test_buffer_pool,
+        test_pipeline_snapshot,
+        test_inference_server,
+        test_tiny_decoder_swap,
+        test_draft_refine_helpers,
+        test_task_pipelines,
+    ]
+
+    passed = 0
+    skipped = 0
+    total = len(tests)
+
+    for test in tests:
+        try:
+            if test():
+                passed += 1
+            print()  # Add spacing between tests
+        except unittest.SkipTest as e:
+            skipped += 1
+            print(f"⏭️  Skipped: {e}")
+            print()
+        except Exception as e:
+            print(f"❌ Test failed with exception: {e}")
+            print()
+
+    print(f"📊 Test Results: {passed}/{total} tests passed, {skipped} skipped")
+
+    if passed + skipped == total:
+        print("🎉 All lab feature tests passed!")
+        return True
+    else:
+        print("❌ Some tests failed. Please check the errors above.")
+        return False
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)